@@ -0,0 +1,249 @@
+"""
+Times the pipeline on seeded synthetic data and stores the timings as JSON so runs on different commits can be
+compared.
+
+    python -m benchmarks.bench                      # quick profile, written to benchmarks/results
+    python -m benchmarks.bench --profile full       # up to 100k packages and 2,000 hubs
+    python -m benchmarks.bench --compare old.json new.json
+"""
+from __future__ import annotations
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from benchmarks.synthetic import synthetic_hubs, write_dataset, write_distance_table
+from data_services.hash_table import TABLE_ENGINES, set_table_engine
+import data_services.hash_table as hash_table
+from delivery_services.pkg_query import PkgQuery
+from delivery_services.routing import RoutingSession, distance_finder, pkg_importer
+from delivery_services.timeline import StatusTimeline
+from log_services.instrumentation import disable_instrumentation, enable_instrumentation
+from utilities import SOURCE_DIR
+
+RESULTS_DIR = SOURCE_DIR / 'benchmarks' / 'results'
+REGRESSION_RATIO = 1.10  # A timing this much slower than the old run is reported as a regression
+# The chaining table rehashes one key at a time while it grows, so it is only imported up to this size
+ENGINE_MAX_PKGS = {'chaining': 10_000}
+
+# Sizes of each stage per profile. Routing compares every pending package while loading, so it is run at
+# smaller sizes than the import. The full profile takes several minutes and is timed once per size
+PROFILES: dict[str, dict[str, Any]] = {
+    'quick': {'graph_hubs': [27, 200], 'import_pkgs': [100, 1_000, 10_000], 'import_hubs': 200,
+              'route': [(100, 27), (1_000, 200)], 'repeat': 3},
+    'full': {'graph_hubs': [27, 200, 500, 1_000, 2_000], 'import_pkgs': [100, 1_000, 10_000, 100_000],
+             'import_hubs': 500, 'route': [(100, 27), (1_000, 200), (5_000, 500), (10_000, 2_000)], 'repeat': 1},
+}
+
+
+def best_of(func: Callable[[], Any], repeat: int) -> tuple[list[float], Any]:
+    """
+    Runs func repeat times
+    :param func:
+    :param repeat:
+    :return tuple(Seconds of each run, Return value of the last run):
+    """
+    runs = []
+    value = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = func()
+        runs.append(time.perf_counter() - start)
+    return runs, value
+
+
+def __result(name: str, params: dict[str, Any], runs: list[float], **extra) -> dict[str, Any]:
+    return {'name': name, 'params': params, 'best': min(runs), 'runs': runs, **extra}
+
+
+def bench_graph(data_dir: Path, hub_counts: list[int], repeat: int, seed: int) -> list[dict[str, Any]]:
+    """
+    Times building the dense graph from a distance table, the graph cache is not used
+    """
+    results = []
+    for hub_count in hub_counts:
+        dist_file = data_dir / f'distances-{hub_count}-{seed}.csv'
+        write_distance_table(dist_file, synthetic_hubs(hub_count, seed))
+        runs, _ = best_of(lambda: distance_finder(dist_file=dist_file, cache_dir=None), repeat)
+        results.append(__result('graph_build', {'hubs': hub_count}, runs))
+    return results
+
+
+def bench_import(data_dir: Path, pkg_counts: list[int], hub_count: int, repeat: int,
+                 seed: int) -> list[dict[str, Any]]:
+    """
+    Times reading and indexing the package file with each hash table engine
+    """
+    results = []
+    engine = hash_table.table_engine
+    try:
+        for pkg_count in pkg_counts:
+            pkg_file, dist_file = write_dataset(data_dir, pkg_count, hub_count, seed)
+            dh_graph = distance_finder(dist_file=dist_file, cache_dir=None)
+            for table_engine in TABLE_ENGINES:
+                if pkg_count > ENGINE_MAX_PKGS.get(table_engine, pkg_count):
+                    continue
+                set_table_engine(table_engine)
+                runs, _ = best_of(lambda: pkg_importer(pkg_file, dh_graph), repeat)
+                results.append(__result('pkg_import', {'pkgs': pkg_count, 'hubs': hub_count,
+                                                       'engine': table_engine}, runs))
+    finally:
+        set_table_engine(engine)
+    return results
+
+
+def bench_route(data_dir: Path, sizes: list[tuple[int, int]], repeat: int, seed: int,
+                instrument: bool = False) -> list[dict[str, Any]]:
+    """
+    Times a full routing run and the status queries over the finished plan
+    """
+    results = []
+    for (pkg_count, hub_count) in sizes:
+        pkg_file, dist_file = write_dataset(data_dir, pkg_count, hub_count, seed)
+        dh_graph = distance_finder(dist_file=dist_file, cache_dir=None)
+        params = {'pkgs': pkg_count, 'hubs': hub_count}
+        runs, session = best_of(lambda: __run_session(dh_graph, pkg_file), repeat)
+        miles = sum(truck.total_miles for truck in session.trucks)
+        results.append(__result('routing', params, runs, miles=round(miles, 1)))
+        if instrument:
+            enable_instrumentation()
+            try:
+                results[-1]['metrics'] = __run_session(dh_graph, pkg_file).metrics
+            finally:
+                disable_instrumentation()
+        results.extend(bench_status(session, params, repeat))
+    return results
+
+
+def __run_session(dh_graph, pkg_file: Path) -> RoutingSession:
+    session = RoutingSession(dh_graph=dh_graph, pkg_file=pkg_file)
+    session.run()
+    return session
+
+
+def bench_status(session: RoutingSession, params: dict[str, Any], repeat: int) -> list[dict[str, Any]]:
+    """
+    Times building the status timeline and package query of a plan, and answering status and ID queries at
+    every ten minutes of the day
+    """
+    end = int(max(truck.get_time_elapsed() for truck in session.trucks)) + 10
+    times = range(8 * 60, end, 10)
+    pkg_count = params['pkgs']
+    results = []
+    runs, timeline = best_of(lambda: StatusTimeline(session.pkgs), repeat)
+    results.append(__result('status_timeline_build', params, runs))
+    runs, _ = best_of(lambda: [timeline.status_counts(t) for t in times], repeat)
+    results.append(__result('status_counts', {**params, 'queries': len(times)}, runs))
+    # Rendering lists every package, so it is only timed hourly. The render cache is cleared so every run
+    # renders each time once
+    hours = times[::6]
+    runs, _ = best_of(lambda: [timeline.rebuild(session.pkgs), [timeline.render(t) for t in hours]], repeat)
+    results.append(__result('status_render', {**params, 'queries': len(hours)}, runs))
+    runs, query = best_of(lambda: PkgQuery(session.pkgs), repeat)
+    results.append(__result('pkg_query_build', params, runs))
+    searches = [str(pkg_count // 2), f'1-{pkg_count}', '1*', ','.join(map(str, range(1, pkg_count, 97)))]
+    runs, _ = best_of(lambda: [query.search(text) for text in searches], repeat)
+    results.append(__result('pkg_query_search', {**params, 'queries': len(searches)}, runs))
+    return results
+
+
+def commit_hash() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SOURCE_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(profile: str, data_dir: Path, seed: int = 0, repeat: Optional[int] = None,
+                   instrument: bool = False) -> dict[str, Any]:
+    """
+    Runs every stage of a profile
+    :param profile: Name of a profile in PROFILES
+    :param data_dir: Directory the synthetic files are written to
+    :param seed: Seed of the synthetic data, runs with the same seed time the same data
+    :param repeat: Runs of each timing, the best is reported, defaults to the profile's
+    :param instrument: Adds the stage timers and counters of one instrumented routing run to each routing result
+    :return Report that can be written as JSON:
+    """
+    sizes = PROFILES[profile]
+    repeat = sizes['repeat'] if repeat is None else repeat
+    results = bench_graph(data_dir, sizes['graph_hubs'], repeat, seed)
+    results += bench_import(data_dir, sizes['import_pkgs'], sizes['import_hubs'], repeat, seed)
+    results += bench_route(data_dir, sizes['route'], repeat, seed, instrument)
+    return {'commit': commit_hash(), 'python': platform.python_version(), 'platform': platform.platform(),
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'), 'profile': profile,
+            'seed': seed, 'repeat': repeat, 'results': results}
+
+
+def __key(result: dict[str, Any]) -> str:
+    return result['name'] + ' ' + ' '.join(f'{param}={value}' for (param, value) in sorted(result['params'].items()))
+
+
+def compare_reports(old: dict[str, Any], new: dict[str, Any],
+                    threshold: float = REGRESSION_RATIO) -> tuple[list[str], list[str]]:
+    """
+    Compares the best timings of two reports, only timings present in both are compared
+    :param old:
+    :param new:
+    :param threshold: Ratio of new to old time above which a timing is a regression
+    :return tuple(Report lines, Keys of the regressed timings):
+    """
+    old_results = {__key(result): result for result in old['results']}
+    lines = [f'{"benchmark":<60}{"old ms":>12}{"new ms":>12}{"ratio":>8}']
+    regressions = []
+    for result in new['results']:
+        if (previous := old_results.get(key := __key(result))) is None:
+            continue
+        ratio = result['best'] / previous['best'] if previous['best'] > 0 else float('inf')
+        flag = ''
+        if ratio > threshold:
+            regressions.append(key)
+            flag = '  slower'
+        lines.append(f'{key:<60}{previous["best"] * 1000:>12.2f}{result["best"] * 1000:>12.2f}{ratio:>8.2f}{flag}')
+    return lines, regressions
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Times the routing pipeline on seeded synthetic data')
+    parser.add_argument('--profile', choices=sorted(PROFILES), default='quick')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int)
+    parser.add_argument('--data-dir', type=Path, help='Keeps the synthetic files here instead of a temporary directory')
+    parser.add_argument('--output', type=Path, help='Report file, defaults to benchmarks/results/<commit>-<time>.json')
+    parser.add_argument('--instrument', action='store_true', help='Adds stage timers and counters to routing results')
+    parser.add_argument('--compare', nargs=2, type=Path, metavar=('OLD', 'NEW'),
+                        help='Compares two reports instead of running, exits with 1 when a timing regressed')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_RATIO)
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        old, new = (json.loads(report.read_text()) for report in args.compare)
+        lines, regressions = compare_reports(old, new, args.threshold)
+        print(f'{old.get("commit")} -> {new.get("commit")}')
+        print('\n'.join(lines))
+        return 1 if regressions else 0
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        report = run_benchmarks(args.profile, args.data_dir or Path(tmp_dir), args.seed, args.repeat,
+                                args.instrument)
+    output = args.output
+    if output is None:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')
+        output = RESULTS_DIR / f'{report["commit"] or "unknown"}-{stamp}.json'
+    output.write_text(json.dumps(report, indent=2))
+    for result in report['results']:
+        print(f'{__key(result):<60}{result["best"] * 1000:>12.2f} ms')
+    print(f'Written to {output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,241 @@
+"""
+Routes generated scenarios with the reference router and every alternate engine, validates each plan against the
+manifest's rules and reports how the engines' miles, finishing times and missed deadlines differ from the reference.
+
+    python -m benchmarks.differential                        # 1,000 scenarios, every engine
+    python -m benchmarks.differential --scenarios 50 --engines scan optimized
+"""
+from __future__ import annotations
+import argparse
+import random
+import sys
+import tempfile
+import time
+import traceback
+from pathlib import Path
+from typing import Callable, NamedTuple, Optional, Union
+
+from benchmarks.synthetic import write_dataset
+import data_services.hash_table as hash_table
+from data_services.graph import DHGraph
+from data_services.hash_table import Table, set_table_engine
+from delivery_services.delivery_hub import DeliveryHub
+from delivery_services.pkg_handler import EOD, PkgObject
+from delivery_services.plan_validator import PkgRules, PlanReport, read_rules, validate_plan
+from delivery_services.route_optimizer import OptimizerSettings
+from delivery_services.routing import RoutingSession, distance_finder
+from delivery_services.truck import DAY_START, Truck
+
+REFERENCE = 'reference'
+PKG_COUNTS = (20, 200)  # Range of the number of packages in a scenario
+HUB_COUNTS = (27, 60)  # Range of the number of hubs in a scenario
+REPAIRS = ('package_available', 'update_address', 'add_package')
+
+
+class Plan(NamedTuple):
+    pkgs: Table[int, PkgObject]
+    trucks: list[Truck]
+    rules: Optional[Table[int, PkgRules]] = None  # Rules of a plan repaired after routing, None for the manifest's
+
+
+Engine = Callable[[DHGraph[Union[DeliveryHub, str]], Path], Plan]
+
+
+def __session(**session_args) -> Engine:
+    return lambda dh_graph, pkg_file: Plan(*RoutingSession(dh_graph=dh_graph, pkg_file=pkg_file,
+                                                           **session_args).run())
+
+
+def __repair(dh_graph: DHGraph[Union[DeliveryHub, str]], pkg_file: Path) -> Plan:
+    """
+    Routes a scenario with the reference router, then repairs the plan with the incremental planner at a random
+    time of the day: a package becomes available later, a package not delivered yet changes address, or a new
+    package is added. The repair is drawn from the scenario's file name, so every run of a scenario repairs it
+    the same way, and the rules are changed to match it
+    """
+    session = RoutingSession(dh_graph=dh_graph, pkg_file=pkg_file)
+    pkgs, trucks = session.run()
+    rules = read_rules(dh_graph, pkg_file)
+    planner = session.incremental_planner()
+    rng = random.Random(pkg_file.name)
+    now = rng.uniform(DAY_START, max(truck.get_time_elapsed() for truck in trucks))
+    pkg_ids = sorted(pkg_id for (pkg_id, _) in pkgs)
+    pending = [pkg_id for pkg_id in pkg_ids if pkgs.fetch_bucket(pkg_id).delivered_at_time > now]
+    addr, postal_code = str(dh_graph.hubs[rng.randrange(1, dh_graph.hub_count)]).rstrip(')').rsplit(' (', 1)
+    hub_id = dh_graph.hub_id(f'{addr} ({postal_code})')
+
+    repair = rng.choice(REPAIRS)
+    if repair == 'update_address' and len(pending) != 0:
+        pkg_id = rng.choice(pending)
+        planner.update_address(pkg_id, addr, postal_code, now)
+        rules.insert(pkg_id, rules.fetch_bucket(pkg_id)._replace(hub_id=hub_id, wrong_address=False))
+    elif repair == 'package_available':
+        rule = rules.fetch_bucket(rng.choice(pkg_ids))
+        available_when = max(now, rule.available_when)
+        planner.package_available(rule.pkg_id, available_when)
+        rules.insert(rule.pkg_id, rule._replace(available_when=available_when))
+    else:
+        pkg_id = pkg_ids[-1] + 1
+        planner.add_package(PkgObject(str(pkg_id), addr, 'Salt Lake City', 'UT', postal_code, 'EOD', '1', ''), now)
+        rules.insert(pkg_id, PkgRules(pkg_id, hub_id, EOD, now, None, False))
+    return Plan(pkgs, trucks, rules)
+
+
+def __with_table_engine(table_engine: str, engine: Engine) -> Engine:
+    def run(dh_graph: DHGraph[Union[DeliveryHub, str]], pkg_file: Path) -> Plan:
+        previous = hash_table.table_engine
+        set_table_engine(table_engine)
+        try:
+            return engine(dh_graph, pkg_file)
+        finally:
+            set_table_engine(previous)
+    return run
+
+
+# The reference is the plan auto_router makes, every other engine must make valid plans from the same manifests.
+# The repair engine checks the incremental planner's repairs of the reference plan
+ENGINES: dict[str, Engine] = {
+    REFERENCE: __session(),
+    'scan': __session(batched=False),
+    'optimized': __session(optimizer=OptimizerSettings()),
+    'chaining': __with_table_engine('chaining', __session()),
+    'insertion': __session(strategy='insertion'),
+    'repair': __repair,
+}
+
+
+class EngineSummary:
+    """
+    Totals of one engine over every scenario, the deltas are measured against the reference plan
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.scenarios = 0
+        self.invalid: list[tuple[int, list[str]]] = []  # Scenario seed and the plan's violations
+        self.crashed: list[tuple[int, str]] = []  # Scenario seed and the traceback
+        self.seconds = 0.0
+        self.miles = 0.0
+        self.missed_deadlines = 0
+        self.mile_deltas: list[float] = []
+        self.finish_deltas: list[float] = []
+        self.more_missed = 0  # Scenarios where the engine misses more deadlines than the reference
+
+    def add(self, report: PlanReport, reference: Optional[PlanReport]) -> None:
+        self.miles += report.total_miles
+        self.missed_deadlines += len(report.missed_deadlines)
+        if reference is not None:
+            self.mile_deltas.append(report.total_miles - reference.total_miles)
+            self.finish_deltas.append(report.finish_time - reference.finish_time)
+            self.more_missed += len(report.missed_deadlines) > len(reference.missed_deadlines)
+
+    def failed(self) -> bool:
+        return len(self.invalid) != 0 or len(self.crashed) != 0
+
+    def summary(self) -> str:
+        line = (f'{self.name:<12}{self.scenarios:>10}{len(self.invalid):>9}{len(self.crashed):>9}'
+                f'{self.miles:>12.1f}{self.missed_deadlines:>8}{self.seconds:>10.2f}')
+        if self.mile_deltas:
+            line += (f'{sum(self.mile_deltas) / len(self.mile_deltas):>+12.2f}{min(self.mile_deltas):>+10.1f}'
+                     f'{max(self.mile_deltas):>+10.1f}{sum(self.finish_deltas) / len(self.finish_deltas):>+12.1f}'
+                     f'{self.more_missed:>8}')
+        return line
+
+
+class Scenario(NamedTuple):
+    seed: int
+    pkg_count: int
+    hub_count: int
+
+
+def scenarios(count: int, seed: int = 0) -> list[Scenario]:
+    """
+    Draws the sizes of count scenarios, each scenario's data is generated from its own seed
+    :param count:
+    :param seed:
+    :return List of scenarios:
+    """
+    rng = random.Random(seed)
+    return [Scenario(seed * 1_000_003 + s, rng.randint(*PKG_COUNTS), rng.randint(*HUB_COUNTS)) for s in range(count)]
+
+
+def run_differential(scenario_lst: list[Scenario], engines: list[str], data_dir: Path,
+                     progress: Optional[Callable[[int], None]] = None) -> dict[str, EngineSummary]:
+    """
+    Assume:
+    s = number of scenarios
+    e = number of engines
+        T(n) = O(s * e) routing runs
+    Routes every scenario with the reference router and each engine and validates every plan
+    :param scenario_lst:
+    :param engines: Names of the engines in ENGINES to compare with the reference
+    :param data_dir: Directory the scenario files are written to
+    :param progress: Called with the number of scenarios finished
+    :return Engine names to their summaries, starting with the reference:
+    """
+    names = [REFERENCE] + [name for name in engines if name != REFERENCE]
+    summaries = {name: EngineSummary(name) for name in names}
+    for (s, scenario) in enumerate(scenario_lst):
+        pkg_file, dist_file = write_dataset(data_dir, scenario.pkg_count, scenario.hub_count, scenario.seed)
+        dh_graph = distance_finder(dist_file=dist_file, cache_dir=None)
+        reference = None
+        for name in names:
+            summary = summaries[name]
+            summary.scenarios += 1
+            start = time.perf_counter()
+            try:
+                plan = ENGINES[name](dh_graph, pkg_file)
+            except Exception:
+                summary.crashed.append((scenario.seed, traceback.format_exc()))
+                continue
+            finally:
+                summary.seconds += time.perf_counter() - start
+            report = validate_plan(dh_graph, plan.pkgs, plan.trucks, pkg_file, plan.rules)
+            if not report.valid:
+                summary.invalid.append((scenario.seed, report.violations))
+            if name == REFERENCE:
+                reference = report
+            summary.add(report, None if name == REFERENCE else reference)
+        pkg_file.unlink()
+        dist_file.unlink()
+        if progress is not None:
+            progress(s + 1)
+    return summaries
+
+
+def format_summaries(summaries: dict[str, EngineSummary], details: int = 3) -> str:
+    """
+    Formats a line per engine, followed by the first violations and crashes of each failing engine
+    :param summaries:
+    :param details: Number of failing scenarios shown per engine
+    :return Report string:
+    """
+    lines = [f'{"engine":<12}{"scenarios":>10}{"invalid":>9}{"crashed":>9}{"miles":>12}{"missed":>8}{"seconds":>10}'
+             f'{"mean +mi":>12}{"min +mi":>10}{"max +mi":>10}{"mean +min":>12}{"worse":>8}']
+    lines += [summary.summary() for summary in summaries.values()]
+    for summary in summaries.values():
+        for (seed, violations) in summary.invalid[:details]:
+            lines.append(f'{summary.name} scenario {seed}: ' + '; '.join(violations[:5]))
+        for (seed, trace) in summary.crashed[:details]:
+            lines.append(f'{summary.name} scenario {seed} crashed:\n{trace}')
+    return '\n'.join(lines)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Validates the plans of every routing engine on generated '
+                                                 'scenarios and compares them with the reference router')
+    parser.add_argument('--scenarios', type=int, default=1_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--engines', nargs='+', choices=sorted(ENGINES), default=sorted(ENGINES))
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        summaries = run_differential(scenarios(args.scenarios, args.seed), args.engines, Path(tmp_dir),
+                                     lambda done: print(f'\r{done}/{args.scenarios}', end='', file=sys.stderr))
+    print(file=sys.stderr)
+    print(format_summaries(summaries))
+    return 1 if any(summary.failed() for summary in summaries.values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,111 @@
+from __future__ import annotations
+import csv
+import math
+import random
+from pathlib import Path
+from typing import NamedTuple
+
+from delivery_services.pkg_handler import CORRECTED_ADDRESS
+
+PKG_HEADER = ['Package ID', 'Address', 'City', 'State', 'Zip', 'Delivery Deadline', 'Weight KILO',
+              'page 1 of 1PageSpecial Notes']
+HUB_NAME = 'Western Governors University\n4001 S 700 E,\nSalt Lake City, UT 84107'
+CITIES = ('Salt Lake City', 'West Valley City', 'Millcreek', 'Holladay', 'Murray', 'Taylorsville')
+DEADLINES = ('9:00 am', '10:30 am', '12:00 pm', '2:00 pm')
+AREA_MILES = 12.0  # Hubs are spread over a square of this size around the hub, roughly the sample's spread
+
+
+class SyntheticHub(NamedTuple):
+    name: str
+    street: str
+    postal_code: str
+    x: float
+    y: float
+
+
+def synthetic_hubs(hub_count: int, seed: int = 0) -> list[SyntheticHub]:
+    """
+    T(n) = O(n)
+    Places the hub and hub_count - 1 delivery hubs at random points, every hub has a distinct street address. The
+    second hub is the address wrong addresses are corrected to
+    :param hub_count: Number of hubs including the hub the trucks leave from, at least 2
+    :param seed:
+    :return List of hubs, the first is the hub the trucks leave from:
+    """
+    rng = random.Random(seed)
+    hubs = [SyntheticHub(HUB_NAME, 'HUB', '84107', 0.0, 0.0),
+            SyntheticHub(f'Corrected Address\n {CORRECTED_ADDRESS[0]}', *CORRECTED_ADDRESS,
+                         rng.uniform(-AREA_MILES, AREA_MILES), rng.uniform(-AREA_MILES, AREA_MILES))]
+    for h in range(2, hub_count):
+        street = f'{h * 10} S {rng.randrange(100, 9900, 100)} E'
+        hubs.append(SyntheticHub(f'Synthetic Stop {h}\n {street}', street, str(84100 + rng.randrange(100)),
+                                 rng.uniform(-AREA_MILES, AREA_MILES), rng.uniform(-AREA_MILES, AREA_MILES)))
+    return hubs
+
+
+def write_distance_table(dist_file: Path, hubs: list[SyntheticHub]) -> None:
+    """
+    T(n) = O(n**2)
+    Writes a lower triangular ';' delimited distance table in the project's format. Distances are the
+    straight line distances between the hubs rounded to a tenth of a mile, so the table is metric up to rounding
+    :param dist_file:
+    :param hubs:
+    :return No return value:
+    """
+    with open(dist_file, 'w', newline='') as dist_f:
+        writer = csv.writer(dist_f, delimiter=';', quotechar='"')
+        for (h, hub) in enumerate(hubs):
+            address = 'HUB' if h == 0 else f' {hub.street}\n({hub.postal_code})'
+            dists = [f'{round(math.dist((hub.x, hub.y), (other.x, other.y)), 1)}' for other in hubs[:h]]
+            writer.writerow([hub.name, address, *dists, '0.0'])
+
+
+def write_package_file(pkg_file: Path, pkg_count: int, hubs: list[SyntheticHub], seed: int = 0) -> None:
+    """
+    T(n) = O(n)
+    Writes a ';' delimited package file in the project's format. Most packages are due at the end of the day
+    and have no notes; the rest use the sample's deadlines, truck restrictions, delayed arrivals, small
+    "delivered with" groups and wrong addresses, in roughly the sample's proportions
+    :param pkg_file:
+    :param pkg_count:
+    :param hubs: Hubs the packages are sent to, the first hub is never a destination
+    :param seed:
+    :return No return value:
+    """
+    rng = random.Random(seed)
+    with open(pkg_file, 'w', newline='') as pkg_f:
+        writer = csv.writer(pkg_f, delimiter=';', quotechar='"')
+        writer.writerow(PKG_HEADER)
+        for pkg_id in range(1, pkg_count + 1):
+            hub = hubs[rng.randrange(1, len(hubs))]
+            deadline = rng.choice(DEADLINES) if rng.random() < 0.25 else 'EOD'
+            note = ''
+            roll = rng.random()
+            if roll < 0.05:
+                note = 'Can only be on truck 2'
+            elif roll < 0.10:
+                note = 'Delayed on flight---will not arrive to depot until 9:05 am'
+            elif roll < 0.13 and pkg_id > 2:
+                note = f'Must be delivered with {pkg_id - 1}; {pkg_id - 2}'
+            elif roll < 0.14:
+                note = 'Wrong address listed'
+            writer.writerow([pkg_id, hub.street, rng.choice(CITIES), 'UT', hub.postal_code, deadline,
+                             rng.randrange(1, 90), note])
+
+
+def write_dataset(data_dir: Path, pkg_count: int, hub_count: int, seed: int = 0) -> tuple[Path, Path]:
+    """
+    Writes a package file and a distance table that can be routed together
+    :param data_dir:
+    :param pkg_count:
+    :param hub_count:
+    :param seed:
+    :return tuple(Package file, Distance table):
+    """
+    data_dir.mkdir(parents=True, exist_ok=True)
+    hubs = synthetic_hubs(hub_count, seed)
+    pkg_file = data_dir / f'packages-{pkg_count}-{hub_count}-{seed}.csv'
+    dist_file = data_dir / f'distances-{hub_count}-{seed}.csv'
+    write_package_file(pkg_file, pkg_count, hubs, seed)
+    write_distance_table(dist_file, hubs)
+    return pkg_file, dist_file
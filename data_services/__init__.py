@@ -1,2 +1,3 @@
 from data_services.graph import *
-from data_services.hash_table import *
+from data_services.graph_cache import *
+from data_services.hash_table import *
\ No newline at end of file
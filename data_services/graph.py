@@ -1,28 +1,35 @@
 from __future__ import annotations
-import logging
-from data_services.hash_table import HashTable
+from data_services.hash_table import Table, new_table
+from log_services import get_logger
 from utilities import SOURCE_DIR
-from typing import TypeVar, Generic
-
-# Creates a logger using the module name
-logger = logging.getLogger(__name__)
-# Specifies that only DEBUG level logs should be saved
-logger.setLevel(logging.DEBUG)
-# Specifies the name and path for the log file
-graph_log_file = SOURCE_DIR / 'data_services' / 'data_logs' / 'graph.log'
-graph_handler = logging.FileHandler(graph_log_file)
-# Specifies a format for the logs being recorded
-formatter = logging.Formatter('%(asctime)s : %(levelname)s : %(name)s : %(message)s')
-# Sets the handler's formatter
-graph_handler.setFormatter(formatter)
-# Adds the file handler to the logger
-logger.addHandler(graph_handler)
+from array import array
+from typing import TypeVar, Generic, Optional
+
+try:
+    import numpy as np
+except ImportError:  # The dense backend falls back to a flat array('d') matrix
+    np = None
+
+# Records are queued and written as JSON lines by a background listener, see log_services
+logger = get_logger(__name__, SOURCE_DIR / 'data_services' / 'data_logs' / 'graph.log')
 
 obj_id = TypeVar('obj_id')
 
 
 class DHGraph(Generic[obj_id]):
-    graph_edge: HashTable[obj_id, HashTable[obj_id, float]] = HashTable()
+    graph_edge: Table[obj_id, Table[obj_id, float]]
+    hub_ids: Table[obj_id, int]
+    hubs: list[obj_id]
+    dense = False
+
+    def __init__(self):
+        self.graph_edge = new_table()
+        self.hub_ids = new_table()  # Interns each hub to a small integer ID in insertion order
+        self.hubs = []
+        self.distance_matrix: Optional[array] = None
+        self.matrix_view = None
+        self.hub_count = 0
+        self.neighbour_index: Optional[list[list[int]]] = None
 
     def insert_graph_edge(self, hub_a: obj_id, hub_b: obj_id, distance: float):
         self.__insert_graph_edge(hub_a, hub_b, distance)
@@ -33,11 +40,111 @@ class DHGraph(Generic[obj_id]):
 
     def insert_hub(self, dh: obj_id):
         """
-        Inserts an individual vertex into the graph
+        Inserts an individual vertex into the graph and assigns it the next hub ID
+        :param dh:
+        :return:
+        """
+        if dh not in self.hub_ids:
+            self.hub_ids.insert(dh, len(self.hubs))
+            self.hubs.append(dh)
+        self.graph_edge.insert(dh, new_table())
+
+    def hub_id(self, dh: obj_id) -> Optional[int]:
+        """
+        Translates a delivery hub or address string into its integer hub ID
         :param dh:
+        :return Hub ID or None:
+        """
+        return self.hub_ids.fetch_bucket(dh)
+
+    def compile_dense(self):
+        """
+        T(n) = O(n**2)
+        S(n) = O(n**2)
+        Copies every edge into a contiguous row-major distance matrix indexed by hub ID. Once compiled
+        all distance queries are answered from the matrix instead of the nested hash tables
+        :return:
+        """
+        self.hub_count = n = len(self.hubs)
+        matrix = array('d', [float('inf')]) * (n * n)
+        for (a, hub_a) in enumerate(self.hubs):
+            edges = self.graph_edge.fetch_bucket(hub_a)
+            for (hub_b, distance) in edges:
+                matrix[a * n + self.hub_ids.fetch_bucket(hub_b)] = distance
+        self.__set_matrix(matrix)
+
+    def load_dense(self, hubs: list[obj_id], distance_matrix: array):
+        """
+        T(n) = O(n)
+        S(n) = O(n**2)
+        Builds the graph straight from a compiled distance matrix, such as one read from the graph cache.
+        Only the dense backend is filled in, the edges are not copied into the hash tables
+        :param hubs: Hubs in hub ID order
+        :param distance_matrix: Row-major distances indexed by hub ID
         :return:
         """
-        self.graph_edge.insert(dh, HashTable[obj_id, float]())
+        for dh in hubs:
+            self.insert_hub(dh)
+        self.hub_count = len(self.hubs)
+        if len(distance_matrix) != self.hub_count ** 2:
+            raise ValueError(f'Expected {self.hub_count ** 2} distances, found {len(distance_matrix)}')
+        self.__set_matrix(distance_matrix)
+
+    def __set_matrix(self, matrix: array):
+        self.distance_matrix = matrix
+        # Rows are served as zero-copy numpy views of the same buffer when numpy is installed
+        self.matrix_view = None if np is None else np.frombuffer(matrix, dtype=np.float64)
+        self.dense = True
+
+    def build_neighbour_index(self):
+        """
+        T(n) = O(n**2 log n)
+        S(n) = O(n**2)
+        Sorts every hub's neighbours by distance, ties are kept in hub ID order
+        :return:
+        """
+        if not self.dense:
+            self.compile_dense()
+        n = self.hub_count
+        if np is not None:
+            self.neighbour_index = np.argsort(self.matrix_view.reshape(n, n), axis=1, kind='stable').tolist()
+        else:
+            self.neighbour_index = [sorted(range(n), key=self.distance_row(a).__getitem__) for a in range(n)]
+
+    def nearest_hubs(self, id_a: int) -> list[int]:
+        """
+        Returns every hub ID ordered by its distance from the provided hub ID
+        :param id_a:
+        :return List of hub IDs:
+        """
+        if self.neighbour_index is None:
+            self.build_neighbour_index()
+        return self.neighbour_index[id_a]
+
+    def get_distance_by_id(self, id_a: int, id_b: int) -> float:
+        """
+        Returns the distance between the two provided hub IDs
+        :param id_a:
+        :param id_b:
+        :return Distance float value:
+        """
+        if self.dense:
+            return self.distance_matrix[id_a * self.hub_count + id_b]
+        return self.graph_edge.fetch_bucket(self.hubs[id_a]).fetch_bucket(self.hubs[id_b])
+
+    def distance_row(self, id_a: int):
+        """
+        Returns the distances from the provided hub ID to every hub, indexed by hub ID.
+        The row is a view into the dense matrix so no distances are copied
+        :param id_a:
+        :return Row of distances:
+        """
+        if not self.dense:
+            self.compile_dense()
+        start = id_a * self.hub_count
+        if self.matrix_view is None:
+            return memoryview(self.distance_matrix)[start:start + self.hub_count]
+        return self.matrix_view[start:start + self.hub_count]
 
     def get_distance(self, hub_a: obj_id, hub_b: obj_id) -> float:
         """
@@ -46,6 +153,10 @@ class DHGraph(Generic[obj_id]):
         :param hub_b:
         :return Distance float value:
         """
-        dist_edge = self.graph_edge.fetch_bucket(hub_a).fetch_bucket(hub_b)
+        if self.dense:
+            dist_edge = self.distance_matrix[self.hub_ids.fetch_bucket(hub_a) * self.hub_count
+                                             + self.hub_ids.fetch_bucket(hub_b)]
+        else:
+            dist_edge = self.graph_edge.fetch_bucket(hub_a).fetch_bucket(hub_b)
         # logger.debug(f'Hub_A: {hub_a} Hub_B: {hub_b} Distance: {dist_edge}') #  Only enabled for troubleshooting
         return dist_edge
@@ -0,0 +1,127 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import sys
+from array import array
+from pathlib import Path
+from typing import Callable, Optional, TypeVar
+
+from data_services.graph import DHGraph
+from utilities import SOURCE_DIR
+
+obj_id = TypeVar('obj_id')
+
+GRAPH_CACHE_DIR = SOURCE_DIR / 'data_services' / 'graph_cache'
+CACHE_VERSION = 1
+
+
+def __cache_paths(source: Path, cache_dir: Path) -> tuple[Path, Path]:
+    """
+    Returns the metadata and matrix paths cached for a source file. The name includes a digest of the source's
+    full path so two sources with the same file name do not share a cache entry
+    :param source:
+    :param cache_dir:
+    :return tuple(Metadata path, Matrix path):
+    """
+    digest = hashlib.sha1(str(source.resolve()).encode()).hexdigest()[:12]
+    stem = f'{source.stem}-{digest}'
+    return cache_dir / f'{stem}.json', cache_dir / f'{stem}.f64'
+
+
+def __file_digest(source: Path) -> str:
+    """
+    T(n) = O(n)
+    Hashes the contents of the source file
+    :param source:
+    :return Hex SHA-256 digest:
+    """
+    sha = hashlib.sha256()
+    with open(source, 'rb') as src_f:
+        for chunk in iter(lambda: src_f.read(1 << 16), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def __write_atomic(path: Path, write: Callable[[object], None], mode: str) -> None:
+    """
+    Writes to a temporary file first and then moves it over the target, so a reader never sees half a file
+    :param path:
+    :param write:
+    :param mode:
+    :return No return value:
+    """
+    tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    with open(tmp_path, mode) as tmp_f:
+        write(tmp_f)
+    os.replace(tmp_path, path)
+
+
+def load_graph_cache(source: Path, hub_factory: Callable[..., obj_id],
+                     cache_dir: Path = GRAPH_CACHE_DIR) -> Optional[DHGraph[obj_id]]:
+    """
+    T(n) = O(n**2) bytes read, with no per edge Python work
+    S(n) = O(n**2)
+    Loads the compiled graph cached for a source file. The cache is used when the source's modification time
+    and size are unchanged, or otherwise when its contents still hash to the cached digest
+    :param source: Distance table the cache was built from
+    :param hub_factory: Rebuilds a hub from the fields saved for it
+    :param cache_dir:
+    :return Dense graph, or None when there is no usable cache:
+    """
+    meta_path, matrix_path = __cache_paths(source, cache_dir)
+    try:
+        with open(meta_path) as meta_f:
+            meta = json.load(meta_f)
+        stat = source.stat()
+        if meta['version'] != CACHE_VERSION or meta['byteorder'] != sys.byteorder:
+            return None
+        if (meta['mtime_ns'], meta['size']) != (stat.st_mtime_ns, stat.st_size):
+            if meta['sha256'] != __file_digest(source):
+                return None
+            # The file was touched but not changed, record the new time so the next load skips the hash
+            meta['mtime_ns'], meta['size'] = stat.st_mtime_ns, stat.st_size
+            __write_atomic(meta_path, lambda meta_f: json.dump(meta, meta_f), 'w')
+
+        n = len(meta['hubs'])
+        distance_matrix = array('d')
+        with open(matrix_path, 'rb') as matrix_f:
+            distance_matrix.fromfile(matrix_f, n * n)
+        dh_graph = DHGraph[obj_id]()
+        dh_graph.load_dense([hub_factory(*fields) for fields in meta['hubs']], distance_matrix)
+        return dh_graph
+    except (OSError, EOFError, ValueError, KeyError, TypeError):
+        return None
+
+
+def save_graph_cache(source: Path, dh_graph: DHGraph[obj_id], hub_fields: Callable[[obj_id], list[str]],
+                     cache_dir: Path = GRAPH_CACHE_DIR) -> bool:
+    """
+    T(n) = O(n**2)
+    S(n) = O(n)
+    Saves the hub list and the flat float64 distance matrix of a compiled graph, keyed by the source file's
+    modification time, size and hash. The matrix is written before the metadata that validates it
+    :param source: Distance table the graph was built from
+    :param dh_graph:
+    :param hub_fields: Returns the fields that hub_factory rebuilds a hub from
+    :param cache_dir:
+    :return True if the cache was written:
+    """
+    if not dh_graph.dense:
+        dh_graph.compile_dense()
+    meta_path, matrix_path = __cache_paths(source, cache_dir)
+    try:
+        stat = source.stat()
+        meta = {'version': CACHE_VERSION,
+                'byteorder': sys.byteorder,
+                'source': source.name,
+                'sha256': __file_digest(source),
+                'mtime_ns': stat.st_mtime_ns,
+                'size': stat.st_size,
+                'hubs': [hub_fields(hub) for hub in dh_graph.hubs]}
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        __write_atomic(matrix_path, dh_graph.distance_matrix.tofile, 'wb')
+        __write_atomic(meta_path, lambda meta_f: json.dump(meta, meta_f), 'w')
+        return True
+    except OSError:
+        return False
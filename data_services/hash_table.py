@@ -1,9 +1,17 @@
 from utilities import prime_num_gen
-from typing import Generic, TypeVar, Optional
+from typing import Callable, Generic, TypeVar, Optional, Union
+import os
 
 hsh_ind = TypeVar('hsh_ind')
 hsh_val = TypeVar('hsh_val')
 
+# Sentinels used by the open addressing engine to mark unused and deleted slots
+_EMPTY = object()
+_DELETED = object()
+
+# Called with the number of slots, or bucket entries, each lookup visits. Set while instrumentation is enabled
+probe_hook: Optional[Callable[[int], None]] = None
+
 
 class HashTable(Generic[hsh_ind, hsh_val]):
     bucket_max = 2
@@ -49,6 +57,20 @@ class HashTable(Generic[hsh_ind, hsh_val]):
                 return bucket_val
         return None
 
+    def remove(self, index: hsh_ind) -> Optional[hsh_val]:
+        """
+        Removes the provided index from the table
+        :param index:
+        :return The removed value or None:
+        """
+        tmp_table = self.__fetch_bucket(index)
+        for (h, (i, v)) in enumerate(tmp_table):
+            if i == index:
+                del tmp_table[h]
+                self.size -= 1
+                return v
+        return None
+
     def __fetch_bucket(self, index: hsh_ind) -> list[tuple[hsh_ind, hsh_val]]:
         """
         Returns a list of values at the specified hash index location
@@ -56,7 +78,10 @@ class HashTable(Generic[hsh_ind, hsh_val]):
         :return:
         """
         bucket_index = hash(index) % self.tbl_storage_size
-        return self.__tbl_storage[bucket_index]
+        bucket = self.__tbl_storage[bucket_index]
+        if probe_hook is not None:
+            probe_hook(1 + len(bucket))
+        return bucket
 
     def init_storage(self):
         self.__tbl_storage = [[] for _ in range(self.tbl_storage_size)]
@@ -87,3 +112,185 @@ class HashTable(Generic[hsh_ind, hsh_val]):
         for item in self.__tbl_storage:
             yield from item
 
+
+class OpenAddressHashTable(Generic[hsh_ind, hsh_val]):
+    """
+    Open addressing storage engine exposing the same interface as the chaining HashTable.
+    Keys, values and their cached hash codes are stored in parallel arrays and collisions are
+    resolved by perturbed probing over a power of two table. Deleted slots are marked with a tombstone
+    so probe sequences stay intact until the next resize.
+    """
+    load_factor_max = 2 / 3
+    growth_factor = 2
+    min_storage_size = 8
+
+    def __init__(self, storage_size: int = min_storage_size):
+        self.tbl_storage_size = self.min_storage_size
+        while self.tbl_storage_size < storage_size:
+            self.tbl_storage_size *= self.growth_factor
+        self.size = 0
+        self.tombstones = 0  # Used to track deleted slots which still occupy a probe position
+        self.init_storage()
+
+    def init_storage(self):
+        self.__keys: list = [_EMPTY] * self.tbl_storage_size
+        self.__values: list = [None] * self.tbl_storage_size
+        self.__hashes: list[int] = [0] * self.tbl_storage_size
+
+    def __find_slot(self, index: hsh_ind, hash_code: int) -> int:
+        """
+        Returns the slot holding the provided index, or the slot it should be inserted into.
+        The first tombstone passed along the probe sequence is reused for inserts
+        :param index:
+        :param hash_code:
+        :return Slot position:
+        """
+        keys = self.__keys
+        hashes = self.__hashes
+        mask = self.tbl_storage_size - 1
+        perturb = hash_code & 0xFFFFFFFFFFFFFFFF
+        slot = hash_code & mask
+        free_slot = -1
+        probes = 1
+        while True:
+            key = keys[slot]
+            if key is _EMPTY:
+                if probe_hook is not None:
+                    probe_hook(probes)
+                return slot if free_slot < 0 else free_slot
+            if key is _DELETED:
+                if free_slot < 0:
+                    free_slot = slot
+            elif hashes[slot] == hash_code and (key is index or key == index):
+                if probe_hook is not None:
+                    probe_hook(probes)
+                return slot
+            perturb >>= 5
+            slot = (slot * 5 + perturb + 1) & mask
+            probes += 1
+
+    def insert(self, index: hsh_ind, value: hsh_val):
+        """
+        The method inserts new key-value pairs into the table or updates existing keys
+        :param index:
+        :param value:
+        :return:
+        """
+        hash_code = hash(index)
+        slot = self.__find_slot(index, hash_code)
+        key = self.__keys[slot]
+        if key is _EMPTY or key is _DELETED:
+            if key is _DELETED:
+                self.tombstones -= 1
+            self.__keys[slot] = index
+            self.__hashes[slot] = hash_code
+            self.size += 1
+        self.__values[slot] = value
+
+        if self.size + self.tombstones > self.tbl_storage_size * self.load_factor_max:
+            self.resize_table()
+
+    def fetch_bucket(self, index: hsh_ind) -> Optional[hsh_val]:
+        """
+        Returns a value if the hash index value matches the provided index
+        :param index:
+        :return Object or None:
+        """
+        slot = self.__find_slot(index, hash(index))
+        key = self.__keys[slot]
+        if key is _EMPTY or key is _DELETED:
+            return None
+        return self.__values[slot]
+
+    def remove(self, index: hsh_ind) -> Optional[hsh_val]:
+        """
+        Removes the provided index from the table, leaving a tombstone in its slot
+        :param index:
+        :return The removed value or None:
+        """
+        slot = self.__find_slot(index, hash(index))
+        key = self.__keys[slot]
+        if key is _EMPTY or key is _DELETED:
+            return None
+        value = self.__values[slot]
+        self.__keys[slot] = _DELETED
+        self.__values[slot] = None
+        self.size -= 1
+        self.tombstones += 1
+        return value
+
+    def resize_table(self):
+        """
+        Grows the table geometrically, or rebuilds it at the same size when most of the
+        load is made up of tombstones
+        :return:
+        """
+        prev_keys, prev_values, prev_hashes = self.__keys, self.__values, self.__hashes
+        while self.size * self.growth_factor > self.tbl_storage_size * self.load_factor_max:
+            self.tbl_storage_size *= self.growth_factor
+        self.tombstones = 0
+        self.init_storage()
+
+        keys, values, hashes = self.__keys, self.__values, self.__hashes
+        mask = self.tbl_storage_size - 1
+        for (key, value, hash_code) in zip(prev_keys, prev_values, prev_hashes):
+            if key is _EMPTY or key is _DELETED:
+                continue
+            # Every key is unique and there are no tombstones yet, so the first empty slot is used
+            perturb = hash_code & 0xFFFFFFFFFFFFFFFF
+            slot = hash_code & mask
+            while keys[slot] is not _EMPTY:
+                perturb >>= 5
+                slot = (slot * 5 + perturb + 1) & mask
+            keys[slot] = key
+            values[slot] = value
+            hashes[slot] = hash_code
+
+    # Dunder method for checking if a provided index input is valid
+    def __contains__(self, index: hsh_ind):
+        key = self.__keys[self.__find_slot(index, hash(index))]
+        return key is not _EMPTY and key is not _DELETED
+
+    # Creates an iterator over the occupied slots
+    def __iter__(self):
+        for (key, value) in zip(self.__keys, self.__values):
+            if key is not _EMPTY and key is not _DELETED:
+                yield key, value
+
+
+Table = Union[HashTable[hsh_ind, hsh_val], OpenAddressHashTable[hsh_ind, hsh_val]]
+
+# Storage engines which can be selected when a new table is created
+TABLE_ENGINES = {'chaining': HashTable, 'open_addressing': OpenAddressHashTable}
+table_engine = os.environ.get('WGUPS_TABLE_ENGINE', 'open_addressing')
+
+
+def set_table_engine(engine: str) -> None:
+    """
+    Selects the storage engine used by new_table, this allows both engines to be benchmarked side by side
+    :param engine:
+    :return No return value:
+    """
+    global table_engine
+    if engine not in TABLE_ENGINES:
+        raise ValueError(f'Unknown hash table engine: {engine}')
+    table_engine = engine
+
+
+def set_probe_hook(hook: Optional[Callable[[int], None]]) -> None:
+    """
+    Sets the function both engines report the probes of each lookup to, None stops the reports
+    :param hook:
+    :return No return value:
+    """
+    global probe_hook
+    probe_hook = hook
+
+
+def new_table(engine: Optional[str] = None) -> Table:
+    """
+    Creates an empty table using the provided engine or the currently selected default engine
+    :param engine:
+    :return Empty hash table:
+    """
+    return TABLE_ENGINES[engine or table_engine]()
@@ -0,0 +1,106 @@
+from __future__ import annotations
+import posixpath
+import zipfile
+from pathlib import Path
+from typing import Iterator, Optional
+from xml.etree import ElementTree
+
+# SpreadsheetML namespaces used by the workbook parts that are read
+MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+PKG_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+
+def __column_index(cell_ref: str) -> int:
+    """
+    Converts the column letters of a cell reference such as 'AC12' into a zero based column index
+    :param cell_ref:
+    :return Column index:
+    """
+    index = 0
+    for char in cell_ref:
+        if not char.isalpha():
+            break
+        index = index * 26 + ord(char.upper()) - ord('A') + 1
+    return index - 1
+
+
+def __text(element: Optional[ElementTree.Element]) -> str:
+    """
+    Joins the text runs of a shared or inline string, rich text is stored as several runs
+    :param element:
+    :return String value:
+    """
+    if element is None:
+        return ''
+    return ''.join(t.text or '' for t in element.iter(f'{MAIN_NS}t'))
+
+
+def __shared_strings(workbook: zipfile.ZipFile) -> list[str]:
+    """
+    T(n) = O(n)
+    Reads the shared string table every text cell refers to by index
+    :param workbook:
+    :return List of strings:
+    """
+    if 'xl/sharedStrings.xml' not in workbook.namelist():
+        return []
+    strings = []
+    with workbook.open('xl/sharedStrings.xml') as sst_f:
+        for (_, element) in ElementTree.iterparse(sst_f):
+            if element.tag == f'{MAIN_NS}si':
+                strings.append(__text(element))
+                element.clear()
+    return strings
+
+
+def __sheet_path(workbook: zipfile.ZipFile, sheet: int) -> str:
+    """
+    Resolves the archive path of a worksheet from its position in the workbook
+    :param workbook:
+    :param sheet:
+    :return Path of the worksheet part:
+    """
+    sheets = ElementTree.fromstring(workbook.read('xl/workbook.xml')).find(f'{MAIN_NS}sheets')
+    rel_id = sheets[sheet].get(f'{REL_NS}id')
+    for rel in ElementTree.fromstring(workbook.read('xl/_rels/workbook.xml.rels')):
+        if rel.get('Id') == rel_id:
+            target = rel.get('Target')
+            return target.lstrip('/') if target.startswith('/') else posixpath.join('xl', target)
+    raise ValueError(f'Worksheet {sheet} is missing from the workbook')
+
+
+def iter_rows(xlsx_file: Path, sheet: int = 0) -> Iterator[list[Optional[str]]]:
+    """
+    T(n) = O(n) for n cells
+    S(n) = O(s + c) for s shared strings and c cells in a row
+    Streams the rows of a worksheet as lists of cell strings, without loading the sheet into memory.
+    Missing cells are returned as None and each row is cleared once it has been yielded. Numbers are
+    returned as they are stored so the caller decides how to convert them
+    :param xlsx_file:
+    :param sheet: Position of the worksheet in the workbook
+    :return Generator of rows:
+    """
+    with zipfile.ZipFile(xlsx_file) as workbook:
+        strings = __shared_strings(workbook)
+        with workbook.open(__sheet_path(workbook, sheet)) as sheet_f:
+            for (_, element) in ElementTree.iterparse(sheet_f):
+                if element.tag != f'{MAIN_NS}row':
+                    continue
+                row: list[Optional[str]] = []
+                for cell in element.iter(f'{MAIN_NS}c'):
+                    column = __column_index(cell.get('r', '')) if cell.get('r') else len(row)
+                    row.extend([None] * (column - len(row)))
+                    cell_type = cell.get('t')
+                    if cell_type == 'inlineStr':
+                        row.append(__text(cell.find(f'{MAIN_NS}is')))
+                        continue
+                    value = cell.find(f'{MAIN_NS}v')
+                    if value is None or value.text is None:
+                        row.append(None)
+                    elif cell_type == 's':
+                        row.append(strings[int(value.text)])
+                    else:
+                        row.append(value.text)
+                element.clear()
+                yield row
@@ -4,6 +4,8 @@ import utilities
 
 
 class DeliveryHub:
+    __slots__ = ('dh_name', 'dh_address')
+
     def __init__(self, dh_name: str, dh_address: str):
         self.dh_name = dh_name
         # Normalizes addresses as they are used for hash keys
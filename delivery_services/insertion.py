@@ -0,0 +1,331 @@
+from __future__ import annotations
+import heapq
+from itertools import count
+from typing import Iterable, NamedTuple, Optional, Sequence, Union, TYPE_CHECKING
+
+from data_services.hash_table import Table, new_table
+from delivery_services.pkg_handler import EOD
+from delivery_services.route_optimizer import RouteCost
+from delivery_services.truck import HUB_ID, TRUCK_CAPACITY, TRUCK_SPEED, wait_at_hub
+
+if TYPE_CHECKING:
+    from delivery_services.delivery_hub import DeliveryHub
+    from delivery_services.pkg_handler import PkgObject
+    from delivery_services.truck import Truck
+    from data_services.graph import DHGraph
+
+NEIGHBOURS = 8  # Hubs around a new stop whose packages are costed again for the route the stop joined
+RELOCATE_PASSES = 4  # Most passes over the placed packages looking for a cheaper place on any route
+MINUTES_PER_MILE = 60 / TRUCK_SPEED
+EPSILON = 1e-9
+
+
+class Insertion(NamedTuple):
+    """
+    Where a package's hub goes on a route and what it costs. A hub already on the route is delivered at that stop
+    """
+    cost: RouteCost  # Lateness of the inserted packages and miles added to the route
+    position: int
+    joins_stop: bool
+
+
+class InsertionRoute:
+    """
+    A route being built for one truck. Each stop keeps its arrival time and the route keeps the slack from every
+    stop onwards, the most the stops from there to the end can be delayed without any of them missing a deadline.
+    Inserting a stop before stop i delays every later stop by the same amount, so an insertion is checked against
+    slack[i] in O(1) and a hub is costed at every position in O(s) for the s stops on the route.
+    """
+
+    def __init__(self, dh_graph: DHGraph[Union[DeliveryHub, str]], depart_time: float):
+        self.distance_matrix = dh_graph.distance_matrix
+        self.hub_count = dh_graph.hub_count
+        self.depart_time = depart_time
+        self.stops: list[int] = []  # Hub IDs in delivery order
+        self.stop_pkgs: list[list[PkgObject]] = []
+        self.deadlines: list[float] = []  # Earliest delivery promise of the packages at each stop
+        self.arrivals: list[float] = []
+        self.slack: list[float] = []
+        self.load = 0
+        self.version = 0  # Changes on every insertion, costs worked out for an older version are stale
+
+    def __distance(self, hub_a: int, hub_b: int) -> float:
+        return self.distance_matrix[hub_a * self.hub_count + hub_b]
+
+    def stop_cost(self, hub_id: int, deadline: float) -> Optional[Insertion]:
+        """
+        T(n) = O(s) for the s stops on the route
+        Finds the cheapest place for a hub on the route without making any stop already on the route late. The
+        hub's own lateness is part of the cost, a deadline that cannot be met is missed by as little as possible
+        :param hub_id:
+        :param deadline:
+        :return Cheapest Insertion or None when the hub does not fit:
+        """
+        if hub_id in self.stops:
+            s = self.stops.index(hub_id)
+            return Insertion(RouteCost(max(0.0, self.arrivals[s] - deadline), 0.0), s, True)
+
+        best = None
+        prev, prev_arrival = HUB_ID, self.depart_time
+        for position in range(len(self.stops) + 1):
+            following = self.stops[position] if position < len(self.stops) else HUB_ID
+            added = (self.__distance(prev, hub_id) + self.__distance(hub_id, following)
+                     - self.__distance(prev, following))
+            if position == len(self.stops) or added * MINUTES_PER_MILE <= self.slack[position] + EPSILON:
+                lateness = max(0.0, prev_arrival + self.__distance(prev, hub_id) * MINUTES_PER_MILE - deadline)
+                cost = RouteCost(lateness, added)
+                if best is None or cost.improves_on(best.cost):
+                    best = Insertion(cost, position, False)
+            if position < len(self.stops):
+                prev, prev_arrival = following, self.arrivals[position]
+        return best
+
+    def insert(self, pkgs: Sequence[PkgObject], insertion: Insertion) -> None:
+        """
+        T(n) = O(s)
+        Adds packages going to one hub at the provided insertion and updates the arrival times and slack
+        :param pkgs:
+        :param insertion:
+        :return No return value:
+        """
+        deadline = min(pkg.delivery_promise for pkg in pkgs)
+        if insertion.joins_stop:
+            self.stop_pkgs[insertion.position].extend(pkgs)
+            self.deadlines[insertion.position] = min(self.deadlines[insertion.position], deadline)
+        else:
+            self.stops.insert(insertion.position, pkgs[0].hub_id)
+            self.stop_pkgs.insert(insertion.position, list(pkgs))
+            self.deadlines.insert(insertion.position, deadline)
+        self.load += len(pkgs)
+        self.version += 1
+        self.__update_times()
+
+    def remove(self, pkgs: Sequence[PkgObject]) -> None:
+        """
+        T(n) = O(m) for the m packages on the route
+        Takes packages off the route, dropping the stops left without packages, and updates the arrival times and
+        slack
+        :param pkgs:
+        :return No return value:
+        """
+        removed = {pkg.pkg_id for pkg in pkgs}
+        stops, stop_pkgs = [], []
+        for (hub_id, at_stop) in zip(self.stops, self.stop_pkgs):
+            if len(kept := [pkg for pkg in at_stop if pkg.pkg_id not in removed]) != 0:
+                stops.append(hub_id)
+                stop_pkgs.append(kept)
+        self.stops, self.stop_pkgs = stops, stop_pkgs
+        self.deadlines = [min(pkg.delivery_promise for pkg in at_stop) for at_stop in stop_pkgs]
+        self.load -= len(pkgs)
+        self.version += 1
+        self.__update_times()
+
+    def cost(self) -> RouteCost:
+        """
+        T(n) = O(m) for the m packages on the route
+        :return Lateness of every package on the route and the miles driven from the hub and back:
+        """
+        lateness = sum(max(0.0, arrival - pkg.delivery_promise)
+                       for (arrival, at_stop) in zip(self.arrivals, self.stop_pkgs) for pkg in at_stop)
+        miles = 0.0
+        prev = HUB_ID
+        for hub_id in self.stops + [HUB_ID]:
+            miles += self.__distance(prev, hub_id)
+            prev = hub_id
+        return RouteCost(lateness, miles)
+
+    def __update_times(self) -> None:
+        self.arrivals = []
+        prev, arrival = HUB_ID, self.depart_time
+        for hub_id in self.stops:
+            arrival += self.__distance(prev, hub_id) * MINUTES_PER_MILE
+            self.arrivals.append(arrival)
+            prev = hub_id
+        self.slack = [0.0] * len(self.stops)
+        slack = float('inf')
+        for s in range(len(self.stops) - 1, -1, -1):
+            slack = min(slack, self.deadlines[s] - self.arrivals[s])
+            self.slack[s] = slack
+
+    def place_unit(self, unit: Sequence[PkgObject], commit: bool) -> Optional[RouteCost]:
+        """
+        T(n) = O(k * s) for the k hubs of the unit
+        Costs, and with commit inserts, a package or a delivery group. The hubs of a group are inserted one at a
+        time, each at its cheapest place, on a copy of the route unless committing
+        :param unit: Packages which have to ride this route together
+        :param commit:
+        :return Total cost of the unit or None when it does not fit:
+        """
+        if self.load + len(unit) > TRUCK_CAPACITY:
+            return None
+        hubs: dict[int, list[PkgObject]] = {}
+        for pkg in unit:
+            hubs.setdefault(pkg.hub_id, []).append(pkg)
+        if len(hubs) == 1 and not commit:
+            insertion = self.stop_cost(unit[0].hub_id, min(pkg.delivery_promise for pkg in unit))
+            return None if insertion is None else insertion.cost
+
+        route = self if commit else self.copy()
+        lateness = miles = 0.0
+        for (hub_id, pkgs) in hubs.items():
+            if (insertion := route.stop_cost(hub_id, min(pkg.delivery_promise for pkg in pkgs))) is None:
+                return None
+            route.insert(pkgs, insertion)
+            lateness += insertion.cost.violation
+            miles += insertion.cost.miles
+        return RouteCost(lateness, miles)
+
+    def copy(self) -> InsertionRoute:
+        route = InsertionRoute.__new__(InsertionRoute)
+        route.distance_matrix, route.hub_count = self.distance_matrix, self.hub_count
+        route.depart_time, route.load, route.version = self.depart_time, self.load, self.version
+        route.stops, route.deadlines = list(self.stops), list(self.deadlines)
+        route.arrivals, route.slack = list(self.arrivals), list(self.slack)
+        route.stop_pkgs = [list(pkgs) for pkgs in self.stop_pkgs]
+        return route
+
+    def pkgs(self) -> list[PkgObject]:
+        return [pkg for pkgs in self.stop_pkgs for pkg in pkgs]
+
+
+class InsertionPlanner:
+    """
+    Loads the trucks waiting at the hub by parallel cheapest insertion with time windows. Packages with a
+    deadline are placed before end of day packages, each where it adds the least lateness and then the fewest
+    miles over every truck's route, and no insertion makes a package already on a route late. End of day packages
+    then fill the remaining room the same way. Once every unit is placed, each is moved to wherever it costs the
+    least over all the routes until no move helps.
+    Costs are kept in a heap and only worked out again when they are popped after their route has changed, or
+    when a stop is added near their hub, so a route does not cost every pending package again on every insertion.
+    """
+
+    def __init__(self, dh_graph: DHGraph[Union[DeliveryHub, str]], trucks: list[Truck]):
+        if not dh_graph.dense:
+            dh_graph.compile_dense()
+        self.dh_graph = dh_graph
+        self.trucks = trucks
+
+    def load_trucks(self, pkgs: Iterable[PkgObject]) -> int:
+        """
+        Assume:
+        u = number of packages or delivery groups at the hub
+        t = number of trucks
+            T(n) = O(u * t * log(u * t)) to cost every unit once, then O(NEIGHBOURS) units costed per insertion
+            S(n) = O(u * t)
+        Builds a route for every truck from the packages at the hub and loads the trucks in delivery order
+        :param pkgs: Packages which have not been delivered
+        :return Number of packages loaded:
+        """
+        routes = [InsertionRoute(self.dh_graph, truck.get_time_elapsed()) for truck in self.trucks]
+        units: list[tuple[PkgObject, ...]] = []
+        loaded_ids: set[int] = set()
+        for pkg in pkgs:
+            if pkg.pkg_id not in loaded_ids and pkg.check_at_hub_status() and pkg.hub_id is not None:
+                units.append(unit := tuple(pkg.pending_group()))
+                loaded_ids.update(member.pkg_id for member in unit)
+        urgent = [min(pkg.delivery_promise for pkg in unit) < EOD for unit in units]
+        eligible = [[unit[0].pkg_delivery_eligibility(truck) for unit in units] for truck in self.trucks]
+        hub_units: Table[int, list[int]] = new_table()
+        for (u, unit) in enumerate(units):
+            for hub_id in {pkg.hub_id for pkg in unit}:
+                if (at_hub := hub_units.fetch_bucket(hub_id)) is None:
+                    at_hub = []
+                    hub_units.insert(hub_id, at_hub)
+                at_hub.append(u)
+
+        heap: list[tuple[int, float, float, int, int, int, int]] = []
+        seq = count()
+
+        def push(u: int, t: int) -> None:
+            if (cost := routes[t].place_unit(units[u], False)) is not None:
+                heapq.heappush(heap, (0 if urgent[u] else 1, cost.violation, cost.miles, next(seq), u, t,
+                                      routes[t].version))
+
+        for t in range(len(self.trucks)):
+            for u in range(len(units)):
+                if eligible[t][u]:
+                    push(u, t)
+        placed = [False] * len(units)
+        route_of = [-1] * len(units)
+        loaded = 0
+        while len(heap) != 0:
+            (*_, u, t, version) = heapq.heappop(heap)
+            if placed[u]:
+                continue
+            if version != routes[t].version:
+                push(u, t)
+                continue
+            routes[t].place_unit(units[u], True)
+            placed[u] = True
+            route_of[u] = t
+            loaded += len(units[u])
+            # A new stop can make the packages around it cheaper to add to this route
+            for hub_id in {pkg.hub_id for pkg in units[u]}:
+                for near_hub in self.dh_graph.nearest_hubs(hub_id)[:NEIGHBOURS]:
+                    for v in hub_units.fetch_bucket(near_hub) or []:
+                        if not placed[v] and eligible[t][v]:
+                            push(v, t)
+        self.__relocate(routes, units, eligible, route_of)
+
+        for (truck, route) in zip(self.trucks, routes):
+            for pkg in route.pkgs():
+                truck.load_truck(pkg)
+        return loaded
+
+    @staticmethod
+    def __relocate(routes: list[InsertionRoute], units: list[tuple[PkgObject, ...]], eligible: list[list[bool]],
+                   route_of: list[int]) -> None:
+        """
+        Assume:
+        u = number of placed packages or delivery groups
+        t = number of trucks
+        s = most stops on a route
+            T(n) = O(RELOCATE_PASSES * u * t * s)
+        Insertion places every unit against the routes as they were at the time, so a unit placed early can end up
+        on the wrong route once the rest are placed. Each unit is taken off its route and put back where it costs
+        the least over every route, and a move is kept when the two routes together are less late or shorter
+        :param routes:
+        :param units:
+        :param eligible:
+        :param route_of: Route index of every unit, -1 for units which were not placed
+        :return No return value:
+        """
+        for _ in range(RELOCATE_PASSES):
+            moved = False
+            for (u, t) in enumerate(route_of):
+                if t == -1:
+                    continue
+                without = routes[t].copy()
+                without.remove(units[u])
+                best: Optional[tuple[RouteCost, int, InsertionRoute, InsertionRoute]] = None
+                for (t2, target) in enumerate(routes):
+                    if not eligible[t2][u]:
+                        continue
+                    moved_to = without.copy() if t2 == t else target.copy()
+                    if moved_to.place_unit(units[u], True) is None:
+                        continue
+                    before, after = routes[t].cost(), moved_to.cost()
+                    if t2 != t:
+                        before = RouteCost(*(a + b for (a, b) in zip(before, target.cost())))
+                        after = RouteCost(*(a + b for (a, b) in zip(after, without.cost())))
+                    gain = RouteCost(after.violation - before.violation, after.miles - before.miles)
+                    if gain.improves_on(RouteCost(0.0, 0.0)) and (best is None or gain.improves_on(best[0])):
+                        best = (gain, t2, without, moved_to)
+                if best is not None:
+                    (_, t2, without, moved_to) = best
+                    if t2 != t:
+                        routes[t] = without
+                    routes[t2] = moved_to
+                    route_of[u] = t2
+                    moved = True
+            if not moved:
+                return
+
+    def wait_for_pkgs(self, pkgs: Iterable[PkgObject]) -> bool:
+        """
+        T(n) = O(n log n)
+        Keeps every empty truck at the hub until the next package becomes available, see truck.wait_at_hub
+        :param pkgs: Packages which have not been delivered
+        :return True when a truck waited, False when no package becomes available later:
+        """
+        return wait_at_hub(self.trucks, pkgs)
@@ -0,0 +1,70 @@
+from __future__ import annotations
+from data_services.hash_table import Table, new_table
+from typing import Iterable, Optional, Union, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from delivery_services.delivery_hub import DeliveryHub
+    from delivery_services.pkg_handler import PkgObject
+    from data_services.graph import DHGraph
+
+
+class PendingPkgIndex:
+    """
+    Groups pending packages by the hub ID of their destination so the nearest pending package can be found
+    by walking the graph's precomputed neighbour list instead of measuring every candidate
+    """
+
+    def __init__(self, dh_graph: DHGraph[Union[DeliveryHub, str]], pkgs: Iterable[PkgObject]):
+        self.dh_graph = dh_graph
+        self.pending: Table[int, list[PkgObject]] = new_table()
+        # Ranks keep the candidates' original iteration order which is used to break distance ties
+        self.rank: Table[int, int] = new_table()
+        self.size = 0
+        for (r, pkg) in enumerate(pkgs):
+            self.rank.insert(pkg.pkg_id, r)
+            if (hub_pkgs := self.pending.fetch_bucket(pkg.hub_id)) is None:
+                hub_pkgs = []
+                self.pending.insert(pkg.hub_id, hub_pkgs)
+            hub_pkgs.append(pkg)
+            self.size += 1
+
+    def __len__(self) -> int:
+        return self.size
+
+    def discard(self, pkg: PkgObject) -> None:
+        """
+        Removes a package from the index if it is still pending
+        :param pkg:
+        :return No return value:
+        """
+        hub_pkgs = self.pending.fetch_bucket(pkg.hub_id)
+        if hub_pkgs is None or pkg not in hub_pkgs:
+            return
+        hub_pkgs.remove(pkg)
+        self.size -= 1
+        if len(hub_pkgs) == 0:
+            self.pending.remove(pkg.hub_id)
+
+    def nearest(self, location: int) -> Optional[PkgObject]:
+        """
+        T(n) = O(h) where h is the number of hubs closer than the nearest pending package
+        S(n) = O(1)
+        Walks the neighbours of the provided hub ID in distance order and stops at the first hub with a
+        pending package. Hubs at the same distance are compared so ties resolve the same way as a full scan
+        :param location:
+        :return Nearest pending PkgObject or None:
+        """
+        if self.size == 0:
+            return None
+        closest_pkg = None
+        min_dist = float('inf')
+        for hub in self.dh_graph.nearest_hubs(location):
+            distance = self.dh_graph.get_distance_by_id(location, hub)
+            if distance > min_dist:
+                break
+            for pkg in self.pending.fetch_bucket(hub) or []:
+                if closest_pkg is None or self.rank.fetch_bucket(pkg.pkg_id) < self.rank.fetch_bucket(
+                        closest_pkg.pkg_id):
+                    closest_pkg = pkg
+                    min_dist = distance
+        return closest_pkg
@@ -0,0 +1,98 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
+
+from data_services.hash_table import Table, new_table
+
+if TYPE_CHECKING:
+    from delivery_services.pkg_handler import PkgObject
+
+
+class PkgGroupIndex:
+    """
+    Union-find over package IDs used to build the "delivered with" groups while packages are imported. A note
+    may name a package that has not been read yet, so packages are only attached to their groups once the
+    whole manifest has been read.
+    """
+
+    def __init__(self):
+        self.parent: Table[int, int] = new_table()
+        self.size: Table[int, int] = new_table()
+        self.grouped: list[PkgObject] = []  # Packages whose note names another package or which are named
+
+    def find(self, pkg_id: int) -> int:
+        """
+        T(n) = O(a(n)) amortized
+        Returns the root ID of the package's group, halving the path on the way up
+        :param pkg_id:
+        :return Root package ID:
+        """
+        if (parent := self.parent.fetch_bucket(pkg_id)) is None:
+            self.parent.insert(pkg_id, pkg_id)
+            self.size.insert(pkg_id, 1)
+            return pkg_id
+        while parent != pkg_id:
+            grandparent = self.parent.fetch_bucket(parent)
+            self.parent.insert(pkg_id, grandparent)
+            pkg_id, parent = grandparent, self.parent.fetch_bucket(grandparent)
+        return pkg_id
+
+    def union(self, id_a: int, id_b: int) -> int:
+        """
+        T(n) = O(a(n)) amortized
+        Merges the groups of two package IDs, the smaller group joins the larger one
+        :param id_a:
+        :param id_b:
+        :return Root package ID of the merged group:
+        """
+        root_a, root_b = self.find(id_a), self.find(id_b)
+        if root_a == root_b:
+            return root_a
+        size_a, size_b = self.size.fetch_bucket(root_a), self.size.fetch_bucket(root_b)
+        if size_a < size_b:
+            root_a, root_b = root_b, root_a
+        self.parent.insert(root_b, root_a)
+        self.size.insert(root_a, size_a + size_b)
+        return root_a
+
+    def add(self, pkg: PkgObject) -> None:
+        """
+        Records the packages named in a package's note
+        :param pkg:
+        :return No return value:
+        """
+        if len(pkg.depend_pkgs) != 0:
+            self.grouped.append(pkg)
+            for depend_id in pkg.depend_pkgs:
+                self.union(pkg.pkg_id, depend_id)
+
+    def assign_groups(self, pkgs: Table[int, PkgObject]) -> int:
+        """
+        T(n) = O(g) for the g grouped packages
+        S(n) = O(g)
+        Gives every grouped package the shared tuple of its group, in package ID order, and links each package to
+        the packages named in its note. IDs named in a note but missing from the manifest are left out
+        :param pkgs:
+        :return Number of groups:
+        """
+        members: Table[int, set[PkgObject]] = new_table()
+        for pkg in self.grouped:
+            for pkg_id in (pkg.pkg_id, *pkg.depend_pkgs):
+                if (member := pkgs.fetch_bucket(pkg_id)) is None:
+                    continue
+                if member is not pkg:
+                    pkg.pkg_dependencies.add(member)
+                    member.pkg_dependencies.add(pkg)
+                root = self.find(pkg_id)
+                if (group := members.fetch_bucket(root)) is None:
+                    group = set()
+                    members.insert(root, group)
+                group.add(member)
+
+        count = 0
+        for (_, group) in members:
+            if len(group) > 1:
+                count += 1
+                shared = tuple(sorted(group, key=lambda member: member.pkg_id))
+                for member in shared:
+                    member.group = shared
+        return count
@@ -1,28 +1,87 @@
 from __future__ import annotations
-from utilities import convert_minutes, normalize_address, SOURCE_DIR
-import logging
+from log_services import get_logger
+from utilities import convert_minutes, normalize_address, register_parse_cache, SOURCE_DIR
 import re
+import sys
 from enum import auto, Enum
-from typing import Optional, cast, TYPE_CHECKING
-
-# Creates a logger using the module name
-logger = logging.getLogger(__name__)
-# Specifies that only DEBUG level logs should be saved
-logger.setLevel(logging.DEBUG)
-# Specifies the name and path for the log file
-pkg_log_file = SOURCE_DIR / 'delivery_services' / 'delivery_logs' / 'pkg_handler.log'
-routing_handler = logging.FileHandler(pkg_log_file)
-# Specifies a format for the logs being recorded
-formatter = logging.Formatter('%(asctime)s : %(levelname)s : %(name)s : %(message)s')
-# Sets the handler's formatter
-routing_handler.setFormatter(formatter)
-# Adds the file handler to the logger
-logger.addHandler(routing_handler)
+from functools import lru_cache
+from typing import NamedTuple, Optional, cast, TYPE_CHECKING
+
+# Records are queued and written as JSON lines by a background listener, see log_services
+logger = get_logger(__name__, SOURCE_DIR / 'delivery_services' / 'delivery_logs' / 'pkg_handler.log')
 
 if TYPE_CHECKING:
     from delivery_services.truck import Truck
 
 EOD = 60 * 24
+NO_DEPENDENCIES = frozenset[int]()
+
+DEADLINE_CACHE_SIZE = 1 << 10  # Distinct deadline strings remembered by parse_time
+NOTE_CACHE_SIZE = 1 << 12  # Distinct special notes remembered by parse_note
+TIME_PATTERN = re.compile(r'(?i)(\d?\d):(\d\d) ([ap]m)')
+NOTE_TIME_PATTERN = re.compile(r'\d?\d:\d\d [ap]m')
+NOTE_TRUCK_PATTERN = re.compile(r'truck (\d)')
+NOTE_ID_PATTERN = re.compile(r'\d+')
+WRONG_ADDRESS_AVAILABLE = '10:20 am'  # When the corrected address of a wrong address package is known
+CORRECTED_ADDRESS = ('410 S State St', '84111')  # Street and postal code a wrong address is corrected to
+
+
+class NoteDirective(NamedTuple):
+    """
+    What a package's special note asks for, parsed once per distinct note
+    """
+    available_when: Optional[int] = None
+    truck: Optional[int] = None
+    depend_pkgs: frozenset[int] = NO_DEPENDENCIES
+    wrong_address: bool = False
+
+
+@lru_cache(maxsize=DEADLINE_CACHE_SIZE)
+def parse_time(time: str) -> int:
+    """
+    Converts a deadline or note time such as '10:30 am' or 'EOD' into minutes
+    :param time:
+    :return Integer of converted time string:
+    """
+    if time == 'EOD':
+        return EOD
+
+    hrs, mins, am_pm = TIME_PATTERN.search(time).groups()
+    if am_pm.lower() == 'am':
+        offset = 0
+    else:
+        offset = 12
+    return ((int(hrs) % 12 + offset) * 60) + int(mins)
+
+
+@lru_cache(maxsize=NOTE_CACHE_SIZE)
+def parse_note(note: str) -> NoteDirective:
+    """
+    Parses through the provided notes text field looking for:
+    - Package Availability times
+    - Specific truck numbers
+    - Specific groupings of packages that must be delivered together
+    - The last criteria is for the package with the incorrect address.
+    :param note:
+    :return NoteDirective for the note:
+    """
+    if len(note) == 0:
+        return NoteDirective()
+
+    elif note_match := NOTE_TIME_PATTERN.search(note):
+        return NoteDirective(available_when=parse_time(note_match.group(0)))
+
+    elif note_match := NOTE_TRUCK_PATTERN.search(note):
+        return NoteDirective(truck=int(note_match.group(1)))
+
+    elif 'delivered with' in note:
+        return NoteDirective(depend_pkgs=frozenset[int](map(int, NOTE_ID_PATTERN.findall(note))))
+
+    return NoteDirective(available_when=parse_time(WRONG_ADDRESS_AVAILABLE), wrong_address=True)
+
+
+register_parse_cache('deadline', parse_time)
+register_parse_cache('note', parse_note)
 
 
 class PkgObject:
@@ -40,40 +99,51 @@ class PkgObject:
         :param time:
         :return Integer of converted time string:
         """
-        if time == 'EOD':
-            return EOD
-
-        hrs, mins, am_pm = re.search(r'(?i)(\d?\d):(\d\d) ([ap]m)', time).groups()
-        if am_pm.lower() == 'am':
-            offset = 0
-        else:
-            offset = 12
-        return ((int(hrs) + offset) * 60) + int(mins)
-
-    __truck_tracker: Optional[int] = None
-    __truck_loaded_at_time: Optional[float] = None
-    __delivered_by_truck: Optional[int] = None
-    delivered_at_time: Optional[float] = None
-    wrong_address = False
-    __available_when = 0.0
+        return parse_time(time)
+
+    # Packages are created by the hundred thousand, slots keep each one free of an instance dictionary
+    __slots__ = ('__truck_tracker', '__truck_loaded_at_time', '__delivered_by_truck', 'delivered_at_time',
+                 'wrong_address', '__available_when', 'pkg_dependencies', 'depend_pkgs', '__route_number', 'hub_id',
+                 'pkg_id', 'str_addr', 'city', 'state', 'postal_code', 'delivery_promise', 'weight', '__status',
+                 'address', 'group')
+
+    __truck_tracker: Optional[int]
+    __truck_loaded_at_time: Optional[float]
+    __delivered_by_truck: Optional[int]
+    delivered_at_time: Optional[float]
+    wrong_address: bool
+    __available_when: float
     pkg_dependencies: set[PkgObject]
-    depend_pkgs: set[int]
-    __route_number = 0
+    depend_pkgs: frozenset[int]  # IDs from the notes, shared empty set for packages without any
+    __route_number: int
+    hub_id: Optional[int]  # Set once the package address is resolved against the distance graph
+    group: Optional[tuple[PkgObject, ...]]  # Shared by every package of a delivery group, None when delivered alone
 
     def __init__(self, pkg_id: str, addr: str, city: str, state: str, postal_code: str,
                  deadline: str, weight: str, note: str):
-        self.depend_pkgs = set[int]()
+        self.__truck_tracker = None
+        self.__truck_loaded_at_time = None
+        self.__delivered_by_truck = None
+        self.delivered_at_time = None
+        self.wrong_address = False
+        self.__available_when = 0.0
+        self.__route_number = 0
+        self.hub_id = None
+        self.group = None
+        self.depend_pkgs = NO_DEPENDENCIES
         self.pkg_dependencies = set[PkgObject]()
         self.pkg_id = int(pkg_id)
         self.str_addr = addr
-        self.city = city
-        self.state = state
-        self.postal_code = postal_code
+        # Cities, states and postal codes repeat across a manifest so a single copy of each is kept
+        self.city = sys.intern(city)
+        self.state = sys.intern(state)
+        self.postal_code = sys.intern(postal_code)
         self.delivery_promise = self.time_formatter(deadline)
         self.weight = int(weight)
         self.__status = self.StatusCode.AT_HUB
         self.__note_processor(note)
-        self.address = normalize_address(f'{self.str_addr} ({self.postal_code})')
+        # Packages going to the same hub share one address string
+        self.address = sys.intern(normalize_address(f'{self.str_addr} ({self.postal_code})'))
 
     def __str__(self) -> str:
         """
@@ -103,16 +173,22 @@ class PkgObject:
         """
         return self.check_at_hub_status() and self.delivery_promise < EOD and self.__available_when <= time_stamp
 
-    def pkg_delivery_eligibility(self, truck: Truck, exclude_pkg: set[PkgObject] = set()) -> bool:
+    def pkg_delivery_eligibility(self, truck: Truck) -> bool:
         """
+        T(n) = O(k) for the k packages in the package's delivery group
         Checks to see if a package is ot at the hub, flagged for having the wrong address, is available for delivery
-        while the truck is en route, and if a package needs to be delivered with other packages.
+        while the truck is en route, and if a package needs to be delivered with other packages. A grouped package
+        is only eligible when every package of its group still at the hub is eligible for the same truck.
         :param self:
         :param truck:
-        :param exclude_pkg:
         :return boolean response for a package's delivery eligibility:
         """
+        if not self.__eligible_alone(truck):
+            return False
+        return all(pkg.__eligible_alone(truck) for pkg in self.group_members()
+                   if pkg is not self and pkg.check_at_hub_status())
 
+    def __eligible_alone(self, truck: Truck) -> bool:
         if self.wrong_address:
             return False
 
@@ -122,45 +198,71 @@ class PkgObject:
         if not self.check_at_hub_status():
             return False
 
-        if self.__truck_tracker is not None and self.__truck_tracker != truck.truck:
-            return False
-
-        available_pkgs = True
-        exclude_pkg.add(self)
+        return self.__truck_tracker is None or self.__truck_tracker == truck.truck
 
-        # Recursive for loop which compares all packages in a provided list of packages
-        for pkgs in [p for p in self.pkg_dependencies if p not in exclude_pkg]:
-            available_pkgs = pkgs.pkg_delivery_eligibility(truck, exclude_pkg)
-        return available_pkgs
-
-    def __note_processor(self, note: str) -> None:
+    def group_members(self) -> tuple[PkgObject, ...]:
         """
-        Parses through the provided notes text field looking for:
-        - Package Availability times
-        - Specific truck numbers
-        - Specific groupings of packages that must be delivered together
-        - The last criteria is for the package with the incorrect address.
+        T(n) = O(1)
+        Returns the packages that must be delivered together with this one, including itself, in package ID order
         :param self:
-        :param note:
-        :return Replaces the text in the package object as it's being constructed:
+        :return Tuple of grouped packages:
         """
+        return (self,) if self.group is None else self.group
 
-        if len(note) == 0:
-            pass
+    def group_size(self) -> int:
+        return 1 if self.group is None else len(self.group)
 
-        elif note_match := re.search(r'\d?\d:\d\d [ap]m', note):
-            self.__available_when = self.time_formatter(note_match.group(0))
+    def pending_group(self) -> list[PkgObject]:
+        """
+        Returns the packages of the group which are still waiting at the hub
+        :param self:
+        :return List of grouped packages at the hub:
+        """
+        return [pkg for pkg in self.group_members() if pkg.check_at_hub_status()]
 
-        elif note_match := re.search(r'truck (\d)', note):
-            self.__truck_tracker = int(note_match.group(1))
+    def delivery_group(self) -> set[PkgObject]:
+        """
+        T(n) = O(k)
+        S(n) = O(k)
+        Returns the package and every package it is transitively required to be delivered with
+        :param self:
+        :return Set of grouped packages:
+        """
+        return set(self.group_members())
 
-        elif 'delivered with' in note:
-            self.depend_pkgs = set[int](map(int, re.findall(r'\d+', note)))
-            logger.info(f'{self.depend_pkgs}')
+    def join_group(self, other: PkgObject) -> None:
+        """
+        T(n) = O(k)
+        Links two packages that must be delivered together and merges their delivery groups
+        :param self:
+        :param other:
+        :return No return value:
+        """
+        self.pkg_dependencies.add(other)
+        other.pkg_dependencies.add(self)
+        if self.group is not None and other in self.group:
+            return
+        group = tuple(sorted(set(self.group_members()) | set(other.group_members()), key=lambda pkg: pkg.pkg_id))
+        for pkg in group:
+            pkg.group = group
 
-        else:
+    def __note_processor(self, note: str) -> None:
+        """
+        Applies the directive of the provided notes text field, see parse_note
+        :param self:
+        :param note:
+        :return Replaces the text in the package object as it's being constructed:
+        """
+        directive = parse_note(note)
+        if directive.available_when is not None:
+            self.__available_when = directive.available_when
+        if directive.truck is not None:
+            self.__truck_tracker = directive.truck
+        if len(directive.depend_pkgs) != 0:
+            self.depend_pkgs = directive.depend_pkgs
+            logger.debug('Package %s is delivered with %s', self.pkg_id, self.depend_pkgs)
+        if directive.wrong_address:
             self.address = ''
-            self.__available_when = self.time_formatter('10:20 am')
             self.wrong_address = True
 
     def enroute_status(self, truck: Truck) -> None:
@@ -172,11 +274,11 @@ class PkgObject:
         :return No return value:
         """
         if self.__status == self.StatusCode.ENROUTE:
-            logger.exception(f'Status: {self.__status}\t Truck: {truck}')
+            logger.exception('Status: %s\t Truck: %s', self.__status, truck.truck)
             raise Exception
 
         if (self.__truck_tracker or truck.truck) != truck.truck:
-            logger.exception(f'Required Truck: {self.__truck_tracker}\t Truck: {truck.truck}')
+            logger.exception('Required Truck: %s\t Truck: %s', self.__truck_tracker, truck.truck)
             raise Exception
 
         self.__delivered_by_truck = truck.truck
@@ -192,7 +294,7 @@ class PkgObject:
         :return:
         """
         if self.__status == self.StatusCode.DELIVERED:
-            logger.exception(f'Status: {self.__status}\t Truck: {truck}')
+            logger.exception('Status: %s\t Truck: %s', self.__status, truck.truck)
             raise Exception
 
         self.__status = self.StatusCode.DELIVERED
@@ -215,6 +317,59 @@ class PkgObject:
         """
         return self.__status == self.StatusCode.AT_HUB
 
+    def get_available_time(self) -> float:
+        """
+        Returns the time, in minutes, at which the package is available to be delivered
+        :param self:
+        :return Available time as minutes:
+        """
+        return self.__available_when
+
+    def set_available_time(self, time: float) -> None:
+        """
+        Changes the time, in minutes, at which the package is available to be delivered
+        :param self:
+        :param time:
+        :return No return value:
+        """
+        self.__available_when = time
+
+    def get_loaded_time(self) -> Optional[float]:
+        """
+        Returns the time, in minutes, at which the package was loaded onto a truck, if it has been
+        :param self:
+        :return Loaded time as minutes or None:
+        """
+        return self.__truck_loaded_at_time
+
+    def get_delivered_by_truck(self) -> Optional[int]:
+        """
+        Returns the number of the truck the package was loaded onto, if it has been
+        :param self:
+        :return Truck number or None:
+        """
+        return self.__delivered_by_truck
+
+    def get_required_truck(self) -> Optional[int]:
+        """
+        Returns the truck number the package notes restrict it to, if any
+        :param self:
+        :return Truck number or None:
+        """
+        return self.__truck_tracker
+
+    def reset_status(self) -> None:
+        """
+        Returns a package to the hub and clears its loading and delivery times so it can be routed again
+        :param self:
+        :return No return value:
+        """
+        self.__status = self.StatusCode.AT_HUB
+        self.__truck_loaded_at_time = None
+        self.__delivered_by_truck = None
+        self.delivered_at_time = None
+        self.__route_number = 0
+
     def address_correction_available(self, time: float) -> bool:
         """
         This method is specifically for package number 9 although it could be used for any
@@ -237,9 +392,19 @@ class PkgObject:
         :return No return value:
         """
         self.wrong_address = False
-        self.address = '410 S State St (84111)'
-        self.str_addr = '410 S State St'
-        self.postal_code = '84111'
+        self.update_address(*CORRECTED_ADDRESS)
+
+    def update_address(self, addr: str, postal_code: str):
+        """
+        Replaces the package's street address and postal code
+        :param self:
+        :param addr:
+        :param postal_code:
+        :return No return value:
+        """
+        self.str_addr = addr
+        self.postal_code = postal_code
+        self.address = sys.intern(normalize_address(f'{self.str_addr} ({self.postal_code})'))
 
     def get_pkg_status(self, time: int) -> str:
         """
@@ -0,0 +1,101 @@
+from __future__ import annotations
+import csv
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, TypeVar, Union, TYPE_CHECKING
+
+from data_services.hash_table import Table, new_table
+from delivery_services.pkg_handler import PkgObject
+from delivery_services.pkg_groups import PkgGroupIndex
+
+if TYPE_CHECKING:
+    from delivery_services.delivery_hub import DeliveryHub
+    from data_services.graph import DHGraph
+
+row_type = TypeVar('row_type')
+
+CHUNK_SIZE = 1024  # Packages parsed and indexed before a chunk is handed on
+
+
+def read_pkg_rows(pkg_file: Path) -> Iterator[list[str]]:
+    """
+    Yields the rows of a ';' delimited package file one at a time, skipping the header
+    :param pkg_file:
+    :return Generator of package rows:
+    """
+    with open(pkg_file) as pkg_f:
+        pkg_reader = csv.reader(pkg_f, delimiter=';')
+        next(pkg_reader, None)
+        yield from pkg_reader
+
+
+def chunked(items: Iterable[row_type], chunk_size: int = CHUNK_SIZE) -> Iterator[list[row_type]]:
+    """
+    Groups an iterable into lists of at most chunk_size items without reading ahead of the current chunk
+    :param items:
+    :param chunk_size:
+    :return Generator of chunks:
+    """
+    items = iter(items)
+    while chunk := list(islice(items, chunk_size)):
+        yield chunk
+
+
+class PkgImporter:
+    """
+    Builds the package and destination tables and the delivery groups incrementally while the package file is
+    streamed. Only the packages of the current chunk are held outside the tables. Each package address is
+    resolved to its hub ID here, so the rest of the routing only works with hub IDs.
+    """
+
+    def __init__(self, dh_graph: DHGraph[Union[DeliveryHub, str]]):
+        self.dh_graph = dh_graph
+        self.pkgs: Table[int, PkgObject] = new_table()
+        # Packages by the hub ID of their destination
+        self.pkg_dest_table: Table[int, list[PkgObject]] = new_table()
+        # Delivery groups are built as packages are read and attached once the whole manifest is read
+        self.groups = PkgGroupIndex()
+
+    def add(self, n_pkg: PkgObject) -> None:
+        """
+        T(n) = O(1) amortized
+        Resolves the package's hub ID and indexes the package into the tables. A wrong address that is not in
+        the graph is left unresolved until it is corrected
+        :param n_pkg:
+        :return No return value:
+        """
+        if (hub_id := self.dh_graph.hub_id(n_pkg.address)) is None and not n_pkg.wrong_address:
+            raise ValueError(f'Package {n_pkg.pkg_id}: {n_pkg.address} is not a known delivery hub')
+        n_pkg.hub_id = hub_id
+        self.pkgs.insert(n_pkg.pkg_id, n_pkg)
+        if hub_id is not None:
+            if (lst_of_pkgs := self.pkg_dest_table.fetch_bucket(hub_id)) is None:
+                lst_of_pkgs: list[PkgObject] = []
+                self.pkg_dest_table.insert(hub_id, lst_of_pkgs)
+            lst_of_pkgs.append(n_pkg)
+        self.groups.add(n_pkg)
+
+    def finish(self) -> int:
+        """
+        Attaches every package to its delivery group once the whole manifest has been read
+        :return Number of delivery groups:
+        """
+        return self.groups.assign_groups(self.pkgs)
+
+    def stream(self, rows: Iterable[list[str]], chunk_size: int = CHUNK_SIZE) -> Iterator[list[PkgObject]]:
+        """
+        T(n) = O(n)
+        S(n) = O(chunk_size) on top of the tables
+        Parses the rows into packages a chunk at a time. Every package in a yielded chunk is already in the
+        tables, so a consumer can start working on a chunk before the rest of the file is parsed. Delivery groups
+        are attached after the last chunk
+        :param rows:
+        :param chunk_size:
+        :return Generator of package chunks:
+        """
+        for chunk in chunked(rows, chunk_size):
+            pkgs = [PkgObject(*row) for row in chunk]
+            for n_pkg in pkgs:
+                self.add(n_pkg)
+            yield pkgs
+        self.finish()
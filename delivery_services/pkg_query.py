@@ -0,0 +1,125 @@
+from __future__ import annotations
+import re
+from bisect import bisect_left, bisect_right
+from typing import Iterable, Optional
+
+from data_services.hash_table import Table, new_table
+from delivery_services.pkg_handler import PkgObject
+
+RANGE_PATTERN = re.compile(r'^\s*(\d+)\s*-\s*(\d+)\s*$')
+PREFIX_PATTERN = re.compile(r'^\s*(\d+)\s*\*\s*$')
+BATCH_PATTERN = re.compile(r'^\s*\d+(\s*,\s*\d+)*\s*,?\s*$')
+
+
+class PkgQuery:
+    """
+    Package ID lookups for the search bar. Single IDs are answered by the package table's hash lookup, and the
+    IDs are also kept sorted as numbers and as strings so range and prefix queries are binary searches.
+    refresh only adds and removes the IDs that changed, so it can be called as often as the plan is refreshed.
+    """
+
+    def __init__(self, pkgs: Table[int, PkgObject]):
+        self.pkgs: Table[int, PkgObject] = new_table()
+        self.ids: list[int] = []  # Sorted package IDs for range queries
+        self.id_strings: list[str] = []  # Sorted ID strings for prefix queries
+        self.indexed: Table[int, bool] = new_table()
+        self.refresh(pkgs)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def refresh(self, pkgs: Table[int, PkgObject]) -> tuple[int, int]:
+        """
+        Assume:
+        n = number of packages
+        a = number of IDs added
+            T(n) = O(n + a log a)
+            S(n) = O(n)
+        Brings the sorted indexes in line with the package table. Removed IDs are filtered out in one pass and
+        added IDs are sorted and merged in at once, so building the index from scratch is not quadratic
+        :param pkgs:
+        :return tuple(IDs added, IDs removed):
+        """
+        self.pkgs = pkgs
+        added = [pkg_id for (pkg_id, _) in pkgs if self.indexed.fetch_bucket(pkg_id) is None]
+        removed = [pkg_id for pkg_id in self.ids if pkgs.fetch_bucket(pkg_id) is None]
+        if len(removed) != 0:
+            for pkg_id in removed:
+                self.indexed.remove(pkg_id)
+            removed_ids = set(removed)
+            self.ids = [pkg_id for pkg_id in self.ids if pkg_id not in removed_ids]
+            removed_strings = set(map(str, removed))
+            self.id_strings = [pkg_id for pkg_id in self.id_strings if pkg_id not in removed_strings]
+        if len(added) != 0:
+            for pkg_id in added:
+                self.indexed.insert(pkg_id, True)
+            # The lists are already sorted, so sort() merges them with the sorted new IDs in linear time
+            self.ids.extend(sorted(added))
+            self.ids.sort()
+            self.id_strings.extend(sorted(map(str, added)))
+            self.id_strings.sort()
+        return len(added), len(removed)
+
+    def get(self, pkg_id: int) -> Optional[PkgObject]:
+        """
+        T(n) = O(1)
+        :param pkg_id:
+        :return PkgObject or None:
+        """
+        return self.pkgs.fetch_bucket(pkg_id)
+
+    def __contains__(self, pkg_id: int) -> bool:
+        return self.pkgs.fetch_bucket(pkg_id) is not None
+
+    def id_range(self, low: int, high: int) -> list[PkgObject]:
+        """
+        T(n) = O(log(n) + k) for the k packages returned
+        Returns the packages with IDs from low to high, both included, in ID order
+        :param low:
+        :param high:
+        :return List of packages:
+        """
+        ids = self.ids[bisect_left(self.ids, low):bisect_right(self.ids, high)]
+        return [self.pkgs.fetch_bucket(pkg_id) for pkg_id in ids]
+
+    def id_prefix(self, prefix: str) -> list[PkgObject]:
+        """
+        T(n) = O(log(n) + k log(k)) for the k packages returned
+        Returns the packages whose IDs start with the provided digits, in ID order
+        :param prefix:
+        :return List of packages:
+        """
+        start = bisect_left(self.id_strings, prefix)
+        end = bisect_left(self.id_strings, prefix + '\uffff', start)
+        return [self.pkgs.fetch_bucket(pkg_id) for pkg_id in sorted(map(int, self.id_strings[start:end]))]
+
+    def batch(self, pkg_ids: Iterable[int]) -> tuple[list[PkgObject], list[int]]:
+        """
+        T(n) = O(k) for the k IDs provided
+        Looks up several IDs at once, keeping the order they were given in
+        :param pkg_ids:
+        :return tuple(Packages found, IDs not found):
+        """
+        found, missing = [], []
+        for pkg_id in pkg_ids:
+            if (pkg := self.pkgs.fetch_bucket(pkg_id)) is None:
+                missing.append(pkg_id)
+            else:
+                found.append(pkg)
+        return found, missing
+
+    def search(self, text: str) -> Optional[list[PkgObject]]:
+        """
+        Answers a search bar query: a single ID '12', a range '10-20', a prefix '1*' or a batch '3, 7, 12'.
+        A batch with any unknown ID, or an unknown single ID, is treated as a wrong ID
+        :param text:
+        :return List of matching packages, or None when the text is not a query or names an unknown ID:
+        """
+        if match := RANGE_PATTERN.match(text):
+            return self.id_range(int(match.group(1)), int(match.group(2)))
+        if match := PREFIX_PATTERN.match(text):
+            return self.id_prefix(match.group(1).lstrip('0') or '0')
+        if BATCH_PATTERN.match(text):
+            found, missing = self.batch(int(pkg_id) for pkg_id in text.split(',') if pkg_id.strip())
+            return None if len(missing) != 0 else found
+        return None
@@ -0,0 +1,179 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import NamedTuple, Optional, Union, TYPE_CHECKING
+
+from data_services.hash_table import Table, new_table
+from delivery_services.pkg_groups import PkgGroupIndex
+from delivery_services.pkg_handler import CORRECTED_ADDRESS, parse_note, parse_time
+from delivery_services.routing import pkg_rows, pkg_source
+from delivery_services.truck import HUB_ID, TRUCK_CAPACITY, Truck
+from utilities import normalize_address
+
+if TYPE_CHECKING:
+    from delivery_services.delivery_hub import DeliveryHub
+    from delivery_services.pkg_handler import PkgObject
+    from data_services.graph import DHGraph
+
+TOLERANCE = 1e-6  # Minutes and miles are floats, recomputed values may differ by rounding
+
+
+class PkgRules(NamedTuple):
+    """
+    The rules a package must be delivered under, read from the manifest rather than from the routed packages
+    """
+    pkg_id: int
+    hub_id: Optional[int]  # Destination, the corrected address for a package with a wrong address
+    deadline: int
+    available_when: float
+    truck: Optional[int]
+    wrong_address: bool
+
+
+class PlanReport(NamedTuple):
+    """
+    Outcome of validating a plan. A plan is valid when it has no violations, missed deadlines are reported
+    separately because the planners do not promise every deadline
+    """
+    violations: list[str]
+    delivered: int
+    total_miles: float
+    finish_time: float  # When the last truck is back at the hub
+    missed_deadlines: list[int]
+
+    @property
+    def valid(self) -> bool:
+        return len(self.violations) == 0
+
+
+def read_rules(dh_graph: DHGraph[Union[DeliveryHub, str]], pkg_file: Optional[Path] = None) -> Table[int, PkgRules]:
+    """
+    T(n) = O(n)
+    S(n) = O(n)
+    Reads the delivery rules of every package in a manifest
+    :param dh_graph: Graph the addresses are resolved against
+    :param pkg_file: Package file, defaults to the project package file
+    :return Table of package IDs to their rules:
+    """
+    rules: Table[int, PkgRules] = new_table()
+    corrected_hub = dh_graph.hub_id(normalize_address(f'{CORRECTED_ADDRESS[0]} ({CORRECTED_ADDRESS[1]})'))
+    for (pkg_id, addr, _, _, postal_code, deadline, _, note) in pkg_rows(pkg_source(pkg_file)):
+        directive = parse_note(note)
+        hub_id = corrected_hub if directive.wrong_address else dh_graph.hub_id(
+            normalize_address(f'{addr} ({postal_code})'))
+        rules.insert(int(pkg_id), PkgRules(int(pkg_id), hub_id, parse_time(deadline),
+                                           directive.available_when or 0.0, directive.truck,
+                                           directive.wrong_address))
+    return rules
+
+
+def delivery_groups(pkg_file: Optional[Path] = None) -> list[list[int]]:
+    """
+    T(n) = O(n)
+    Builds the "delivered with" groups of a manifest from its notes
+    :param pkg_file: Package file, defaults to the project package file
+    :return Package IDs of each group with more than one package:
+    """
+    groups = PkgGroupIndex()
+    pkg_ids = set()
+    for row in pkg_rows(pkg_source(pkg_file)):
+        pkg_ids.add(pkg_id := int(row[0]))
+        for depend_id in parse_note(row[-1]).depend_pkgs:
+            groups.union(pkg_id, depend_id)
+    members: Table[int, list[int]] = new_table()
+    for pkg_id in sorted(pkg_ids):
+        if (group := members.fetch_bucket(root := groups.find(pkg_id))) is None:
+            group = []
+            members.insert(root, group)
+        group.append(pkg_id)
+    return [group for (_, group) in members if len(group) > 1]
+
+
+def validate_plan(dh_graph: DHGraph[Union[DeliveryHub, str]], pkgs: Table[int, PkgObject], trucks: list[Truck],
+                  pkg_file: Optional[Path] = None, rules: Optional[Table[int, PkgRules]] = None) -> PlanReport:
+    """
+    Assume:
+    n = number of packages
+    r = number of routes
+        T(n) = O(n + r)
+        S(n) = O(n)
+    Checks a finished plan against the manifest's rules: every package is delivered exactly once, each route
+    carries at most a truckload, truck restrictions, delivered with groups sharing a route, packages only
+    leaving the hub once available, and wrong addresses only leaving once corrected and going to the corrected
+    address. Each route is driven again over the graph, so the recorded miles and delivery times are checked too
+    :param dh_graph: Graph the plan was routed over
+    :param pkgs: Package table of the plan
+    :param trucks: Trucks of the plan
+    :param pkg_file: Package file the plan was made from, defaults to the project package file
+    :param rules: Rules to check against instead of the package file's, for a plan repaired after routing
+    :return PlanReport:
+    """
+    rules = read_rules(dh_graph, pkg_file) if rules is None else rules
+    violations: list[str] = []
+    # Package IDs to the truck number and route index that delivered them
+    routes_of: Table[int, tuple[int, int]] = new_table()
+    delivered = 0
+    finish_time = 0.0
+    for truck in trucks:
+        miles = truck.route_start_miles[0] if truck.route_start_miles else truck.total_miles
+        idle_time = 0.0  # Minutes waited at the hub so far
+        if abs(miles) > TOLERANCE:
+            violations.append(f'Truck {truck.truck} drove {miles:.1f} miles before its first route')
+        for (r, route) in enumerate(truck.routes):
+            if abs(truck.route_start_miles[r] - miles) > TOLERANCE:
+                violations.append(f'Truck {truck.truck} route {r} does not start where the last route ended')
+            if truck.route_idle_time[r] < idle_time - TOLERANCE:
+                violations.append(f'Truck {truck.truck} route {r} leaves before its last route returned')
+            idle_time = truck.route_idle_time[r]
+            if len(route) > TRUCK_CAPACITY:
+                violations.append(f'Truck {truck.truck} route {r} carries {len(route)} packages')
+            departure = Truck.elapsed_time(miles, truck.start_time) + idle_time
+            location = HUB_ID
+            for pkg in route:
+                if routes_of.fetch_bucket(pkg.pkg_id) is not None:
+                    violations.append(f'Package {pkg.pkg_id} is delivered more than once')
+                routes_of.insert(pkg.pkg_id, (truck.truck, r))
+                delivered += 1
+                if (rule := rules.fetch_bucket(pkg.pkg_id)) is None:
+                    violations.append(f'Package {pkg.pkg_id} is not in the manifest')
+                else:
+                    violations.extend(__check_stop(rule, pkg, truck, departure))
+                miles += dh_graph.get_distance_by_id(location, pkg.hub_id)
+                location = pkg.hub_id
+                arrival = Truck.elapsed_time(miles, truck.start_time) + idle_time
+                if pkg.delivered_at_time is None or abs(pkg.delivered_at_time - arrival) > TOLERANCE:
+                    violations.append(f'Package {pkg.pkg_id} was recorded as delivered at {pkg.delivered_at_time}, '
+                                      f'the truck arrives at {arrival:.2f}')
+            miles += dh_graph.get_distance_by_id(location, HUB_ID)
+        if abs(truck.total_miles - miles) > TOLERANCE:
+            violations.append(f'Truck {truck.truck} recorded {truck.total_miles:.2f} miles, its routes are '
+                              f'{miles:.2f} miles')
+        finish_time = max(finish_time, Truck.elapsed_time(miles, truck.start_time) + truck.idle_time)
+
+    missed_deadlines = []
+    for (pkg_id, rule) in sorted(rules, key=lambda item: item[0]):
+        if routes_of.fetch_bucket(pkg_id) is None:
+            violations.append(f'Package {pkg_id} is never delivered')
+        elif ((pkg := pkgs.fetch_bucket(pkg_id)) is not None and pkg.delivered_at_time is not None
+              and pkg.delivered_at_time > rule.deadline + TOLERANCE):
+            missed_deadlines.append(pkg_id)
+    for group in delivery_groups(pkg_file):
+        if len({routes_of.fetch_bucket(pkg_id) for pkg_id in group}) > 1:
+            violations.append(f'Packages {group} must be delivered together but ride different routes')
+    return PlanReport(violations, delivered, sum(truck.total_miles for truck in trucks), finish_time,
+                      missed_deadlines)
+
+
+def __check_stop(rule: PkgRules, pkg: PkgObject, truck: Truck, departure: float) -> list[str]:
+    """
+    Checks the rules of one package against the route that carried it
+    """
+    violations = []
+    if rule.truck is not None and rule.truck != truck.truck:
+        violations.append(f'Package {rule.pkg_id} can only be on truck {rule.truck}, it is on truck {truck.truck}')
+    if departure + TOLERANCE < rule.available_when:
+        reason = 'its address is corrected' if rule.wrong_address else 'it arrives at the hub'
+        violations.append(f'Package {rule.pkg_id} leaves the hub at {departure:.2f} before {reason} at '
+                          f'{rule.available_when:.2f}')
+    if pkg.hub_id != rule.hub_id:
+        violations.append(f'Package {rule.pkg_id} is delivered to hub {pkg.hub_id} instead of hub {rule.hub_id}')
+    return violations
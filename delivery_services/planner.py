@@ -0,0 +1,271 @@
+from __future__ import annotations
+from typing import Optional, Union, TYPE_CHECKING
+
+from data_services.hash_table import Table, new_table
+from delivery_services.route_optimizer import RouteCost, Stop, route_cost
+from delivery_services.truck import TRUCK_CAPACITY
+from utilities import normalize_address
+
+if TYPE_CHECKING:
+    from delivery_services.delivery_hub import DeliveryHub
+    from delivery_services.pkg_handler import PkgObject
+    from delivery_services.truck import Truck
+    from data_services.graph import DHGraph
+
+
+class IncrementalPlanner:
+    """
+    Repairs a finished plan when a package becomes available later, has its address changed or is added after
+    routing. The loaded graph and package tables are reused and only the trucks whose routes change are
+    replayed, starting from the first route that changed.
+    """
+
+    def __init__(self, dh_graph: DHGraph[Union[DeliveryHub, str]], pkgs: Table[int, PkgObject],
+                 pkg_dest_table: Table[int, list[PkgObject]], trucks: list[Truck]):
+        self.dh_graph = dh_graph
+        self.pkgs = pkgs
+        self.pkg_dest_table = pkg_dest_table
+        self.trucks = trucks
+        # Maps each package ID to the truck and route index it is planned on
+        self.placement: Table[int, tuple[Truck, int]] = new_table()
+        for truck in trucks:
+            self.__index_routes(truck, 0)
+
+    def package_available(self, pkg_id: int, time: float) -> set[int]:
+        """
+        Records that a package will not be available before the provided time. When its route leaves earlier the
+        package and every package it must be delivered with are moved to the cheapest later route
+        :param pkg_id:
+        :param time:
+        :return Truck numbers whose routes changed:
+        """
+        pkg = self.__fetch_pkg(pkg_id)
+        previous = pkg.get_available_time()
+        pkg.set_available_time(time)
+        placed = self.placement.fetch_bucket(pkg_id)
+        if placed is not None and placed[0].route_departure(placed[1]) >= time:
+            return set()
+
+        group = sorted(pkg.delivery_group(), key=lambda p: p.pkg_id)
+        try:
+            insertion = self.__best_insertion(group, time)
+        except ValueError:
+            pkg.set_available_time(previous)
+            raise
+        changed: dict[Truck, int] = {}
+        for group_pkg in group:
+            self.__remove(group_pkg, changed)
+        self.__place(insertion, changed)
+        return self.__replay(changed)
+
+    def update_address(self, pkg_id: int, addr: str, postal_code: str, now: float) -> set[int]:
+        """
+        Changes the address of a package which has not been delivered yet. The package stays on its route and
+        is moved to the cheapest position that the truck has not already passed at the provided time
+        :param pkg_id:
+        :param addr:
+        :param postal_code:
+        :param now:
+        :return Truck numbers whose routes changed:
+        """
+        pkg = self.__fetch_pkg(pkg_id)
+        if pkg.delivered_at_time is not None and pkg.delivered_at_time <= now:
+            raise ValueError(f'Package {pkg_id} was already delivered')
+        if (hub_id := self.dh_graph.hub_id(normalize_address(f'{addr} ({postal_code})'))) is None:
+            raise ValueError(f'{addr} ({postal_code}) is not a known delivery hub')
+        old_hub_id = pkg.hub_id
+        pkg.update_address(addr, postal_code)
+        pkg.hub_id = hub_id
+        pkg.wrong_address = False
+        self.__move_destination(pkg, old_hub_id)
+
+        placed = self.placement.fetch_bucket(pkg_id)
+        if placed is None:
+            return set()
+        truck, route = placed
+        route_pkgs = truck.routes[route]
+        # Stops the truck has already made on a route that is under way cannot be changed
+        fixed = sum(1 for p in route_pkgs if p is not pkg and p.delivered_at_time is not None
+                    and p.delivered_at_time <= now)
+        route_pkgs.remove(pkg)
+        _, position = self.__cheapest_position(route_pkgs, pkg, truck.route_departure(route), fixed)
+        route_pkgs.insert(position, pkg)
+        return self.__replay({truck: route})
+
+    def add_package(self, pkg: PkgObject, now: float) -> set[int]:
+        """
+        Adds a package which arrived after routing and inserts it, with any package it must be delivered with,
+        into the cheapest route leaving after it is available
+        :param pkg:
+        :param now:
+        :return Truck numbers whose routes changed:
+        """
+        if pkg.pkg_id in self.pkgs:
+            raise ValueError(f'Package {pkg.pkg_id} already exists')
+        if (hub_id := self.dh_graph.hub_id(pkg.address)) is None:
+            raise ValueError(f'{pkg.address} is not a known delivery hub')
+        pkg.hub_id = hub_id
+        # A package added now cannot leave the hub before now
+        pkg.set_available_time(max(now, pkg.get_available_time()))
+        depend_pkgs = [depend_pkg for depend_id in pkg.depend_pkgs
+                       if (depend_pkg := self.pkgs.fetch_bucket(depend_id)) is not None]
+        members = {pkg}.union(*(depend_pkg.delivery_group() for depend_pkg in depend_pkgs))
+        # Grouped packages on a route that already left cannot be moved
+        group = sorted((p for p in members if (placed := self.placement.fetch_bucket(p.pkg_id)) is None
+                        or placed[0].route_departure(placed[1]) >= now), key=lambda p: p.pkg_id)
+        # The route is found before anything changes, so a package no route can carry leaves the plan as it was
+        insertion = self.__best_insertion(group, pkg.get_available_time())
+        self.pkgs.insert(pkg.pkg_id, pkg)
+        self.__move_destination(pkg, None)
+        for depend_pkg in depend_pkgs:
+            pkg.join_group(depend_pkg)
+
+        changed: dict[Truck, int] = {}
+        for group_pkg in group:
+            self.__remove(group_pkg, changed)
+        self.__place(insertion, changed)
+        return self.__replay(changed)
+
+    def __fetch_pkg(self, pkg_id: int) -> PkgObject:
+        if (pkg := self.pkgs.fetch_bucket(pkg_id)) is None:
+            raise ValueError(f'Unknown package {pkg_id}')
+        return pkg
+
+    def __move_destination(self, pkg: PkgObject, old_hub_id: Optional[int]) -> None:
+        """
+        Keeps the destination table in step with a package's hub ID
+        :param pkg:
+        :param old_hub_id:
+        :return No return value:
+        """
+        if old_hub_id is not None and (old_pkgs := self.pkg_dest_table.fetch_bucket(old_hub_id)) is not None:
+            if pkg in old_pkgs:
+                old_pkgs.remove(pkg)
+        if (lst_of_pkgs := self.pkg_dest_table.fetch_bucket(pkg.hub_id)) is None:
+            lst_of_pkgs = []
+            self.pkg_dest_table.insert(pkg.hub_id, lst_of_pkgs)
+        lst_of_pkgs.append(pkg)
+
+    def __remove(self, pkg: PkgObject, changed: dict[Truck, int]) -> None:
+        """
+        Takes a package off the route it is planned on
+        :param pkg:
+        :param changed: Earliest changed route of each truck, updated in place
+        :return No return value:
+        """
+        if (placed := self.placement.fetch_bucket(pkg.pkg_id)) is None:
+            return
+        truck, route = placed
+        truck.routes[route].remove(pkg)
+        self.placement.remove(pkg.pkg_id)
+        changed[truck] = min(changed.get(truck, route), route)
+
+    def __best_insertion(self, group: list[PkgObject], ready: float) -> tuple[Truck, int, list[PkgObject]]:
+        """
+        T(n) = O(r * k * s**2) for r routes, k grouped packages and s stops per route
+        Finds the route leaving at or after the ready time where a group of packages adds the least time window
+        violation and then the fewest miles. A new route at the end of a truck's day is also considered, the
+        truck waits at the hub until the ready time when its day ends earlier. Nothing is changed, the routes
+        are costed as if the group was already taken off them
+        :param group:
+        :param ready:
+        :return tuple(Truck, Route index, Packages of the route with the group inserted):
+        """
+        required = {p.get_required_truck() for p in group} - {None}
+        grouped = set(group)
+        best: Optional[tuple[RouteCost, Truck, int, list[PkgObject]]] = None
+        for truck in self.trucks:
+            if len(required) > 1 or (len(required) == 1 and truck.truck not in required):
+                continue
+            for route in range(len(truck.routes) + 1):
+                if route == len(truck.routes):
+                    route_pkgs, depart_time = [], max(truck.get_time_elapsed(), ready)
+                else:
+                    route_pkgs = [p for p in truck.routes[route] if p not in grouped]
+                    depart_time = truck.route_departure(route)
+                if depart_time < ready or len(route_pkgs) + len(group) > TRUCK_CAPACITY:
+                    continue
+                before = self.__route_cost(route_pkgs, depart_time)
+                for pkg in group:
+                    _, position = self.__cheapest_position(route_pkgs, pkg, depart_time, 0)
+                    route_pkgs.insert(position, pkg)
+                after = self.__route_cost(route_pkgs, depart_time)
+                added = RouteCost(after.violation - before.violation, after.miles - before.miles)
+                if best is None or added.improves_on(best[0]):
+                    best = (added, truck, route, route_pkgs)
+
+        if best is None:
+            raise ValueError(f'No route can carry packages {[p.pkg_id for p in group]} after {ready}')
+        return best[1:]
+
+    def __place(self, insertion: tuple[Truck, int, list[PkgObject]], changed: dict[Truck, int]) -> None:
+        """
+        Puts the route found by __best_insertion on its truck, a new route is added at the end of the truck's day
+        :param insertion:
+        :param changed: Earliest changed route of each truck, updated in place
+        :return No return value:
+        """
+        truck, route, route_pkgs = insertion
+        if route == len(truck.routes):
+            truck.routes.append([])
+            truck.route_start_miles.append(truck.total_miles)
+            truck.route_idle_time.append(truck.idle_time)
+        truck.routes[route] = route_pkgs
+        changed[truck] = min(changed.get(truck, route), route)
+
+    def __cheapest_position(self, route_pkgs: list[PkgObject], pkg: PkgObject, depart_time: float,
+                            first: int) -> tuple[RouteCost, int]:
+        """
+        Finds the position, no earlier than first, where inserting the package costs the least
+        :param route_pkgs:
+        :param pkg:
+        :param depart_time:
+        :param first:
+        :return tuple(RouteCost with the package inserted, Position):
+        """
+        best: Optional[tuple[RouteCost, int]] = None
+        for position in range(first, len(route_pkgs) + 1):
+            cost = self.__route_cost(route_pkgs[:position] + [pkg] + route_pkgs[position:], depart_time)
+            if best is None or cost.improves_on(best[0]):
+                best = (cost, position)
+        return best
+
+    def __route_cost(self, route_pkgs: list[PkgObject], depart_time: float) -> RouteCost:
+        stops = [Stop(p.hub_id, (p.delivery_promise,), p.get_available_time()) for p in route_pkgs]
+        return route_cost(range(len(stops)), stops, self.dh_graph.distance_matrix, self.dh_graph.hub_count,
+                          depart_time)
+
+    def __replay(self, changed: dict[Truck, int]) -> set[int]:
+        """
+        Re-runs every changed truck from its earliest changed route so the load and delivery times of its
+        packages match the repaired routes. A route which would now leave before one of its packages is available,
+        because an earlier route became shorter, waits at the hub until it is
+        :param changed:
+        :return Truck numbers which were replayed:
+        """
+        for (truck, route) in changed.items():
+            routes = truck.routes[route:]
+            # The time waited at the hub before each route is kept
+            idle_times = truck.route_idle_time[route:]
+            truck.total_miles = truck.route_start_miles[route]
+            truck.idle_time = truck.route_idle_time[route - 1] if route > 0 else 0.0
+            truck.deliveries_completed = route
+            del truck.routes[route:]
+            del truck.route_start_miles[route:]
+            del truck.route_idle_time[route:]
+            for route_pkgs in routes:
+                for pkg in route_pkgs:
+                    pkg.reset_status()
+            for (route_pkgs, idle_time) in zip(routes, idle_times):
+                truck.idle_time = max(truck.idle_time, idle_time)
+                truck.wait_until(max((pkg.get_available_time() for pkg in route_pkgs), default=0.0))
+                for pkg in route_pkgs:
+                    truck.load_truck(pkg)
+                truck.deliver_packages(self.dh_graph)
+            self.__index_routes(truck, route)
+        return {truck.truck for truck in changed}
+
+    def __index_routes(self, truck: Truck, first: int) -> None:
+        for route in range(first, len(truck.routes)):
+            for pkg in truck.routes[route]:
+                self.placement.insert(pkg.pkg_id, (truck, route))
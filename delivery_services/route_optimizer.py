@@ -0,0 +1,279 @@
+from __future__ import annotations
+import random
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple, Optional, Sequence, Union, TYPE_CHECKING
+
+from delivery_services.truck import HUB_ID, TRUCK_SPEED
+
+if TYPE_CHECKING:
+    from delivery_services.delivery_hub import DeliveryHub
+    from delivery_services.pkg_handler import PkgObject
+    from delivery_services.truck import Truck
+    from data_services.graph import DHGraph
+
+OR_OPT_SEGMENTS = (1, 2, 3)  # Lengths of the stop segments relocated by Or-opt moves
+MIN_POOL_SNAPSHOTS = 8  # Fewer searches than this run in the current process, sending them costs more than they do
+EPSILON = 1e-9
+
+
+class Stop(NamedTuple):
+    """
+    A single stop on a route, packages going to the same hub back to back are delivered at one stop
+    """
+    hub_id: int
+    deadlines: tuple[float, ...]
+    available_when: float
+
+
+class OptimizerSettings(NamedTuple):
+    """
+    Controls the route improvement stage that runs between loading and delivery
+    time_budget: Seconds each search may spend on a route, None searches until no move improves
+    restarts: Number of searches per route, every search after the first starts from a shuffled order
+    workers: Size of the process pool the searches run on, 0 runs them in the current process
+    """
+    time_budget: Optional[float] = None
+    restarts: int = 1
+    workers: int = 0
+
+
+class RouteSnapshot(NamedTuple):
+    """
+    Compact, picklable copy of a loaded truck used by the worker processes. The distance matrix is sent to
+    each worker once when the pool starts rather than with every snapshot
+    """
+    truck_index: int
+    stops: tuple[Stop, ...]
+    depart_time: float
+    seed: int
+    time_budget: Optional[float]
+
+
+class RouteCost(NamedTuple):
+    """
+    Routes are compared by their time window violations first and by their mileage second
+    """
+    violation: float
+    miles: float
+
+    def improves_on(self, other: RouteCost) -> bool:
+        if self.violation < other.violation - EPSILON:
+            return True
+        return self.violation <= other.violation + EPSILON and self.miles < other.miles - EPSILON
+
+
+def route_cost(order: Sequence[int], stops: Sequence[Stop], distance_matrix: Sequence[float], hub_count: int,
+               depart_time: float) -> RouteCost:
+    """
+    T(n) = O(n)
+    S(n) = O(1)
+    Simulates driving the stops in the provided order, starting and ending at the hub. A stop reached after a
+    package's delivery promise, or before it is available, adds the difference to the violation total
+    :param order:
+    :param stops:
+    :param distance_matrix:
+    :param hub_count:
+    :param depart_time:
+    :return RouteCost of the order:
+    """
+    miles = 0.0
+    violation = 0.0
+    prev = HUB_ID
+    for s in order:
+        stop = stops[s]
+        miles += distance_matrix[prev * hub_count + stop.hub_id]
+        arrival = depart_time + miles / TRUCK_SPEED * 60
+        if arrival < stop.available_when:
+            violation += stop.available_when - arrival
+        for deadline in stop.deadlines:
+            if arrival > deadline:
+                violation += arrival - deadline
+        prev = stop.hub_id
+    miles += distance_matrix[prev * hub_count + HUB_ID]
+    return RouteCost(violation, miles)
+
+
+def improve_route(stops: Sequence[Stop], distance_matrix: Sequence[float], hub_count: int, depart_time: float,
+                  order: Optional[list[int]] = None, time_budget: Optional[float] = None) -> list[int]:
+    """
+    T(n) = O(n**3) per pass
+    S(n) = O(n)
+    Local search over the stop order using 2-opt segment reversals and Or-opt segment relocations. The first
+    improving move is applied and the search restarts until no move improves the route or the time budget,
+    in seconds, runs out. A move is only accepted when it does not add to the time window violations.
+    :param stops:
+    :param distance_matrix:
+    :param hub_count:
+    :param depart_time:
+    :param order: Starting order, defaults to the order of the stops
+    :param time_budget:
+    :return Improved order of the stop indexes:
+    """
+    order = list(range(len(stops))) if order is None else list(order)
+    stop_at = None if time_budget is None else time.perf_counter() + time_budget
+    best = route_cost(order, stops, distance_matrix, hub_count, depart_time)
+
+    improved = True
+    while improved:
+        improved = False
+        for candidate in __route_moves(order):
+            if stop_at is not None and time.perf_counter() > stop_at:
+                return order
+            cost = route_cost(candidate, stops, distance_matrix, hub_count, depart_time)
+            if cost.improves_on(best):
+                order, best = candidate, cost
+                improved = True
+                break
+    return order
+
+
+def __route_moves(order: list[int]):
+    """
+    Yields every 2-opt and Or-opt neighbour of the provided order
+    :param order:
+    :return Generator of candidate orders:
+    """
+    n = len(order)
+    for i in range(n - 1):
+        for j in range(i + 1, n):
+            yield order[:i] + order[i:j + 1][::-1] + order[j + 1:]
+
+    for seg_len in OR_OPT_SEGMENTS:
+        for i in range(n - seg_len + 1):
+            segment = order[i:i + seg_len]
+            remainder = order[:i] + order[i + seg_len:]
+            for j in range(len(remainder) + 1):
+                if j != i:
+                    yield remainder[:j] + segment + remainder[j:]
+
+
+def run_snapshot(snapshot: RouteSnapshot, distance_matrix: Optional[Sequence[float]] = None,
+                 hub_count: Optional[int] = None) -> tuple[int, RouteCost, list[int]]:
+    """
+    Runs one search over a route snapshot. Seed 0 starts from the loaded order, any other seed starts
+    from a shuffled order. Inside a worker process the distance matrix set up by the pool initializer is used
+    :param snapshot:
+    :param distance_matrix:
+    :param hub_count:
+    :return tuple(Truck index, RouteCost, Improved order):
+    """
+    if distance_matrix is None:
+        distance_matrix, hub_count = _worker_matrix, _worker_hub_count
+    order = list(range(len(snapshot.stops)))
+    if snapshot.seed != 0:
+        random.Random(snapshot.seed).shuffle(order)
+    order = improve_route(snapshot.stops, distance_matrix, hub_count, snapshot.depart_time, order,
+                          snapshot.time_budget)
+    return (snapshot.truck_index, route_cost(order, snapshot.stops, distance_matrix, hub_count,
+                                             snapshot.depart_time), order)
+
+
+_worker_matrix: Optional[array] = None
+_worker_hub_count = 0
+
+
+def _init_worker(distance_matrix: array, hub_count: int):
+    """
+    Process pool initializer which stores the distance matrix once per worker
+    :param distance_matrix:
+    :param hub_count:
+    :return No return value:
+    """
+    global _worker_matrix, _worker_hub_count
+    _worker_matrix, _worker_hub_count = distance_matrix, hub_count
+
+
+def route_stops(pkgs: Sequence[PkgObject]) -> tuple[list[Stop], list[list[PkgObject]]]:
+    """
+    Groups back to back packages going to the same hub into stops
+    :param pkgs:
+    :return tuple(Stops, Packages delivered at each stop):
+    """
+    stops: list[Stop] = []
+    stop_pkgs: list[list[PkgObject]] = []
+    for pkg in pkgs:
+        if len(stop_pkgs) != 0 and stop_pkgs[-1][-1].hub_id == pkg.hub_id:
+            stop_pkgs[-1].append(pkg)
+        else:
+            stop_pkgs.append([pkg])
+    for grouped in stop_pkgs:
+        stops.append(Stop(grouped[0].hub_id, tuple(pkg.delivery_promise for pkg in grouped),
+                          max(pkg.get_available_time() for pkg in grouped)))
+    return stops, stop_pkgs
+
+
+def optimize_truck(truck: Truck, dh_graph: DHGraph[Union[DeliveryHub, str]],
+                   time_budget: Optional[float] = None) -> float:
+    """
+    Reorders the packages loaded onto a truck before it departs using 2-opt and Or-opt moves
+    :param truck:
+    :param dh_graph:
+    :param time_budget: Seconds the search may spend on this truck, None searches until no move improves
+    :return Miles saved on the route:
+    """
+    return optimize_trucks([truck], dh_graph, OptimizerSettings(time_budget))
+
+
+def worker_pool(dh_graph: DHGraph[Union[DeliveryHub, str]],
+                settings: Optional[OptimizerSettings]) -> Optional[ProcessPoolExecutor]:
+    """
+    Starts the process pool for the provided settings, each worker receives the distance matrix once. The caller
+    shuts the pool down once it has no more routes to improve
+    :param dh_graph:
+    :param settings:
+    :return ProcessPoolExecutor or None when the settings run the searches in the current process:
+    """
+    if settings is None or settings.workers <= 0:
+        return None
+    if not dh_graph.dense:
+        dh_graph.compile_dense()
+    return ProcessPoolExecutor(settings.workers, initializer=_init_worker,
+                               initargs=(dh_graph.distance_matrix, dh_graph.hub_count))
+
+
+def optimize_trucks(trucks: Sequence[Truck], dh_graph: DHGraph[Union[DeliveryHub, str]],
+                    settings: OptimizerSettings = OptimizerSettings(),
+                    pool: Optional[ProcessPoolExecutor] = None) -> float:
+    """
+    Improves the loaded routes of several trucks at once. Every route is searched settings.restarts times,
+    optionally on a process pool, and the best order found for each truck is written back to its package list.
+    Fewer than MIN_POOL_SNAPSHOTS searches always run in the current process
+    :param trucks:
+    :param dh_graph:
+    :param settings:
+    :param pool: Pool from worker_pool() reused across calls, without one a pool is started for this call when
+    settings.workers is set
+    :return Miles saved across all the routes:
+    """
+    if not dh_graph.dense:
+        dh_graph.compile_dense()
+    loaded = [(t, route_stops(truck.pkg_lst)) for (t, truck) in enumerate(trucks) if len(truck.pkg_lst) >= 3]
+    snapshots = [RouteSnapshot(t, tuple(stops), trucks[t].get_time_elapsed(), seed, settings.time_budget)
+                 for (t, (stops, _)) in loaded for seed in range(max(settings.restarts, 1))]
+    if len(snapshots) == 0:
+        return 0.0
+
+    if settings.workers > 0 and len(snapshots) >= MIN_POOL_SNAPSHOTS:
+        if pool is not None:
+            results = list(pool.map(run_snapshot, snapshots))
+        else:
+            with worker_pool(dh_graph, settings) as pool:
+                results = list(pool.map(run_snapshot, snapshots))
+    else:
+        results = [run_snapshot(snapshot, dh_graph.distance_matrix, dh_graph.hub_count) for snapshot in snapshots]
+
+    saved = 0.0
+    for (t, (stops, stop_pkgs)) in loaded:
+        truck = trucks[t]
+        best_cost = route_cost(range(len(stops)), stops, dh_graph.distance_matrix, dh_graph.hub_count,
+                               truck.get_time_elapsed())
+        start_miles = best_cost.miles
+        best_order = list(range(len(stops)))
+        for (truck_index, cost, order) in results:
+            if truck_index == t and cost.improves_on(best_cost):
+                best_cost, best_order = cost, order
+        truck.pkg_lst[:] = [pkg for s in best_order for pkg in stop_pkgs[s]]
+        saved += start_miles - best_cost.miles
+    return saved
@@ -1,27 +1,35 @@
 import csv
-from typing import Iterable, Union, cast
-import logging
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import compress
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional, Union, cast
+
+try:
+    import numpy as np
+except ImportError:  # Batched sorting falls back to pure Python reductions over the masks
+    np = None
 
 # Internal Modules
-from delivery_services.truck import Truck
+from delivery_services.truck import Truck, DAY_START, HUB_ID, wait_at_hub
 from delivery_services.delivery_hub import DeliveryHub
 from delivery_services.pkg_handler import PkgObject
+from delivery_services.insertion import InsertionPlanner
+from delivery_services.pending_index import PendingPkgIndex
+from delivery_services.pkg_import import CHUNK_SIZE, PkgImporter, read_pkg_rows
+from delivery_services.planner import IncrementalPlanner
+from delivery_services.route_optimizer import OptimizerSettings, optimize_trucks, worker_pool
+from delivery_services.simulation import DeliverySimulator
+from delivery_services.xlsx_import import distance_rows_from_xlsx, pkg_rows_from_xlsx
+from log_services import get_logger
+from log_services.instrumentation import collect_metrics, instrument_stages, instrumentation_enabled, stage
 from utilities import SOURCE_DIR
-from data_services import DHGraph, HashTable
-
-# Creates a logger using the module name
-logger = logging.getLogger(__name__)
-# Specifies that only DEBUG level logs should be saved
-logger.setLevel(logging.DEBUG)
-# Specifies the name and path for the log file
-routing_logs = SOURCE_DIR / 'delivery_services' / 'delivery_logs' / 'routing.log'
-routing_handler = logging.FileHandler(routing_logs)
-# Specifies a format for the logs being recorded
-formatter = logging.Formatter('%(asctime)s : %(levelname)s : %(name)s : %(message)s')
-# Sets the handler's formatter
-routing_handler.setFormatter(formatter)
-# Adds the file handler to the logger
-logger.addHandler(routing_handler)
+from data_services import DHGraph, Table, new_table
+from data_services.graph_cache import GRAPH_CACHE_DIR, load_graph_cache, save_graph_cache
+
+# Records are queued and written as JSON lines by a background listener, see log_services
+logger = get_logger(__name__, SOURCE_DIR / 'delivery_services' / 'delivery_logs' / 'routing.log')
 
 
 __wgups_pkgs = SOURCE_DIR / 'input_files' / '__WGUPS Package File.csv'
@@ -30,218 +38,483 @@ __wgups_dists = SOURCE_DIR / 'input_files' / '__WGUPS Distance Table.csv'
 HUB = 'HUB'
 time_at_base = 60 * 8
 
-__TRUCKS_ALL: list[Truck]
-__PKGS_ALL: HashTable[int, PkgObject]
-__GRAPH: DHGraph[Union[DeliveryHub, str]]
-wrong_address_pkg = None
+__SHARED_GRAPH: Optional[DHGraph[Union[DeliveryHub, str]]] = None
+__SHARED_GRAPH_LOCK = threading.Lock()
+__LAST_SESSION: Optional['RoutingSession'] = None
 
+# Called with a stage name ('import' or 'routing') and the number of packages read or delivered so far
+ProgressCallback = Callable[[str, int], None]
+# How the trucks are loaded: 'nearest' loads priority packages and then the rest nearest neighbour first,
+# 'insertion' builds every truck's route by cheapest insertion with the packages' deadlines as time windows
+ROUTING_STRATEGIES = ('nearest', 'insertion')
 
-def __find_nearest_hub(pkgs: Iterable[PkgObject], location: Union[str, DeliveryHub]) -> PkgObject:
+
+class RoutingSession:
     """
-     T(n) = O(n)
-     S(n) = O(1)
-     Compares the distances between a package destination and specified delivery point
-     and forces the returned tuple to retain their types
-     :param: pkgs, location
-     :return PkgObject;
+    Owns the state of a single routing run: its trucks, packages, simulator and the graph it routes over.
+    The graph is only read while routing, so every session in the process shares the one returned by
+    shared_graph() unless another graph is provided. Sessions do not share any other state and can be run
+    concurrently from threads, or from asyncio through asyncio.to_thread(session.run).
     """
-    min_dist = float("inf")
-    closest_hub = None
-    for pkg in pkgs:
-        distance = __GRAPH.get_distance(pkg.address, location)
 
-        if distance < min_dist:
-            min_dist = distance
-            closest_hub = pkg
-    return cast(PkgObject, closest_hub)
+    def __init__(self, dh_graph: Optional[DHGraph[Union[DeliveryHub, str]]] = None, truck_count: int = 2,
+                 pkg_file: Optional[Path] = None, start_time: float = DAY_START, batched: bool = True,
+                 optimizer: Optional[OptimizerSettings] = None, chunk_size: int = CHUNK_SIZE,
+                 progress: Optional[ProgressCallback] = None, strategy: str = 'nearest'):
+        """
+        :param dh_graph: Graph to route over, defaults to the shared graph of the distance table
+        :param truck_count: Number of trucks in the fleet, numbered from 1 to match the package notes
+        :param pkg_file: Package file for the day being planned, defaults to the project package file
+        :param start_time: Time the trucks first leave the hub as minutes
+        :param batched: Uses the batched nearest neighbour selection when sorting packages
+        :param optimizer: Improves each loaded route with 2-opt and Or-opt moves before the truck departs
+        :param chunk_size: Number of packages parsed at a time while the package file is streamed
+        :param progress: Called from the thread running the session after each package chunk and each round of
+        routes. It is not called on the GUI thread, so a GUI hands it on to its own main loop
+        :param strategy: One of ROUTING_STRATEGIES
+        """
+        if strategy not in ROUTING_STRATEGIES:
+            raise ValueError(f'Unknown routing strategy: {strategy}')
+        self.dh_graph = shared_graph() if dh_graph is None else dh_graph
+        self.truck_count = truck_count
+        self.pkg_file = pkg_file
+        self.start_time = start_time
+        self.batched = batched
+        self.optimizer = optimizer
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.strategy = strategy
+        self.metrics: Optional[dict] = None  # Stage timers and counters of the last run
+        self.pool: Optional[ProcessPoolExecutor] = None  # Optimizer workers, started once per run
+        self.trucks: list[Truck] = []
+        self.pkgs: Table[int, PkgObject] = new_table()
+        self.pkg_dest_table: Table[int, list[PkgObject]] = new_table()
+        # The packages in ID order. A table's iteration order depends on its engine, so routing goes through this
+        # list and ties are broken by package ID whichever engine new_table() uses
+        self.pkgs_by_id: list[PkgObject] = []
+        self.simulator = DeliverySimulator(self.dh_graph)
 
+    def run(self) -> tuple[Table[int, PkgObject], list[Truck]]:
+        """
+        Assume:
+        n = number of delivery hubs
+        m = number of packages
+            T(n) = O(m)
+            S(n) = O(m)
+        Plans and simulates the day from a fresh fleet and package list. The graph is already built so only
+        the packages are read. While instrumentation is enabled the run's metrics are collected apart from
+        any other run's and kept in self.metrics. The optimizer's process pool is started once for the run and
+        reused by every round of routes
+        :return A tuple containing the hash table and a list of trucks:
+        """
+        self.pool = worker_pool(self.dh_graph, self.optimizer)
+        try:
+            with collect_metrics() as collector:
+                plan = self.__plan()
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown()
+                self.pool = None
+        if instrumentation_enabled():
+            self.metrics = collector.snapshot()
+        return plan
 
-def route_trucks() -> int:
-    """
-    T(n) = O(n)
-    S(n) = O(1)
-    Iterates over the list of trucks and calls the method for deliverying packages.
-    Additionally, it checks to see if enough time has passed for
-    the wrong address packages to have their address corrected. If enough time has passed it updates
-    the address and removes it from the list of packages with an incorrect address.
-    :param: None
-    :return: Number of packages delivered
-    """
-    global wrong_address_pkg
-    if wrong_address_pkg is None:
-        wrong_address_pkg = [pkg[1] for pkg in __PKGS_ALL if pkg[1].wrong_address]
-    delivered = 0
-    for truck in __TRUCKS_ALL:
-        delivered += len(truck.pkg_lst)
-        truck.deliver_packages(__GRAPH)
-        if len(wrong_address_pkg) != 0:
-            for pkg in wrong_address_pkg:
-                if pkg.address_correction_available(truck.get_time_elapsed()):
-                    pkg.corrected_address()
-                    wrong_address_pkg.remove(pkg)
-    return delivered
-
-
-def sort_packages(pkgs: Iterable[PkgObject]):
-    """
-    T(n) = O(n)
-    S(n) = O(1)
-    Sorts packages between the trucks in an attempt to create the shortest path possible
-    with the provided trucks and packages.
-    :param pkgs:
-    :return No return value:
-    """
-    pkg_count = float('inf')
-    while pkg_count > 2:
+    def __plan(self) -> tuple[Table[int, PkgObject], list[Truck]]:
+        self.trucks = [Truck(t + 1, self.start_time) for t in range(self.truck_count)]
+        self.simulator = DeliverySimulator(self.dh_graph)
+        importer = PkgImporter(self.dh_graph)  # Resolves each package address to a hub ID once, as it is read
+        self.pkgs, self.pkg_dest_table = importer.pkgs, importer.pkg_dest_table
+        # Each chunk is scheduled while the rest of the package file is still being parsed
         pkg_count = 0
-        for truck in __TRUCKS_ALL:
-            if truck.truck_full():
-                continue
-            __min = float('inf')
-            nearest = None
-            for pkg in pkgs:
-                if pkg.pkg_delivery_eligibility(truck):
-                    pkg_count += 1
-                    distance = __GRAPH.get_distance(truck.truck_location(), pkg.address)
-                    if distance < __min:
-                        __min = distance
-                        nearest = pkg
+        with stage('pkg_import'):
+            for chunk in importer.stream(pkg_rows(pkg_source(self.pkg_file)), self.chunk_size):
+                self.simulator.schedule_address_corrections(chunk)
+                pkg_count += len(chunk)
+                self.__report('import', pkg_count)
+        self.pkgs_by_id = [pkg for (_, pkg) in sorted(self.pkgs, key=lambda item: item[0])]
+        if self.strategy == 'insertion':
+            self.__route_by_insertion()
+            return self.pkgs, self.trucks
+        priority_pending_delivery = True
+        while priority_pending_delivery:
+            self.__priority_first()
+            if priority_pending_delivery := any([not truck.truck_empty() for truck in self.trucks]):
+                self.deliver_remainder_of_pkgs()
+        remaining_pkgs = sum(map(lambda x: 0 if x[1].pkg_is_delivered() else 1, self.pkgs))
+        while remaining_pkgs != 0:
+            self.__report('routing', pkg_count - remaining_pkgs)
+            if (delivered := self.deliver_remainder_of_pkgs()) == 0:
+                self.__wait_for_pkgs()
+            remaining_pkgs -= delivered
+        self.__report('routing', pkg_count)
+        return self.pkgs, self.trucks
 
-            if nearest is not None:
-                truck.load_truck(nearest)
+    def __wait_for_pkgs(self) -> None:
+        """
+        T(n) = O(m log m)
+        Called when a round delivered nothing because every package left is still unavailable. The empty trucks
+        wait at the hub for the next package, and address corrections due by then are applied
+        :return No return value:
+        """
+        pending = [pkg for pkg in self.pkgs_by_id if not pkg.pkg_is_delivered()]
+        if not wait_at_hub(self.trucks, pending):
+            raise ValueError(f'Packages {sorted(pkg.pkg_id for pkg in pending)} cannot be loaded onto any truck')
+        self.simulator.apply_corrections(max(truck.get_time_elapsed() for truck in self.trucks))
 
+    def __route_by_insertion(self) -> None:
+        """
+        Assume:
+        m = number of packages
+        t = number of trucks
+            T(n) = O(m**2 * t / 16) for m / 16t rounds which each cost the packages still at the hub
+            S(n) = O(m * t)
+        Loads the trucks by cheapest insertion and dispatches them until every package is delivered. A truck with
+        nothing to carry waits at the hub for the next package to become available
+        :return No return value:
+        """
+        planner = InsertionPlanner(self.dh_graph, self.trucks)
+        pending = list(self.pkgs_by_id)
+        delivered = 0
+        while len(pending := [pkg for pkg in pending if not pkg.pkg_is_delivered()]) != 0:
+            self.simulator.apply_corrections(max(truck.get_time_elapsed() for truck in self.trucks))
+            loaded = planner.load_trucks(pending)
+            if not planner.wait_for_pkgs(pending) and loaded == 0:
+                raise ValueError(f'Packages {sorted(pkg.pkg_id for pkg in pending)} cannot be loaded onto any truck')
+            if loaded != 0:
+                delivered += self.route_trucks([truck for truck in self.trucks if not truck.truck_empty()])
+                self.__report('routing', delivered)
 
-def pkg_importer() -> tuple[HashTable[int, PkgObject], HashTable[str, list[PkgObject]]]:
-    """
-    T(n) = O(n)
-    S(n) = O(n)
-    This parses the reformatted packages csv file and converts the package information into a list
-    of PkgObjects and then inserts them into a table containing all packages for a given destination
-    :param: None
-    :return tuple(PkgObject Table, PkgObject Destination Table):
-    """
-    pkgs = HashTable[int, PkgObject]()
-    pkg_dest_table = HashTable[str, list[PkgObject]]()
-    dependency_table = HashTable[int, set[PkgObject]]()
-
-    with (open(__wgups_pkgs) as pkg_f):
-        pkg_reader = csv.reader(pkg_f, delimiter=';')
-        next(pkg_reader)
-        for row in pkg_reader:
-            n_pkg = PkgObject(*row)
-            pkgs.insert(n_pkg.pkg_id, n_pkg)
-            if (lst_of_pkgs := pkg_dest_table.fetch_bucket(n_pkg.address)) is None:
-                lst_of_pkgs: list[PkgObject] = []
-                pkg_dest_table.insert(n_pkg.address, lst_of_pkgs)
-            lst_of_pkgs.append(n_pkg)
-            for depend_pkg in n_pkg.depend_pkgs:
-                if (depend_pkg_set := dependency_table.fetch_bucket(depend_pkg)) is None:
-                    depend_pkg_set = set()
-                    dependency_table.insert(depend_pkg, depend_pkg_set)
-                depend_pkg_set.add(n_pkg)
-            for k_pkg in dependency_table.fetch_bucket(n_pkg.pkg_id) or []:
-                k_pkg.pkg_dependencies.add(n_pkg)
-                n_pkg.pkg_dependencies.add(k_pkg)
-    return pkgs, pkg_dest_table
-
-
-def __priority_first(pkg_dest_table: HashTable[str, list[PkgObject]]):
-    """
-    T(n): O(n)
-    S(n): O(n)
-    Builds a list of priority packages based on a call to the eligiblity method
-    Loads the packages onto a truck if they are a priority package
-    :param pkg_dest_table:
-    :return None:
-    """
-    priority_pkgs = set([pkg[1] for pkg in __PKGS_ALL if any([pkg[1].pkg_prioritizer(x.get_time_elapsed())
-                                                              and pkg[1].pkg_delivery_eligibility(x) for x in
-                                                              __TRUCKS_ALL])])
-    __TRUCKS_ALL.sort(key=lambda x: x.total_miles)
-    for truck in __TRUCKS_ALL:
-        while not truck.truck_full() and len(priority_pkgs) != 0:
-            nearest = __find_nearest_hub(priority_pkgs, truck.truck_location())
-            depend_pkg = nearest.pkg_dependencies
-            for pkg in depend_pkg:
-                depend_pkg = depend_pkg.union(cast(set[PkgObject], pkg.pkg_dependencies))
-            depend_pkg.add(nearest)
-            if truck.max_truck_capacity() >= len(depend_pkg):
+    def __report(self, stage: str, count: int) -> None:
+        if self.progress is not None:
+            self.progress(stage, count)
+
+    def incremental_planner(self) -> IncrementalPlanner:
+        """
+        Creates a planner over the packages, graph and trucks of the last run so late packages, address changes
+        and new packages can be worked into the plan without routing the whole day again
+        :return IncrementalPlanner for the current plan:
+        """
+        return IncrementalPlanner(self.dh_graph, self.pkgs, self.pkg_dest_table, self.trucks)
+
+    def __find_nearest_hub(self, pkgs: Iterable[PkgObject], location: int) -> PkgObject:
+        """
+         T(n) = O(n)
+         S(n) = O(1)
+         Compares the distances between a package destination and specified delivery point
+         and forces the returned tuple to retain their types
+         :param: pkgs, location
+         :return PkgObject;
+        """
+        min_dist = float("inf")
+        closest_hub = None
+        for pkg in pkgs:
+            distance = self.dh_graph.get_distance_by_id(pkg.hub_id, location)
+
+            if distance < min_dist or (distance == min_dist and pkg.pkg_id < closest_hub.pkg_id):
+                min_dist = distance
+                closest_hub = pkg
+        return cast(PkgObject, closest_hub)
+
+    def route_trucks(self, trucks: Optional[list[Truck]] = None) -> int:
+        """
+        T(n) = O(n log n)
+        S(n) = O(n)
+        Dispatches every loaded truck through the event simulator, which advances all the trucks on one clock
+        and corrects wrong addresses at the moment the corrected address becomes available.
+        When optimizer settings are provided each truck's stop order is improved before it departs.
+        :param trucks: Trucks to dispatch, defaults to the whole fleet
+        :return: Number of packages delivered
+        """
+        trucks = self.trucks if trucks is None else trucks
+        if self.optimizer is not None:  # The routes are independent once loaded so they are all improved together
+            optimize_trucks(trucks, self.dh_graph, self.optimizer, self.pool)
+        return self.simulator.run(trucks)
+
+    def sort_packages(self, pkgs: Iterable[PkgObject]):
+        """
+        T(n) = O(n)
+        S(n) = O(1)
+        Sorts packages between the trucks in an attempt to create the shortest path possible
+        with the provided trucks and packages. The batched mode produces the same assignments as the scan.
+        :param pkgs:
+        :return No return value:
+        """
+        if self.batched:
+            self.__sort_packages_batched(list(pkgs))
+            return
+
+        pkg_count = float('inf')
+        while pkg_count > 2:
+            pkg_count = 0
+            for truck in self.trucks:
+                if truck.truck_full():
+                    continue
+                __min = float('inf')
+                nearest = None
+                for pkg in pkgs:
+                    if pkg.pkg_delivery_eligibility(truck) and len(pkg.pending_group()) <= truck.max_truck_capacity():
+                        pkg_count += 1
+                        distance = self.dh_graph.get_distance_by_id(truck.truck_location_id(), pkg.hub_id)
+                        if distance < __min:
+                            __min = distance
+                            nearest = pkg
+
+                if nearest is not None:
+                    self.__load_group(truck, nearest)
+
+    def __sort_packages_batched(self, pkgs: list[PkgObject]):
+        """
+        T(n) = O(n * t) to build the eligibility masks, then O(n) array work for each package loaded
+        S(n) = O(n * t)
+        Keeps an eligibility mask of the packages for every truck and picks the nearest eligible package
+        with a single argmin over the distance matrix row for the truck's current location. Truck times do not
+        change while sorting, so a mask entry only has to be refreshed when a package in the same
+        dependency group is loaded.
+        :param pkgs:
+        :return No return value:
+        """
+        if len(pkgs) == 0:
+            return
+        positions: Table[int, int] = new_table()
+        for (i, pkg) in enumerate(pkgs):
+            positions.insert(pkg.pkg_id, i)
+        pkg_hubs = [HUB_ID if pkg.hub_id is None else pkg.hub_id for pkg in pkgs]
+        # Number of packages each package's group would put on a truck, a group is only loaded when it all fits
+        group_sizes = [len(pkg.pending_group()) for pkg in pkgs]
+        masks = [[pkg.pkg_delivery_eligibility(truck) for pkg in pkgs] for truck in self.trucks]
+        if np is not None:
+            pkg_hubs = np.array(pkg_hubs, dtype=np.intp)
+            group_sizes = np.array(group_sizes, dtype=np.intp)
+            masks = [np.array(mask, dtype=bool) for mask in masks]
+
+        pkg_count = float('inf')
+        while pkg_count > 2:
+            pkg_count = 0
+            for (truck, mask) in zip(self.trucks, masks):
+                if truck.truck_full():
+                    continue
+                capacity = truck.max_truck_capacity()
+                if np is not None:
+                    fits = mask & (group_sizes <= capacity)
+                    eligible = int(fits.sum())
+                else:
+                    fits = [m and size <= capacity for (m, size) in zip(mask, group_sizes)]
+                    eligible = sum(fits)
+                if eligible == 0:
+                    continue
+                pkg_count += eligible
+                row = self.dh_graph.distance_row(truck.truck_location_id())
+                if np is not None:
+                    nearest = int(np.where(fits, row[pkg_hubs], np.inf).argmin())
+                else:
+                    nearest = min(compress(range(len(pkgs)), fits), key=lambda i: row[pkg_hubs[i]])
+
+                # Loading a group can only change the eligibility of the packages in it
+                for pkg in self.__load_group(truck, pkgs[nearest]):
+                    if (position := positions.fetch_bucket(pkg.pkg_id)) is not None:
+                        for (other_truck, other_mask) in zip(self.trucks, masks):
+                            other_mask[position] = pkg.pkg_delivery_eligibility(other_truck)
+
+    def __load_group(self, truck: Truck, pkg: PkgObject) -> list[PkgObject]:
+        """
+        T(n) = O(k**2) for the k packages of the group
+        Loads a package together with every package of its group still at the hub, nearest first from the
+        truck's location, so a group is always loaded onto a truck as a whole
+        :param truck:
+        :param pkg:
+        :return Packages loaded:
+        """
+        group = set(pkg.pending_group())
+        loaded = []
+        while len(group) != 0:
+            nearest = self.__find_nearest_hub(group, truck.truck_location_id())
+            group.discard(nearest)
+            truck.load_truck(nearest)
+            loaded.append(nearest)
+        return loaded
+
+    def __priority_first(self):
+        """
+        T(n): O(n)
+        S(n): O(n)
+        Builds a list of priority packages based on a call to the eligiblity method
+        Loads the packages onto a truck if they are a priority package. The nearest priority package is
+        found through the graph's neighbour index rather than by measuring every pending package.
+        :return None:
+        """
+        priority = [pkg for pkg in self.pkgs_by_id
+                    if any([pkg.pkg_prioritizer(x.get_time_elapsed()) and pkg.pkg_delivery_eligibility(x)
+                            for x in self.trucks])]
+        self.trucks.sort(key=lambda x: x.total_miles)
+        for truck in self.trucks:
+            # Only the priority packages this truck may carry, a package can be a priority for another truck only
+            priority_pkgs = PendingPkgIndex(self.dh_graph, [pkg for pkg in priority
+                                                            if pkg.pkg_delivery_eligibility(truck)])
+            while not truck.truck_full() and len(priority_pkgs) != 0:
+                nearest = priority_pkgs.nearest(truck.truck_location_id())
+                depend_pkg = set(nearest.pending_group())
+                if truck.max_truck_capacity() < len(depend_pkg):
+                    priority_pkgs.discard(nearest)  # Left at the hub for a truck with room for its whole group
+                    continue
                 while len(depend_pkg) != 0:
-                    pkg = __find_nearest_hub(depend_pkg, truck.truck_location())
+                    pkg = self.__find_nearest_hub(depend_pkg, truck.truck_location_id())
                     depend_pkg.discard(pkg)
-                    if not pkg.check_at_hub_status():
-                        continue
                     priority_pkgs.discard(pkg)
                     truck.load_truck(pkg)
-                    for k in (pkg_dest_table.fetch_bucket(pkg.address)) or []:
-                        if not truck.truck_full() and k.pkg_delivery_eligibility(truck):
-                            priority_pkgs.discard(k)
-                            truck.load_truck(k)
+                    for k in (self.pkg_dest_table.fetch_bucket(pkg.hub_id)) or []:
+                        # Room is kept for the rest of the group being loaded, its own members are loaded by the loop
+                        if (k not in depend_pkg and k.pkg_delivery_eligibility(truck)
+                                and len(k.pending_group()) <= truck.max_truck_capacity() - len(depend_pkg)):
+                            for loaded in self.__load_group(truck, k):
+                                priority_pkgs.discard(loaded)
+
+    def deliver_remainder_of_pkgs(self) -> int:
+        """
+        T(n) = O(n)
+        S(n) = O(n)
+        Used to deliver any remaining packages after priority packages have been delivered
+        :return returns the number of routes for a truck as an integer:
+        """
+        pkg_lst = []
+        for pkg in self.pkgs_by_id:
+            if pkg.check_at_hub_status():
+                pkg_lst.append(pkg)
+
+        self.sort_packages(pkg_lst)
+        return self.route_trucks()
 
 
-def deliver_remainder_of_pkgs() -> int:
+def pkg_importer(pkg_file: Optional[Path] = None, dh_graph: Optional[DHGraph[Union[DeliveryHub, str]]] = None
+                 ) -> tuple[Table[int, PkgObject], Table[int, list[PkgObject]]]:
     """
     T(n) = O(n)
     S(n) = O(n)
-    Used to deliver any remaining packages after priority packages have been delivered
-    :param No input parameters:
-    :return returns the number of routes for a truck as an integer:
+    This parses the reformatted packages csv file and converts the package information into a list
+    of PkgObjects and then inserts them into a table containing all packages for a given destination hub ID
+    :param pkg_file:
+    :param dh_graph: Graph the addresses are resolved against, defaults to the shared graph
+    :return tuple(PkgObject Table, PkgObject Destination Table):
     """
-    pkg_lst = []
-    for (_, pkg) in __PKGS_ALL:
-        if pkg.check_at_hub_status():
-            pkg_lst.append(pkg)
+    importer = PkgImporter(shared_graph() if dh_graph is None else dh_graph)
+    for _ in importer.stream(pkg_rows(pkg_source(pkg_file))):
+        pass
+    return importer.pkgs, importer.pkg_dest_table
+
+
+def pkg_source(pkg_file: Optional[Path] = None) -> Path:
+    """
+    Returns the package file to read, defaulting to the project package file
+    :param pkg_file:
+    :return Path of the package file:
+    """
+    return __wgups_pkgs if pkg_file is None else pkg_file
+
 
-    sort_packages(pkg_lst)
-    return route_trucks()
+def pkg_rows(pkg_file: Path) -> Iterator[list[str]]:
+    """
+    Streams the rows of a package file, read directly from the workbook when an XLSX file is provided
+    :param pkg_file:
+    :return Generator of package rows:
+    """
+    return pkg_rows_from_xlsx(pkg_file) if pkg_file.suffix.lower() == '.xlsx' else read_pkg_rows(pkg_file)
+
+
+def distance_rows(dist_file: Path) -> Iterator[list[str]]:
+    """
+    Streams the rows of a distance table, read directly from the workbook when an XLSX file is provided
+    :param dist_file:
+    :return Generator of distance rows:
+    """
+    if dist_file.suffix.lower() == '.xlsx':
+        yield from distance_rows_from_xlsx(dist_file)
+        return
+    with open(dist_file) as dist_f:
+        yield from csv.reader(dist_f, delimiter=';', quotechar='"')
 
 
-def distance_finder() -> DHGraph[Union[DeliveryHub, str]]:
+def distance_finder(dense: bool = True, dist_file: Optional[Path] = None,
+                    cache_dir: Optional[Path] = GRAPH_CACHE_DIR) -> DHGraph[Union[DeliveryHub, str]]:
     """
     T(n) = O(n * (n-1)/2) = O(n**2)
     S(n) = O(n**2)
     Uses the distance chart provided for the project to build a graph by using the postal code and address
     as a unique identifier. This enables the delivery hub to be searched for by either a string containing
-    this information or the delivery hub object.
-    :param: None
+    this information or the delivery hub object. When dense is set the graph is compiled into a distance
+    matrix indexed by hub ID along with each hub's neighbours sorted by distance. A dense graph is loaded
+    from the graph cache while the distance chart is unchanged and the cache is rebuilt when it changes.
+    The distance chart may be the csv file or the XLSX workbook.
+    :param dense:
+    :param dist_file:
+    :param cache_dir: Directory of the graph cache, None always parses the distance chart
     :return Graph of Delivery Hubs:
     """
+    dist_file = __wgups_dists if dist_file is None else dist_file
+    if dense and cache_dir is not None:
+        if (dh_graph := load_graph_cache(dist_file, DeliveryHub, cache_dir)) is not None:
+            dh_graph.build_neighbour_index()
+            return dh_graph
+
     dh_graph = DHGraph[Union[DeliveryHub, str]]()
-    with open(__wgups_dists) as dist_f:
-        delivery_hubs: list[DeliveryHub] = []
-        hub_reader = csv.reader(dist_f, delimiter=';', quotechar='"')
-        for dh_name, dh_addr, *dh_dists in hub_reader:
-            hub = DeliveryHub(dh_name, dh_addr)
-            dh_graph.insert_hub(hub)
-            delivery_hubs.append(hub)
-            for (h, dist) in enumerate(dh_dists):
-                dh_graph.insert_graph_edge(hub, delivery_hubs[h], float(dist))
-        return dh_graph
+    delivery_hubs: list[DeliveryHub] = []
+    for dh_name, dh_addr, *dh_dists in distance_rows(dist_file):
+        hub = DeliveryHub(dh_name, dh_addr)
+        dh_graph.insert_hub(hub)
+        delivery_hubs.append(hub)
+        for (h, dist) in enumerate(dh_dists):
+            dh_graph.insert_graph_edge(hub, delivery_hubs[h], float(dist))
+    if dense:
+        dh_graph.compile_dense()
+        dh_graph.build_neighbour_index()
+        if cache_dir is not None and not save_graph_cache(dist_file, dh_graph,
+                                                          lambda hub: [hub.dh_name, hub.dh_address], cache_dir):
+            logger.warning('Graph cache could not be written to %s', cache_dir)
+    return dh_graph
 
 
-def auto_router() -> tuple[HashTable[int, PkgObject], list[Truck]]:
+def shared_graph() -> DHGraph[Union[DeliveryHub, str]]:
+    """
+    Returns the graph of the distance table, building it on the first call. The graph is built once per
+    process and is shared by every routing session
+    :return Graph of Delivery Hubs:
+    """
+    global __SHARED_GRAPH
+    if __SHARED_GRAPH is None:
+        with __SHARED_GRAPH_LOCK:
+            if __SHARED_GRAPH is None:
+                __SHARED_GRAPH = distance_finder()  # O(n**2) n is the number of hubs in the graph
+    return __SHARED_GRAPH
+
+
+def auto_router(batched: bool = True, optimizer: Optional[OptimizerSettings] = None,
+                strategy: str = 'nearest') -> tuple[Table[int, PkgObject], list[Truck]]:
     """
     Assume:
     n = number of delivery hubs
     m = number of packages
-        T(n) = O(n**2) + O(m)
+        T(n) = O(n**2) on the first call, O(m) afterwards
         S(n) = O(n**2) + O(m)
     This method is responsible for determining the best way to deliver the packages
-    :param No input parameters:
-    :return A tuple containing the hash table and a list of trucks, __PKGS_ALL and __TRUCKS_ALL:
-    """
-    global __PKGS_ALL
-    global __TRUCKS_ALL
-    global __GRAPH
-    __TRUCKS_ALL = [Truck(), Truck()]
-    __PKGS_ALL, pkg_dest_table = pkg_importer()  # As defined above T(n) = O(m)
-    __GRAPH = distance_finder()  # O(n**2) m is the number of hubs in the graph
-    priority_pending_delivery = True
-    while priority_pending_delivery:
-        __priority_first(pkg_dest_table)
-        if priority_pending_delivery := any([not truck.truck_empty() for truck in __TRUCKS_ALL]):
-            deliver_remainder_of_pkgs()
-    remaining_pkgs = sum(map(lambda x: 0 if x[1].pkg_is_delivered() else 1, __PKGS_ALL))
-    while remaining_pkgs != 0:
-        remaining_pkgs -= deliver_remainder_of_pkgs()
-    return __PKGS_ALL, __TRUCKS_ALL
+    :param batched: Uses the batched nearest neighbour selection when sorting packages
+    :param optimizer: Improves each loaded route with 2-opt and Or-opt moves before the truck departs
+    :param strategy: How the trucks are loaded, one of ROUTING_STRATEGIES
+    :return A tuple containing the hash table and a list of trucks:
+    """
+    global __LAST_SESSION
+    session = RoutingSession(batched=batched, optimizer=optimizer, strategy=strategy)
+    plan = session.run()
+    __LAST_SESSION = session
+    return plan
+
+
+def incremental_planner() -> IncrementalPlanner:
+    """
+    Creates a planner over the plan of the last auto_router call
+    :return IncrementalPlanner for the current plan:
+    """
+    return __LAST_SESSION.incremental_planner()
+
+
+# Timed as pipeline stages while instrumentation is enabled, see log_services.instrumentation
+instrument_stages(RoutingSession, {'route_trucks': 'route_trucks', 'sort_packages': 'sort_packages',
+                                   '_RoutingSession__priority_first': 'priority_first'})
+instrument_stages(sys.modules[__name__], {'distance_finder': 'distance_finder', 'pkg_importer': 'pkg_import'})
@@ -0,0 +1,169 @@
+from __future__ import annotations
+import heapq
+from enum import IntEnum
+from itertools import count
+from typing import Iterable, NamedTuple, Optional, Union, TYPE_CHECKING
+
+from delivery_services.truck import HUB_ID, TRUCK_SPEED
+
+if TYPE_CHECKING:
+    from delivery_services.delivery_hub import DeliveryHub
+    from delivery_services.pkg_handler import PkgObject
+    from delivery_services.truck import Truck
+    from data_services.graph import DHGraph
+
+
+class EventKind(IntEnum):
+    # Events happening at the same time are handled in this order
+    ADDRESS_CORRECTION = 0
+    DEPART = 1
+    ARRIVE = 2
+    DELIVER = 3
+    RETURN = 4
+
+
+class Event(NamedTuple):
+    time: float
+    kind: EventKind
+    seq: int  # Keeps events at the same time and of the same kind in the order they were scheduled
+    truck: Optional[Truck] = None
+    pkg: Optional[PkgObject] = None
+    stop: int = 0
+
+
+class DeliverySimulator:
+    """
+    Discrete event simulation of the fleet. Every truck is advanced on one shared clock through a heap of
+    depart, arrive, deliver, return and address correction events, so events that happen in the middle of
+    a route are applied at the moment they occur.
+    """
+
+    def __init__(self, dh_graph: DHGraph[Union[DeliveryHub, str]]):
+        self.dh_graph = dh_graph
+        self.clock = 0.0
+        self.__events: list[Event] = []
+        self.__seq = count()
+        self.__pending_corrections: list[Event] = []
+        self.__truck_events = 0  # Number of queued events which belong to a truck
+
+    def schedule(self, time: float, kind: EventKind, truck: Optional[Truck] = None,
+                 pkg: Optional[PkgObject] = None, stop: int = 0) -> None:
+        """
+        T(n) = O(log n)
+        Adds an event to the queue
+        :param time:
+        :param kind:
+        :param truck:
+        :param pkg:
+        :param stop:
+        :return No return value:
+        """
+        if truck is not None:
+            self.__truck_events += 1
+        heapq.heappush(self.__events, Event(time, kind, next(self.__seq), truck, pkg, stop))
+
+    def schedule_address_corrections(self, pkgs: Iterable[PkgObject]) -> None:
+        """
+        Schedules a correction for every package with a wrong address at the time its address becomes available
+        :param pkgs:
+        :return No return value:
+        """
+        for pkg in pkgs:
+            if pkg.wrong_address:
+                self.schedule(pkg.get_available_time(), EventKind.ADDRESS_CORRECTION, pkg=pkg)
+
+    def run(self, trucks: list[Truck]) -> int:
+        """
+        T(n) = O(e log e) for e events
+        S(n) = O(e)
+        Dispatches every truck from the hub at its current time and processes events in time order until all
+        trucks are back. Address corrections fire once the clock reaches them, including the time of a truck
+        that stayed at the hub, any later ones stay queued for the next run.
+        :param trucks:
+        :return Number of packages delivered:
+        """
+        delivered = 0
+        for truck in trucks:
+            delivered += len(truck.pkg_lst)
+            self.schedule(truck.get_time_elapsed(), EventKind.DEPART, truck)
+        for event in self.__pending_corrections:
+            heapq.heappush(self.__events, event)
+        self.__pending_corrections.clear()
+
+        horizon = max((truck.get_time_elapsed() for truck in trucks), default=self.clock)
+        while len(self.__events) != 0:
+            event = heapq.heappop(self.__events)
+            if event.truck is not None:
+                self.__truck_events -= 1
+            # Once no truck is left on the road the clock cannot move past the last truck's time
+            elif self.__truck_events == 0 and event.time > horizon:
+                self.__pending_corrections.append(event)
+                continue
+            self.clock = max(self.clock, event.time)
+            self.__handle(event)
+            if event.truck is not None:
+                horizon = max(horizon, event.truck.get_time_elapsed())
+        return delivered
+
+    def apply_corrections(self, time: float) -> int:
+        """
+        T(n) = O(c log e) for the c corrections applied
+        Applies the address corrections due by the provided time between runs, while every truck is at the hub.
+        A planner loading the trucks at that time then sees the corrected addresses
+        :param time:
+        :return Number of corrections applied:
+        """
+        for event in self.__pending_corrections:
+            heapq.heappush(self.__events, event)
+        self.__pending_corrections.clear()
+        applied = 0
+        while len(self.__events) != 0 and self.__events[0].time <= time and self.__events[0].truck is None:
+            event = heapq.heappop(self.__events)
+            self.clock = max(self.clock, event.time)
+            self.__handle(event)
+            applied += 1
+        return applied
+
+    def __handle(self, event: Event) -> None:
+        """
+        Applies a single event to the truck or package it belongs to and schedules what follows it
+        :param event:
+        :return No return value:
+        """
+        truck = event.truck
+        if event.kind == EventKind.ADDRESS_CORRECTION:
+            event.pkg.corrected_address()
+            event.pkg.hub_id = self.dh_graph.hub_id(event.pkg.address)
+
+        elif event.kind == EventKind.DEPART:
+            truck.depart()
+            self.__schedule_next_stop(truck, 0)
+
+        elif event.kind == EventKind.ARRIVE:
+            truck.drive_to(event.pkg.hub_id, self.dh_graph)
+            self.schedule(truck.get_time_elapsed(), EventKind.DELIVER, truck, event.pkg, event.stop)
+
+        elif event.kind == EventKind.DELIVER:
+            truck.deliver_package(event.pkg)
+            self.__schedule_next_stop(truck, event.stop + 1)
+
+        elif event.kind == EventKind.RETURN:
+            truck.return_to_hub(self.dh_graph)
+
+    def __schedule_next_stop(self, truck: Truck, stop: int) -> None:
+        """
+        Schedules the arrival at the truck's next stop, or its return to the hub after the last one
+        :param truck:
+        :param stop:
+        :return No return value:
+        """
+        if stop < len(truck.pkg_lst):
+            pkg = truck.pkg_lst[stop]
+            kind = EventKind.ARRIVE
+            next_hub = pkg.hub_id
+        else:
+            pkg = None
+            kind = EventKind.RETURN
+            next_hub = HUB_ID
+        distance = self.dh_graph.get_distance_by_id(truck.current_hub, next_hub)
+        self.schedule(truck.get_time_elapsed() + distance / TRUCK_SPEED * 60, kind, truck, pkg, stop)
@@ -0,0 +1,96 @@
+from __future__ import annotations
+from bisect import bisect_right
+from typing import Iterable, Optional
+
+from data_services.hash_table import Table, new_table
+from delivery_services.pkg_handler import PkgObject
+
+NEVER = float('inf')  # Event time of a package that was not loaded or delivered
+
+
+class StatusTimeline:
+    """
+    Index of the load and delivery times of a finished plan. The status of every package at a time is answered
+    with binary searches instead of comparing the timestamps of every package, and the rendered status text is
+    cached. A package's status only changes at an event time, so every time between two consecutive events
+    shares one cache entry. Call rebuild after the plan changes.
+    """
+
+    def __init__(self, pkgs: Iterable[tuple[int, PkgObject]]):
+        self.pkgs: list[PkgObject] = []
+        self.load_times: list[float] = []
+        self.load_ids: list[int] = []
+        self.deliver_times: list[float] = []
+        self.deliver_ids: list[int] = []
+        self.event_times: list[float] = []
+        self.rendered: Table[tuple[int, bool], str] = new_table()
+        self.rebuild(pkgs)
+
+    def rebuild(self, pkgs: Iterable[tuple[int, PkgObject]]) -> None:
+        """
+        T(n) = O(n log(n))
+        S(n) = O(n)
+        Sorts the packages by ID and their load and delivery events by time, and drops the rendered text
+        :param pkgs: Package IDs and packages, such as the package table
+        :return No return value:
+        """
+        self.pkgs = [pkg for (_, pkg) in sorted(pkgs, key=lambda item: item[0])]
+        loads = sorted((self.__event_time(pkg.get_loaded_time()), pkg.pkg_id) for pkg in self.pkgs)
+        delivers = sorted((self.__event_time(pkg.delivered_at_time), pkg.pkg_id) for pkg in self.pkgs)
+        self.load_times, self.load_ids = [t for (t, _) in loads], [pkg_id for (_, pkg_id) in loads]
+        self.deliver_times, self.deliver_ids = [t for (t, _) in delivers], [pkg_id for (_, pkg_id) in delivers]
+        self.event_times = sorted({t for t in self.load_times + self.deliver_times if t != NEVER})
+        self.rendered = new_table()
+
+    @staticmethod
+    def __event_time(time: Optional[float]) -> float:
+        return NEVER if time is None else time
+
+    def delivered_ids(self, time: float) -> list[int]:
+        """
+        T(n) = O(log(n) + k) for the k packages returned
+        Returns the IDs of the packages delivered by the provided time, in delivery order
+        :param time:
+        :return List of package IDs:
+        """
+        return self.deliver_ids[:bisect_right(self.deliver_times, time)]
+
+    def enroute_ids(self, time: float) -> list[int]:
+        """
+        T(n) = O(log(n) + k) for the k packages loaded by the provided time
+        Returns the IDs of the packages loaded but not yet delivered at the provided time, in loading order
+        :param time:
+        :return List of package IDs:
+        """
+        delivered = set(self.delivered_ids(time))
+        return [pkg_id for pkg_id in self.load_ids[:bisect_right(self.load_times, time)] if pkg_id not in delivered]
+
+    def status_counts(self, time: float) -> dict[PkgObject.StatusCode, int]:
+        """
+        T(n) = O(log(n))
+        Returns the number of packages with each status at the provided time
+        :param time:
+        :return Dictionary of status codes to package counts:
+        """
+        loaded = bisect_right(self.load_times, time)
+        delivered = bisect_right(self.deliver_times, time)
+        return {PkgObject.StatusCode.AT_HUB: len(self.pkgs) - loaded,
+                PkgObject.StatusCode.ENROUTE: loaded - delivered,
+                PkgObject.StatusCode.DELIVERED: delivered}
+
+    def render(self, time: int, detailed: bool = False) -> str:
+        """
+        T(n) = O(log(n)) when cached, otherwise O(n)
+        Returns the status text of every package at the provided time, one line per package in ID order
+        :param time:
+        :param detailed: Uses all_pkg_info_status instead of get_pkg_information
+        :return Status text:
+        """
+        key = (bisect_right(self.event_times, time), detailed)
+        if (text := self.rendered.fetch_bucket(key)) is None:
+            if detailed:
+                text = ''.join(f'{pkg.all_pkg_info_status(time)}\n' for pkg in self.pkgs)
+            else:
+                text = ''.join(f'{pkg.get_pkg_information(time)}\n' for pkg in self.pkgs)
+            self.rendered.insert(key, text)
+        return text
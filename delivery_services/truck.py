@@ -1,21 +1,12 @@
 from __future__ import annotations
 import logging
+from bisect import bisect_right
+from log_services import get_logger
 from utilities import debug, convert_minutes, SOURCE_DIR
-from typing import Union, TYPE_CHECKING
-
-# Creates a logger using the module name
-logger = logging.getLogger(__name__)
-# Specifies that only DEBUG level logs should be saved
-logger.setLevel(logging.DEBUG)
-# Specifies the name and path for the log file
-truck_log_file = SOURCE_DIR / 'delivery_services' / 'delivery_logs' / 'truck.log'
-routing_handler = logging.FileHandler(truck_log_file)
-# Specifies a format for the logs being recorded
-formatter = logging.Formatter('%(asctime)s : %(levelname)s : %(name)s : %(message)s')
-# Sets the handler's formatter
-routing_handler.setFormatter(formatter)
-# Adds the file handler to the logger
-logger.addHandler(routing_handler)
+from typing import Iterable, Optional, Union, TYPE_CHECKING
+
+# Records are queued and written as JSON lines by a background listener, see log_services
+logger = get_logger(__name__, SOURCE_DIR / 'delivery_services' / 'delivery_logs' / 'truck.log')
 
 
 if TYPE_CHECKING:
@@ -23,6 +14,12 @@ if TYPE_CHECKING:
     from pkg_handler import PkgObject
     from data_services.graph import DHGraph
 
+# The hub is always the first row of the distance table, so it is interned as hub ID 0
+HUB_ID = 0
+DAY_START = 8 * 60  # Trucks leave the hub for the first time at 8:00 am
+TRUCK_SPEED = 18  # Constant average speed in miles per hour
+TRUCK_CAPACITY = 16  # Packages a truck can carry on one route
+
 
 class Truck:
     truck_number = 0
@@ -38,23 +35,39 @@ class Truck:
         return Truck.truck_number
 
     @staticmethod
-    def elapsed_time(time: float):
+    def elapsed_time(time: float, start_time: float = DAY_START):
         """
         Calculates the elapsed travel time, assuming no accidents and a constant 18
         miles per hour maximum speed using the number of miles traveled as an input
         :param time:
+        :param start_time:
         :return:
         """
-        return (8 * 60) + (time / 18 * 60)
+        return start_time + (time / TRUCK_SPEED * 60)
+
+    __slots__ = ('total_miles', 'pkg_lst', 'truck', 'deliveries_completed', 'start_time', 'current_hub', 'routes',
+                 'route_start_miles', 'idle_time', 'route_idle_time')
 
-    total_miles: float = 0
+    total_miles: float
     pkg_lst: list[PkgObject]
     truck: int
-    deliveries_completed = 0
-
-    def __init__(self):
-        self.truck = self.__get_truck_number()
+    deliveries_completed: int
+    start_time: float
+    current_hub: int  # Where the truck is while it is out on a route
+    idle_time: float  # Minutes spent waiting at the hub for packages to become available
+
+    def __init__(self, truck_number: Optional[int] = None, start_time: float = DAY_START):
+        # Trucks built by a routing session are numbered by the session so concurrent sessions do not share a count
+        self.truck = self.__get_truck_number() if truck_number is None else truck_number
+        self.total_miles = 0
+        self.deliveries_completed = 0
+        self.start_time = start_time
+        self.current_hub = HUB_ID
         self.pkg_lst = []
+        self.routes: list[list[PkgObject]] = []  # Packages of every route run, in delivery order
+        self.route_start_miles: list[float] = []  # Miles on the truck when each route departed
+        self.idle_time = 0.0
+        self.route_idle_time: list[float] = []  # Minutes the truck had waited when each route departed
 
     def load_truck(self, pkg: PkgObject):
         """
@@ -64,20 +77,28 @@ class Truck:
         :return No return value:
         """
         if self.truck_full():
-            logger.exception(f'Package ID: {pkg.pkg_id} cannot be loaded onto {self.__get_truck_number()}.')
+            logger.exception('Package ID: %s cannot be loaded onto truck %s.', pkg.pkg_id, self.truck)
             raise Exception
 
         pkg.enroute_status(self)
         self.pkg_lst.append(pkg)
 
     def max_truck_capacity(self) -> int:
-        return 16 - len(self.pkg_lst)
+        return TRUCK_CAPACITY - len(self.pkg_lst)
 
     def get_time_elapsed(self) -> float:
-        return self.elapsed_time(self.total_miles)
+        return self.elapsed_time(self.total_miles, self.start_time) + self.idle_time
+
+    def wait_until(self, time: float) -> None:
+        """
+        Keeps the truck at the hub until the provided time, a time that has already passed changes nothing
+        :param time:
+        :return No return value:
+        """
+        self.idle_time += max(0.0, time - self.get_time_elapsed())
 
     def truck_full(self):
-        return len(self.pkg_lst) == 16
+        return len(self.pkg_lst) == TRUCK_CAPACITY
 
     def truck_empty(self) -> bool:
         return len(self.pkg_lst) == 0
@@ -85,29 +106,88 @@ class Truck:
     def truck_location(self) -> str:
         return 'HUB' if self.truck_empty() else self.pkg_lst[-1].address
 
+    def truck_location_id(self) -> int:
+        return HUB_ID if self.truck_empty() else self.pkg_lst[-1].hub_id
+
+    def depart(self):
+        """
+        Starts a new route from the hub and records it
+        :return No return value:
+        """
+        self.deliveries_completed += 1
+        self.current_hub = HUB_ID
+        self.routes.append(list(self.pkg_lst))
+        self.route_start_miles.append(self.total_miles)
+        self.route_idle_time.append(self.idle_time)
+
+    def route_departure(self, route: int) -> float:
+        """
+        Returns the time the provided route left the hub
+        :param route:
+        :return Departure time as minutes:
+        """
+        return self.elapsed_time(self.route_start_miles[route], self.start_time) + self.route_idle_time[route]
+
+    def drive_to(self, hub_id: int, dh_graph: DHGraph[Union[DeliveryHub, str]]):
+        """
+        Drives the truck from its current hub to the provided hub
+        :param hub_id:
+        :param dh_graph:
+        :return No return value:
+        """
+        self.total_miles += dh_graph.get_distance_by_id(self.current_hub, hub_id)
+        self.current_hub = hub_id
+
+    def deliver_package(self, pkg: PkgObject):
+        """
+        Marks a package as delivered at the truck's current time and records the delivery
+        :param pkg:
+        :return No return value:
+        """
+        pkg.set_delivered_status(self)
+        # Checked first so nothing is built for the record on every delivery while DEBUG is off
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('Truck %s delivered package %s at %s', self.truck, pkg.pkg_id, pkg.address,
+                         extra={'fields': {'truck': self.truck, 'pkg_id': pkg.pkg_id, 'address': pkg.address,
+                                           'delivered_at': convert_minutes(pkg.delivered_at_time),
+                                           'total_miles': round(self.total_miles, 1)}})
+
+    def return_to_hub(self, dh_graph: DHGraph[Union[DeliveryHub, str]]):
+        """
+        Drives the truck back to the hub once every loaded package has been delivered
+        :param dh_graph:
+        :return No return value:
+        """
+        self.pkg_lst.clear()
+        self.drive_to(HUB_ID, dh_graph)
+        debug('Truck number', self.truck, 'returned to base with', round(self.total_miles, 1), 'total miles traveled.')
+
     def deliver_packages(self, dh_graph: DHGraph[Union[DeliveryHub, str]]):
         """
         Simulates a truck delivering packages and stores the information for use later
         :param dh_graph:
         :return:
         """
-        self.deliveries_completed += 1
-        prev: str = ''
-        curr: str = 'HUB'
+        self.depart()
         for pkg in self.pkg_lst:
-            prev = curr
-            curr = pkg.address
-            self.total_miles += dh_graph.get_distance(prev, curr)
-            pkg.set_delivered_status(self)
-            truck_info = [f'truck #: {self.truck}']
-            truck_info += f'delivered: {pkg.pkg_id}'
-            truck_info += f'at {convert_minutes(pkg.delivered_at_time)} o\'clock local time.'
-            truck_info += f'The package was delivered at {pkg.address}'
-            truck_info += f'after having traveled a total of {round(self.total_miles, 1)} miles.'
-            logger.debug(truck_info)
-
-        self.pkg_lst.clear()
-        self.total_miles += dh_graph.get_distance(curr, 'HUB')
-        debug(f'Truck number {self.truck_number} returned to base with {round(self.total_miles, 1)}'
-                 f'total miles traveled.')
-
+            self.drive_to(pkg.hub_id, dh_graph)
+            self.deliver_package(pkg)
+        self.return_to_hub(dh_graph)
+
+
+def wait_at_hub(trucks: Iterable[Truck], pkgs: Iterable[PkgObject]) -> bool:
+    """
+    T(n) = O(n log n)
+    Keeps every empty truck at the hub until the next package becomes available after the truck's time. Until
+    then the truck has nothing it could carry that it cannot carry now
+    :param trucks:
+    :param pkgs: Packages which have not been delivered
+    :return True when a truck waited, False when no package becomes available later:
+    """
+    available = sorted(pkg.get_available_time() for pkg in pkgs if pkg.check_at_hub_status())
+    waited = False
+    for truck in trucks:
+        if truck.truck_empty() and (s := bisect_right(available, truck.get_time_elapsed())) < len(available):
+            truck.wait_until(available[s])
+            waited = True
+    return waited
@@ -0,0 +1,70 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Iterator, Optional
+
+from data_services.xlsx_reader import iter_rows
+
+PKG_COLUMNS = 8  # Package ID, address, city, state, zip, deadline, weight and special notes
+DISTANCE_PRECISION = 1  # The distance table is kept in tenths of a mile, as the workbook displays it
+
+
+def __cell(value: Optional[str]) -> str:
+    return '' if value is None else value.strip()
+
+
+def __distance(value: Optional[str]) -> str:
+    return str(round(float(__cell(value)), DISTANCE_PRECISION))
+
+
+def __deadline(value: str) -> str:
+    """
+    Deadlines are stored by Excel as a fraction of a day, they are converted back to the '10:30 am' form
+    used by the package file
+    :param value:
+    :return Deadline string:
+    """
+    try:
+        minutes = round(float(value) * 24 * 60)
+    except ValueError:
+        return value
+    hrs, mins = divmod(minutes, 60)
+    return f'{hrs % 12 or 12}:{mins:02} {"am" if hrs < 12 else "pm"}'
+
+
+def pkg_rows_from_xlsx(xlsx_file: Path) -> Iterator[list[str]]:
+    """
+    T(n) = O(n)
+    S(n) = O(1) per row
+    Streams the package sheet in the same row layout as the package csv file, skipping the header row
+    :param xlsx_file:
+    :return Generator of package rows:
+    """
+    rows = iter_rows(xlsx_file)
+    next(rows, None)
+    for row in rows:
+        if len(row) == 0 or row[0] is None:
+            continue
+        row = [__cell(value) for value in row[:PKG_COLUMNS]]
+        row.extend([''] * (PKG_COLUMNS - len(row)))
+        row[0] = str(int(float(row[0])))
+        row[5] = __deadline(row[5])
+        row[6] = str(int(float(row[6])))
+        yield row
+
+
+def distance_rows_from_xlsx(xlsx_file: Path) -> Iterator[list[str]]:
+    """
+    T(n) = O(n**2)
+    S(n) = O(n) per row
+    Streams the distance sheet in the same row layout as the distance csv file. Each row holds the hub name,
+    its address and the lower triangle of the distance table up to and including the hub itself. Distances are
+    rounded to the precision shown in the workbook, some cells store more digits than they display. Blank rows
+    are skipped before the hubs are counted, so a hub's row is read up to its own column
+    :param xlsx_file:
+    :return Generator of distance rows:
+    """
+    rows = iter_rows(xlsx_file)
+    next(rows, None)
+    hub_rows = (row for row in rows if len(row) >= 2 and row[1] is not None)
+    for (h, row) in enumerate(hub_rows):
+        yield [row[0] or '', row[1], *(__distance(value) for value in row[2:h + 3])]
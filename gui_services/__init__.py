@@ -0,0 +1,2 @@
+from gui_services.pkg_table_model import *
+from gui_services.routing_worker import *
@@ -0,0 +1,153 @@
+from __future__ import annotations
+from typing import Callable, Iterable, Optional
+
+from delivery_services.pkg_handler import EOD, PkgObject
+from delivery_services.timeline import StatusTimeline
+from utilities import convert_minutes
+
+COLUMNS = ('Package ID', 'Address', 'City', 'Deadline', 'Truck', 'Status', 'Delivered')
+STATUS_NAMES = {PkgObject.StatusCode.AT_HUB: 'At hub',
+                PkgObject.StatusCode.ENROUTE: 'En route',
+                PkgObject.StatusCode.DELIVERED: 'Delivered'}
+STATUS_RANK = {status: rank for (rank, status) in enumerate(STATUS_NAMES)}
+
+
+class PkgTableModel:
+    """
+    Sorted and filtered view of the package table for a paged table widget. Sorting and filtering work on a list
+    of row positions and only the rows of the requested page are formatted, so the widget's work depends on the
+    rows it shows rather than on the number of packages. Statuses are taken at the model's time.
+    """
+
+    def __init__(self, pkgs: Iterable[tuple[int, PkgObject]], time: float = EOD,
+                 timeline: Optional[StatusTimeline] = None):
+        pkgs = sorted(pkgs, key=lambda item: item[0])
+        self.pkgs: list[PkgObject] = [pkg for (_, pkg) in pkgs]
+        self.timeline = StatusTimeline(pkgs) if timeline is None else timeline
+        self.time = time
+        self.sort_column = 0
+        self.descending = False
+        self.status_filter: Optional[PkgObject.StatusCode] = None
+        self.truck_filter: Optional[int] = None
+        self.deadline_filter: Optional[int] = None  # Packages due at or before this time
+        self.rows: list[int] = []  # Positions into pkgs of the rows in view order
+        self.refresh()
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def status(self, pkg: PkgObject) -> PkgObject.StatusCode:
+        """
+        Returns the package's status at the model's time
+        :param pkg:
+        :return Status code:
+        """
+        if (pkg.delivered_at_time or float('inf')) <= self.time:
+            return PkgObject.StatusCode.DELIVERED
+        if (pkg.get_loaded_time() or float('inf')) <= self.time:
+            return PkgObject.StatusCode.ENROUTE
+        return PkgObject.StatusCode.AT_HUB
+
+    def truck(self, pkg: PkgObject) -> Optional[int]:
+        """
+        Returns the truck carrying or having delivered the package at the model's time
+        :param pkg:
+        :return Truck number or None while the package is at the hub:
+        """
+        if self.status(pkg) == PkgObject.StatusCode.AT_HUB:
+            return None
+        return pkg.get_delivered_by_truck()
+
+    def __sort_key(self, column: int) -> Callable[[int], object]:
+        pkgs = self.pkgs
+        never = float('inf')
+        keys: tuple[Callable[[PkgObject], object], ...] = (
+            lambda pkg: pkg.pkg_id,
+            lambda pkg: pkg.address,
+            lambda pkg: pkg.city,
+            lambda pkg: pkg.delivery_promise,
+            lambda pkg: self.truck(pkg) or never,
+            lambda pkg: STATUS_RANK[self.status(pkg)],
+            lambda pkg: pkg.delivered_at_time if pkg.delivered_at_time is not None else never)
+        key = keys[column]
+        return lambda position: key(pkgs[position])
+
+    def refresh(self) -> None:
+        """
+        T(n) = O(n log(n))
+        Rebuilds the rows from the current filters and sort order. Ties keep package ID order
+        :return No return value:
+        """
+        rows = []
+        for (position, pkg) in enumerate(self.pkgs):
+            if self.truck_filter is not None and self.truck(pkg) != self.truck_filter:
+                continue
+            if self.deadline_filter is not None and pkg.delivery_promise > self.deadline_filter:
+                continue
+            if self.status_filter is not None and self.status(pkg) != self.status_filter:
+                continue
+            rows.append(position)
+        if self.sort_column != 0:
+            rows.sort(key=self.__sort_key(self.sort_column))
+        if self.descending:
+            rows.reverse()
+        self.rows = rows
+
+    def sort_by(self, column: int, descending: Optional[bool] = None) -> None:
+        """
+        Sorts the rows by a column, sorting by the current column again reverses the order
+        :param column: Index into COLUMNS
+        :param descending: Order to use instead of toggling
+        :return No return value:
+        """
+        if descending is None:
+            descending = not self.descending if column == self.sort_column else False
+        self.sort_column, self.descending = column, descending
+        self.refresh()
+
+    def set_filters(self, status: Optional[PkgObject.StatusCode] = None, truck: Optional[int] = None,
+                    deadline: Optional[int] = None) -> None:
+        """
+        Replaces the filters, None shows every package for that filter
+        :param status:
+        :param truck:
+        :param deadline: Latest deadline shown, in minutes
+        :return No return value:
+        """
+        self.status_filter, self.truck_filter, self.deadline_filter = status, truck, deadline
+        self.refresh()
+
+    def set_time(self, time: float) -> None:
+        """
+        Moves the model to another time, rows are only rebuilt when they depend on the statuses or trucks
+        :param time:
+        :return No return value:
+        """
+        self.time = time
+        if (self.status_filter is not None or self.truck_filter is not None
+                or self.sort_column in (COLUMNS.index('Truck'), COLUMNS.index('Status'))):
+            self.refresh()
+
+    def status_counts(self) -> dict[PkgObject.StatusCode, int]:
+        return self.timeline.status_counts(self.time)
+
+    def pkg_at(self, row: int) -> PkgObject:
+        return self.pkgs[self.rows[row]]
+
+    def page(self, start: int, count: int) -> list[tuple[str, ...]]:
+        """
+        T(n) = O(count)
+        Formats the cells of the rows from start, the page is cut short at the last row
+        :param start:
+        :param count:
+        :return List of rows of cell strings:
+        """
+        page = []
+        for position in self.rows[max(start, 0):max(start, 0) + count]:
+            pkg = self.pkgs[position]
+            truck = self.truck(pkg)
+            status = self.status(pkg)
+            delivered = '' if status != PkgObject.StatusCode.DELIVERED else convert_minutes(pkg.delivered_at_time)
+            page.append((str(pkg.pkg_id), pkg.address, pkg.city, pkg.promise_format(),
+                         '' if truck is None else str(truck), STATUS_NAMES[status], delivered))
+        return page
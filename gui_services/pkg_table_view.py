@@ -0,0 +1,134 @@
+from __future__ import annotations
+import re
+import tkinter as tk
+from typing import Optional
+
+import customtkinter as ctk
+
+from delivery_services.pkg_handler import PkgObject
+from gui_services.pkg_table_model import COLUMNS, STATUS_NAMES, PkgTableModel
+from utilities import deadline_to_minutes
+
+ROW_HEIGHT = 24
+COLUMN_WIDTHS = (90, 330, 150, 90, 60, 100, 90)
+ALL = 'All'
+
+
+class PkgTableView(ctk.CTkFrame):
+    """
+    Paged table of packages. Only the rows that fit in the visible area are drawn, the rest are read from the
+    model as the table is scrolled. Clicking a column header sorts by it and the filter bar limits the rows by
+    status, truck and deadline.
+    """
+
+    def __init__(self, master, model: PkgTableModel, **kwargs):
+        super().__init__(master, **kwargs)
+        self.model = model
+        self.first_row = 0
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(2, weight=1)
+
+        # Filter bar
+        filter_bar = ctk.CTkFrame(self, fg_color='transparent')
+        filter_bar.grid(row=0, column=0, columnspan=2, sticky='ew', pady=(0, 5))
+        self.status_menu = ctk.CTkOptionMenu(filter_bar, values=[ALL, *STATUS_NAMES.values()],
+                                             command=lambda _: self.apply_filters())
+        self.status_menu.grid(row=0, column=0, padx=(0, 10))
+        self.truck_entry = ctk.CTkEntry(filter_bar, placeholder_text='Truck', width=70)
+        self.truck_entry.grid(row=0, column=1, padx=(0, 10))
+        self.deadline_entry = ctk.CTkEntry(filter_bar, placeholder_text='Due by HH:MM', width=110)
+        self.deadline_entry.grid(row=0, column=2, padx=(0, 10))
+        ctk.CTkButton(filter_bar, text='Filter', width=70, command=self.apply_filters).grid(row=0, column=3)
+        self.count_label = ctk.CTkLabel(filter_bar, text='')
+        self.count_label.grid(row=0, column=4, padx=(10, 0))
+        for entry in (self.truck_entry, self.deadline_entry):
+            entry.bind('<Return>', lambda _: self.apply_filters())
+
+        # Column headers sort the model
+        header = ctk.CTkFrame(self, fg_color='transparent')
+        header.grid(row=1, column=0, sticky='ew')
+        self.headers = []
+        for (column, (name, width)) in enumerate(zip(COLUMNS, COLUMN_WIDTHS)):
+            button = ctk.CTkButton(header, text=name, width=width, corner_radius=0,
+                                   command=lambda c=column: self.sort_by(c))
+            button.grid(row=0, column=column)
+            self.headers.append(button)
+
+        # Rows are drawn on a canvas which is cleared and redrawn for the visible page only
+        self.canvas = tk.Canvas(self, background='#DDDDDD', highlightthickness=0)
+        self.canvas.grid(row=2, column=0, sticky='nsew')
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.scroll)
+        self.scrollbar.grid(row=2, column=1, sticky='ns')
+        self.canvas.bind('<Configure>', lambda _: self.redraw())
+        self.canvas.bind('<MouseWheel>', lambda event: self.scroll('scroll', -int(event.delta / 120), 'units'))
+        self.canvas.bind('<Button-4>', lambda _: self.scroll('scroll', -1, 'units'))
+        self.canvas.bind('<Button-5>', lambda _: self.scroll('scroll', 1, 'units'))
+
+    def visible_rows(self) -> int:
+        return max(1, self.canvas.winfo_height() // ROW_HEIGHT)
+
+    def redraw(self) -> None:
+        """
+        T(n) = O(r) for the r visible rows
+        Draws the visible page of the model and moves the scrollbar to match
+        :return No return value:
+        """
+        visible = self.visible_rows()
+        row_count = len(self.model)
+        self.first_row = max(0, min(self.first_row, row_count - visible))
+        self.canvas.delete('all')
+        for (i, row) in enumerate(self.model.page(self.first_row, visible)):
+            y = i * ROW_HEIGHT
+            if i % 2:
+                self.canvas.create_rectangle(0, y, sum(COLUMN_WIDTHS), y + ROW_HEIGHT, fill='#CCCCCC', width=0)
+            x = 0
+            for (cell, width) in zip(row, COLUMN_WIDTHS):
+                self.canvas.create_text(x + 5, y + ROW_HEIGHT / 2, text=cell, anchor='w', width=width - 10,
+                                        font=('Arial', 12), fill='black')
+                x += width
+        if row_count == 0:
+            self.scrollbar.set(0, 1)
+        else:
+            self.scrollbar.set(self.first_row / row_count, min(1, (self.first_row + visible) / row_count))
+        counts = self.model.status_counts()
+        self.count_label.configure(text=f'{row_count} shown; ' + ', '.join(
+            f'{STATUS_NAMES[status]}: {count}' for (status, count) in counts.items()))
+
+    def scroll(self, action: str, amount, unit: Optional[str] = None) -> None:
+        """
+        Scrollbar and mouse wheel callback using the tkinter yview protocol
+        :param action: 'moveto' or 'scroll'
+        :param amount: Fraction for 'moveto', step count for 'scroll'
+        :param unit: 'units' or 'pages' for 'scroll'
+        :return No return value:
+        """
+        if action == 'moveto':
+            self.first_row = int(float(amount) * len(self.model))
+        else:
+            step = self.visible_rows() if unit == 'pages' else 1
+            self.first_row += int(amount) * step
+        self.redraw()
+
+    def sort_by(self, column: int) -> None:
+        self.model.sort_by(column)
+        self.first_row = 0
+        self.redraw()
+
+    def apply_filters(self) -> None:
+        """
+        Reads the filter bar and refilters the model, entries that can't be read are ignored
+        :return No return value:
+        """
+        status_names = {name: status for (status, name) in STATUS_NAMES.items()}
+        status: Optional[PkgObject.StatusCode] = status_names.get(self.status_menu.get())
+        truck_txt = self.truck_entry.get().strip()
+        truck = int(truck_txt) if truck_txt.isdigit() else None
+        deadline_txt = self.deadline_entry.get().strip()
+        deadline = deadline_to_minutes(deadline_txt) if re.fullmatch(r'\d?\d:\d\d', deadline_txt) else None
+        self.model.set_filters(status, truck, deadline)
+        self.first_row = 0
+        self.redraw()
+
+    def set_time(self, time: float) -> None:
+        self.model.set_time(time)
+        self.redraw()
@@ -0,0 +1,98 @@
+from __future__ import annotations
+import queue
+import threading
+from typing import Any, Callable
+
+from delivery_services.routing import RoutingSession
+from log_services import get_logger
+from utilities import SOURCE_DIR
+
+logger = get_logger(__name__, SOURCE_DIR / 'gui_services' / 'gui_logs' / 'routing_worker.log')
+
+POLL_INTERVAL = 100  # Milliseconds between checks of the worker's events from the GUI main loop
+
+
+class RoutingWorker:
+    """
+    Runs routing sessions on a background thread so the GUI is not blocked while packages are read and routed.
+    The worker never touches a widget: progress, the finished session and errors are put on a queue and handed
+    to the callbacks by poll, which the GUI calls from its own main loop. Starting a new run while one is still
+    going supersedes it, and events from a superseded run are dropped.
+    """
+
+    def __init__(self, on_progress: Callable[[str, int], None], on_done: Callable[[RoutingSession], None],
+                 on_error: Callable[[BaseException], None]):
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.on_error = on_error
+        self.events: queue.Queue[tuple[str, int, Any]] = queue.Queue()
+        self.generation = 0  # Number of the latest run, only its events are handed on
+        self.running = 0  # Runs whose threads have not finished
+        self.polling = False
+
+    def start(self, **session_args) -> int:
+        """
+        Starts a routing session on a new daemon thread. The session and the shared graph are built on that
+        thread, so the first run also builds the graph off the main loop
+        :param session_args: Arguments for RoutingSession
+        :return Number of the run:
+        """
+        self.generation += 1
+        self.running += 1
+        threading.Thread(target=self.__run, args=(self.generation, session_args), daemon=True,
+                         name=f'routing-{self.generation}').start()
+        return self.generation
+
+    def __run(self, generation: int, session_args: dict) -> None:
+        try:
+            session = RoutingSession(progress=lambda stage, count: self.events.put(('progress', generation,
+                                                                                    (stage, count))),
+                                     **session_args)
+            session.run()
+            self.events.put(('done', generation, session))
+        except Exception as err:
+            logger.exception('Routing run %d failed', generation)
+            self.events.put(('error', generation, err))
+
+    def busy(self) -> bool:
+        return self.running != 0 or not self.events.empty()
+
+    def poll(self) -> None:
+        """
+        Hands every queued event of the latest run to its callback. Only call this from the GUI thread
+        :return No return value:
+        """
+        while True:
+            try:
+                (kind, generation, payload) = self.events.get_nowait()
+            except queue.Empty:
+                return
+            if kind != 'progress':
+                self.running -= 1
+            if generation != self.generation:
+                continue
+            if kind == 'progress':
+                self.on_progress(*payload)
+            elif kind == 'done':
+                self.on_done(payload)
+            else:
+                self.on_error(payload)
+
+    def attach(self, widget, interval: int = POLL_INTERVAL) -> None:
+        """
+        Polls the worker from a Tk widget's main loop with after() until every run has finished. Attaching
+        again while the worker is already being polled does nothing
+        :param widget: Any Tk widget, usually the application window
+        :param interval: Milliseconds between polls
+        :return No return value:
+        """
+        if not self.polling:
+            self.polling = True
+            self.__tick(widget, interval)
+
+    def __tick(self, widget, interval: int) -> None:
+        self.poll()
+        if self.busy():
+            widget.after(interval, self.__tick, widget, interval)
+        else:
+            self.polling = False
@@ -0,0 +1 @@
+from log_services.queue_logging import *
@@ -0,0 +1,275 @@
+from __future__ import annotations
+import functools
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator, Optional
+
+from data_services.graph import DHGraph
+from data_services.hash_table import HashTable, OpenAddressHashTable, set_probe_hook
+
+
+class MetricsCollector:
+    """
+    Stage times and counters of one run. Sessions running at the same time each collect into their own
+    collector, and updates are made under a lock so threads sharing a collector do not lose counts
+    """
+
+    def __init__(self):
+        self.stages: dict[str, dict[str, Any]] = {}
+        self.counters: dict[str, int] = {}
+        self.lock = threading.Lock()
+        self.__state = threading.local()  # Stack of the stages open on each thread
+
+    def stack(self) -> list[str]:
+        if not hasattr(self.__state, 'stack'):
+            self.__state.stack = []
+        return self.__state.stack
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """
+        Adds to a counter, for the whole run and for the innermost stage open on the calling thread
+        :param name:
+        :param amount:
+        :return No return value:
+        """
+        stack = self.stack()
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+            if stack and (times := self.stages.get(stack[-1])) is not None:
+                times['counters'][name] = times['counters'].get(name, 0) + amount
+
+    def reset(self) -> None:
+        with self.lock:
+            self.stages.clear()
+            self.counters.clear()
+
+    def snapshot(self) -> dict[str, Any]:
+        """
+        Returns a copy of the metrics collected so far
+        :return Dictionary of stages, counters and the peak traced memory in bytes, None when memory isn't traced:
+        """
+        with self.lock:
+            return {'stages': {name: {**times, 'counters': dict(times['counters'])}
+                               for (name, times) in self.stages.items()},
+                    'counters': dict(self.counters),
+                    'peak_memory': tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None}
+
+
+__NO_STAGE = nullcontext()  # Returned by stage() while instrumentation is off
+__DEFAULT_COLLECTOR = MetricsCollector()  # Collects everything recorded outside of collect_metrics
+__collector: ContextVar[Optional[MetricsCollector]] = ContextVar('metrics_collector', default=None)
+__enabled = False
+__started_tracemalloc = False
+__originals: list[tuple[Any, str, Callable]] = []  # Methods replaced by wrappers while enabled
+__stage_targets: list[tuple[Any, str, str]] = []  # Functions timed as stages while enabled, see instrument_stages
+
+
+def current_collector() -> MetricsCollector:
+    return __collector.get() or __DEFAULT_COLLECTOR
+
+
+@contextmanager
+def collect_metrics() -> Iterator[MetricsCollector]:
+    """
+    Records the metrics of everything run in the block, on the calling thread, into a new collector. The peak
+    traced memory is process wide, so it is reset when the block starts
+    :return Context manager yielding the MetricsCollector:
+    """
+    collector = MetricsCollector()
+    token = __collector.set(collector)
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+    try:
+        yield collector
+    finally:
+        __collector.reset(token)
+
+
+def count(name: str, amount: int = 1) -> None:
+    """
+    Adds to a counter of the current run, see MetricsCollector.count
+    :param name:
+    :param amount:
+    :return No return value:
+    """
+    current_collector().count(name, amount)
+
+
+class StageTimer:
+    """
+    Times a stage in wall clock and CPU time, and its change in traced memory when tracemalloc is running.
+    Repeated stages add up and stages can be nested, a nested stage's time is included in the outer stage
+    """
+
+    def __init__(self, name: str, collector: MetricsCollector):
+        self.name = name
+        self.collector = collector
+        self.stack = collector.stack()
+        self.wall = self.cpu = 0.0
+        self.memory = 0
+
+    def __enter__(self) -> StageTimer:
+        with self.collector.lock:
+            self.__times()
+        self.stack.append(self.name)
+        self.memory = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+        self.wall, self.cpu = time.perf_counter(), time.process_time()
+        return self
+
+    def __times(self) -> dict[str, Any]:
+        if (times := self.collector.stages.get(self.name)) is None:
+            times = {'calls': 0, 'wall': 0.0, 'cpu': 0.0, 'memory_delta': 0, 'counters': {}}
+            self.collector.stages[self.name] = times
+        return times
+
+    def __exit__(self, *exc_info) -> None:
+        wall, cpu = time.perf_counter() - self.wall, time.process_time() - self.cpu
+        memory = tracemalloc.get_traced_memory()[0] - self.memory if tracemalloc.is_tracing() else 0
+        self.stack.pop()
+        with self.collector.lock:
+            times = self.__times()
+            times['calls'] += 1
+            times['wall'] += wall
+            times['cpu'] += cpu
+            times['memory_delta'] += memory
+
+
+def stage(name: str):
+    """
+    T(n) = O(1)
+    Context manager timing a stage of the pipeline. While instrumentation is off a shared no-op context is
+    returned, so a stage costs one call and a flag check
+    :param name:
+    :return Context manager:
+    """
+    return StageTimer(name, current_collector()) if __enabled else __NO_STAGE
+
+
+def __timed(method: Callable, name: str) -> Callable:
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        with StageTimer(name, current_collector()):
+            return method(*args, **kwargs)
+    return wrapper
+
+
+def instrument_stages(owner: Any, stages: dict[str, str]) -> None:
+    """
+    Registers functions or methods to be timed as stages while instrumentation is enabled. They are only
+    wrapped while enabled, so a registered function costs nothing otherwise
+    :param owner: Class or module the functions are looked up on
+    :param stages: Attribute names, mangled for private methods, to stage names
+    :return No return value:
+    """
+    for (attr, name) in stages.items():
+        __stage_targets.append((owner, attr, name))
+        if __enabled:
+            __install(owner, attr, __timed(vars(owner)[attr], name))
+
+
+def __counting(method: Callable, counter: str) -> Callable:
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        count(counter)
+        return method(*args, **kwargs)
+    return wrapper
+
+
+def __counting_resize(method: Callable) -> Callable:
+    @functools.wraps(method)
+    def wrapper(table, *args, **kwargs):
+        # The chaining table calls resize_table again for every key it moves, only the outer call resizes
+        if getattr(table, 'can_resize', True):
+            count('hash_resizes')
+        return method(table, *args, **kwargs)
+    return wrapper
+
+
+def __count_probes(probes: int) -> None:
+    count('hash_probes', probes)
+
+
+def __install(owner: Any, name: str, replacement: Callable) -> None:
+    __originals.append((owner, name, vars(owner)[name]))
+    setattr(owner, name, replacement)
+
+
+def enable_instrumentation(trace_memory: bool = False) -> None:
+    """
+    Wraps the registered stages with timers, and the graph's distance lookups and the tables' lookups, probes
+    and resizes with counters. The wrappers are only installed while enabled, so the methods run unchanged otherwise
+    :param trace_memory: Also samples memory with tracemalloc, which slows allocation heavy code noticeably
+    :return No return value:
+    """
+    global __enabled, __started_tracemalloc
+    if __enabled:
+        return
+    __enabled = True
+    for (owner, attr, name) in __stage_targets:
+        __install(owner, attr, __timed(vars(owner)[attr], name))
+    for name in ('get_distance', 'get_distance_by_id'):
+        __install(DHGraph, name, __counting(DHGraph.__dict__[name], 'distance_lookups'))
+    __install(DHGraph, 'distance_row', __counting(DHGraph.__dict__['distance_row'], 'distance_rows'))
+    for cls in (HashTable, OpenAddressHashTable):
+        __install(cls, 'fetch_bucket', __counting(cls.__dict__['fetch_bucket'], 'hash_lookups'))
+        __install(cls, 'resize_table', __counting_resize(cls.__dict__['resize_table']))
+    set_probe_hook(__count_probes)
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        __started_tracemalloc = True
+
+
+def disable_instrumentation() -> None:
+    """
+    Restores the original methods and stops tracemalloc if it was started by enable_instrumentation. The
+    metrics recorded so far are kept
+    :return No return value:
+    """
+    global __enabled, __started_tracemalloc
+    while __originals:
+        (owner, name, method) = __originals.pop()
+        setattr(owner, name, method)
+    set_probe_hook(None)
+    if __started_tracemalloc:
+        tracemalloc.stop()
+        __started_tracemalloc = False
+    __enabled = False
+
+
+def instrumentation_enabled() -> bool:
+    return __enabled
+
+
+def reset_metrics() -> None:
+    current_collector().reset()
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+
+
+def metrics() -> dict[str, Any]:
+    """
+    Returns a copy of the metrics recorded by the current collector since instrumentation was enabled or last reset
+    :return Dictionary of stages, counters and the peak traced memory in bytes, None when memory isn't traced:
+    """
+    return current_collector().snapshot()
+
+
+def metrics_report(run_metrics: Optional[dict[str, Any]] = None) -> str:
+    """
+    Formats metrics as a table with a line per stage followed by the run's counters
+    :param run_metrics: Metrics to format, defaults to the current metrics
+    :return Report string:
+    """
+    run_metrics = metrics() if run_metrics is None else run_metrics
+    lines = [f'{"stage":<20}{"calls":>8}{"wall ms":>12}{"cpu ms":>12}{"memory KiB":>12}  counters']
+    for (name, times) in run_metrics['stages'].items():
+        counters = ', '.join(f'{counter}={value}' for (counter, value) in sorted(times['counters'].items()))
+        lines.append(f'{name:<20}{times["calls"]:>8}{times["wall"] * 1000:>12.2f}{times["cpu"] * 1000:>12.2f}'
+                     f'{times["memory_delta"] / 1024:>12.1f}  {counters}')
+    lines.append(', '.join(f'{counter}={value}' for (counter, value) in sorted(run_metrics['counters'].items())))
+    if run_metrics['peak_memory'] is not None:
+        lines.append(f'peak memory: {run_metrics["peak_memory"] / 1024:.1f} KiB')
+    return '\n'.join(lines)
@@ -0,0 +1,173 @@
+from __future__ import annotations
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from pathlib import Path
+from typing import Optional, Union
+
+DEFAULT_LEVEL = logging.INFO  # Per delivery records are DEBUG, so they cost a level check unless enabled
+LEVELS_ENV = 'WGUPS_LOG_LEVELS'  # For example 'truck=DEBUG,routing=WARNING'
+
+__log_queue: queue.SimpleQueue = queue.SimpleQueue()
+__listener: Optional[QueueListener] = None
+__lock = threading.Lock()
+__file_handlers: dict[str, logging.Handler] = {}  # Logger names to the file handler the listener writes with
+__subsystems: dict[str, str] = {}  # Short subsystem names, the last part of the module name, to logger names
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """
+    Formats a record as one JSON object per line. Fields passed with extra={'fields': {...}} are added to the
+    object, so log lines can be filtered by truck, package and so on without parsing the message
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+                 'level': record.levelname,
+                 'logger': record.name,
+                 'message': record.getMessage()}
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    Queues the record as it was logged. The standard QueueHandler formats the message before queueing it, which
+    puts the formatting back on the logging thread; here the message and arguments are only formatted by the
+    listener thread, so arguments must not be changed after they are logged
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class SubsystemHandler(logging.Handler):
+    """
+    The listener's only handler, it hands each record to the file handler of the subsystem that logged it
+    """
+
+    def __init__(self, file_handlers: dict[str, logging.Handler]):
+        super().__init__()
+        self.file_handlers = file_handlers
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        if (handler := self.file_handlers.get(record.name)) is not None:
+            handler.handle(record)
+        return True
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.handle(record)
+
+
+def __start_listener() -> None:
+    global __listener
+    if __listener is None:
+        __listener = QueueListener(__log_queue, SubsystemHandler(__file_handlers))
+        __listener.start()
+
+
+def get_logger(name: str, log_file: Path) -> logging.Logger:
+    """
+    Creates a subsystem logger whose records are written as JSON lines to log_file by a background listener.
+    Logging only puts the record on a queue, so the caller never waits on formatting or file I/O. The file is
+    opened on the first record, and the level comes from WGUPS_LOG_LEVELS when the subsystem is named there
+    :param name: Logger name, usually the module's __name__
+    :param log_file:
+    :return Logger:
+    """
+    logger = logging.getLogger(name)
+    with __lock:
+        if name not in __file_handlers:
+            file_handler = logging.FileHandler(log_file, delay=True)
+            file_handler.setFormatter(JsonLinesFormatter())
+            __file_handlers[name] = file_handler
+            __subsystems[name.rsplit('.', 1)[-1]] = name
+            logger.addHandler(LazyQueueHandler(__log_queue))
+            logger.propagate = False
+            logger.setLevel(__env_levels().get(name.rsplit('.', 1)[-1], DEFAULT_LEVEL))
+        __start_listener()
+    return logger
+
+
+def __env_levels() -> dict[str, str]:
+    levels = {}
+    for setting in os.environ.get(LEVELS_ENV, '').split(','):
+        if '=' in setting:
+            subsystem, level = setting.split('=', 1)
+            levels[subsystem.strip()] = level.strip().upper()
+    return levels
+
+
+def __logger_name(subsystem: str) -> str:
+    if subsystem in __file_handlers:
+        return subsystem
+    if subsystem in __subsystems:
+        return __subsystems[subsystem]
+    raise ValueError(f'Unknown log subsystem {subsystem}')
+
+
+def set_log_level(subsystem: str, level: Union[int, str]) -> None:
+    """
+    Changes a subsystem's level while the program runs. logging.CRITICAL + 1 turns the subsystem off
+    :param subsystem: Short name such as 'truck' or the full logger name
+    :param level: Level number or name
+    :return No return value:
+    """
+    logging.getLogger(__logger_name(subsystem)).setLevel(level.upper() if isinstance(level, str) else level)
+
+
+def configure_logging(levels: dict[str, Union[int, str]]) -> None:
+    """
+    Sets the level of several subsystems at once
+    :param levels: Subsystem names to levels
+    :return No return value:
+    """
+    for (subsystem, level) in levels.items():
+        set_log_level(subsystem, level)
+
+
+def log_levels() -> dict[str, str]:
+    """
+    :return Short subsystem names to their current level names:
+    """
+    return {subsystem: logging.getLevelName(logging.getLogger(name).level)
+            for (subsystem, name) in __subsystems.items()}
+
+
+def flush_logs() -> None:
+    """
+    Waits for the listener to write every queued record, then starts it again for later records
+    :return No return value:
+    """
+    global __listener
+    with __lock:
+        if __listener is not None:
+            __listener.stop()
+            __listener = None
+            for handler in __file_handlers.values():
+                handler.flush()
+            __start_listener()
+
+
+def shutdown_logging() -> None:
+    """
+    Writes every queued record and closes the log files, registered to run at exit
+    :return No return value:
+    """
+    global __listener
+    with __lock:
+        if __listener is not None:
+            __listener.stop()
+            __listener = None
+        for handler in __file_handlers.values():
+            handler.close()
+
+
+atexit.register(shutdown_logging)
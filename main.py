@@ -4,9 +4,15 @@
 #
 
 # Internal modules
-from delivery_services.routing import auto_router
+from data_services.hash_table import new_table
+from delivery_services.routing import RoutingSession
 from utilities import convert_minutes, deadline_to_minutes
 from delivery_services.pkg_handler import PkgObject
+from delivery_services.pkg_query import PkgQuery
+from delivery_services.timeline import StatusTimeline
+from gui_services.pkg_table_model import PkgTableModel
+from gui_services.pkg_table_view import PkgTableView
+from gui_services.routing_worker import RoutingWorker
 
 # External libraries/modules
 import pandas as pd
@@ -45,12 +51,19 @@ class App(ctk.CTk):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.pkgs, self.trucks = auto_router()  # Runs the routing algorithm on startup
+        # The plan is empty until the routing worker finishes, see routing_done_event
+        self.pkgs, self.trucks = new_table(), []
+        self.plan_ready = False
+        self.timeline = StatusTimeline(self.pkgs)  # Answers and caches the status of all packages at a time
+        self.pkg_table_model = PkgTableModel(self.pkgs, timeline=self.timeline)  # Sorted and filtered table rows
         self.__error = self.ErrorCode.NO_ERR  # Sets the error handling flag to the default
-        self.pkg_index = []  # A list of pkg IDs used in creating a visualization
+        self.pkg_query = PkgQuery(self.pkgs)  # Package ID lookups used by the search bar
+        self.refreshed_pkgs = self.pkgs  # Package table the ordered lists and ID index were last built from
         self.pkg_id_desc = []  # list of packages in descending order
         self.ordered_pkg_lst = []  # A list with reduced attributes used for a visualization
-        self.pkg_data_refresh()  # A method used to populate a list of packages and refresh that list if needed
+        # Runs the routing algorithm off the main loop so the window is shown straight away
+        self.routing_worker = RoutingWorker(self.routing_progress_event, self.routing_done_event,
+                                            self.routing_error_event)
         # Configuration options for the table display
         self.options = {'cellbackgr': '#DDDDDD',
                         'font': 'Arial',
@@ -81,6 +94,10 @@ class App(ctk.CTk):
         self.status_all_pkgs.grid(row=2, column=0, padx=20, pady=10)
         self.truck_mileage = ctk.CTkButton(self.left_sidebar, command=self.truck_info_request_event)
         self.truck_mileage.grid(row=3, column=0, padx=20, pady=10)
+        self.replan_button = ctk.CTkButton(self.left_sidebar, command=self.replan_event)
+        self.replan_button.grid(row=5, column=0, padx=20, pady=10)
+        self.routing_status_label = ctk.CTkLabel(self.left_sidebar, text='')
+        self.routing_status_label.grid(row=6, column=0, padx=20, pady=(0, 20))
 
         # Label for the user package search bars
         self.pkg_search_label = ctk.CTkLabel(self, text="Search for a Package",
@@ -106,7 +123,66 @@ class App(ctk.CTk):
         self.status_all_pkgs.configure(text='Status of All Packages')
         self.truck_mileage.configure(text="Truck Mileage")
         self.string_input_button.configure(text='Submit')
+        self.replan_button.configure(text='Re-plan Routes')
         self.welcome_msg()
+        self.replan_event()
+
+    def replan_event(self):
+        """
+        Starts routing on the background worker. The current plan, if there is one, stays on screen until
+        the new plan is ready
+        :return No return value:
+        """
+        self.routing_status_label.configure(text='Routing packages...')
+        self.routing_worker.start()
+        self.routing_worker.attach(self)
+
+    def routing_progress_event(self, stage: str, count: int):
+        """
+        Shows the progress reported by the routing worker, called from the main loop
+        :param stage:
+        :param count:
+        :return No return value:
+        """
+        if stage == 'import':
+            self.routing_status_label.configure(text=f'Read {count} packages')
+        else:
+            self.routing_status_label.configure(text=f'Routed {count} packages')
+
+    def routing_done_event(self, session: RoutingSession):
+        """
+        Replaces the displayed plan with the one the routing worker finished, called from the main loop
+        :param session:
+        :return No return value:
+        """
+        self.pkgs, self.trucks = session.pkgs, session.trucks
+        self.timeline = StatusTimeline(self.pkgs)
+        self.pkg_table_model = PkgTableModel(self.pkgs, timeline=self.timeline)
+        self.pkg_data_refresh()
+        self.plan_ready = True
+        self.routing_status_label.configure(text='Plan ready')
+
+    def routing_error_event(self, err: BaseException):
+        """
+        Tells the user that routing failed, the previous plan is kept
+        :param err:
+        :return No return value:
+        """
+        self.routing_status_label.configure(text='Routing failed')
+        CTkMessagebox(title='Routing Failed', message=f'The routes could not be planned.\n{err}', icon='cancel',
+                      option_1='Ok')
+
+    def plan_pending(self) -> bool:
+        """
+        Shows a loading message when no plan has finished yet
+        :return True if there is no plan to show:
+        """
+        if self.plan_ready:
+            return False
+        textbox = ctk.CTkTextbox(self, width=250, font=ctk.CTkFont(family='Arial', size=22, weight="bold"))
+        textbox.grid(row=0, rowspan=3, column=1, columnspan=3, padx=(20, 20), pady=(20, 20), sticky="nsew")
+        textbox.insert('0.0', 'The routes are still being planned, please try again in a moment.')
+        return True
 
     # Display a welcome message with pertinent project information
     def welcome_msg(self):
@@ -133,18 +209,16 @@ class App(ctk.CTk):
     def pkg_data_refresh(self):
         """
         On program startup this method will create an ordered list of package objects
-        sorted by package ID. It will also create an index of the package IDs
+        sorted by package ID. It will also bring the package ID index up to date
         It is a collable method used for refreshing package data in case any changes are made
         :return No return value:
         """
+        self.refreshed_pkgs = self.pkgs
         self.pkg_id_desc = [[pkg_id, pkg_obj] for (pkg_id, pkg_obj) in self.pkgs]
         self.pkg_id_desc.sort(key=lambda x: x[0])
-
-        for pkg in self.pkg_id_desc:
-            tmp_time = convert_minutes(pkg[1].delivery_promise)
-            self.ordered_pkg_lst.append([pkg[0], pkg[1].address, pkg[1].city, pkg[1].state,
-                                         pkg[1].postal_code, tmp_time])
-            self.pkg_index.append(pkg[0])
+        self.ordered_pkg_lst = [[pkg_id, pkg.address, pkg.city, pkg.state, pkg.postal_code,
+                                 convert_minutes(pkg.delivery_promise)] for (pkg_id, pkg) in self.pkg_id_desc]
+        self.pkg_query.refresh(self.pkgs)
 
     def __error_no_err(self) -> bool:
         """
@@ -253,31 +327,32 @@ class App(ctk.CTk):
         If there is an issue, the user is shown an error message and can retry their input
         :return No return value:
         """
+        if self.plan_pending():
+            return
         if self.string_input_button:
             pkg_id_input = self.pkg_id_entry.get()
             time_input = self.time_entry.get()
-            if (pkg_id_input.isdigit()
-                    and re.match(r'(?i)(\d?\d):(\d\d)', time_input)
-                    and int(pkg_id_input) in self.pkg_index):
-
-                self.pkg_info_return_event(int(pkg_id_input), str(time_input))
+            # A single ID, a range '10-20', a prefix '1*' or a list '3, 7, 12'
+            found_pkgs = self.pkg_query.search(pkg_id_input)
+            if found_pkgs and re.match(r'(?i)(\d?\d):(\d\d)', time_input):
+                self.pkg_info_return_event(found_pkgs, str(time_input))
             else:
                 self.__error = self.ErrorCode.WRONG_ID
                 self.raise_error()
 
-    def pkg_info_return_event(self, pkg_id: int, time: str):  # Uses the get method in the PkgObjects class
+    def pkg_info_return_event(self, pkgs: list[PkgObject], time: str):  # Uses the get method in the PkgObjects class
         """
         This method is used to structure and display data requested by the user. It creates
-        textboxes for the visualization then adds string text to it. It accesses the requested data
-        directly from the Hashtable storing the package data using the built-in 'get' method
-        :param pkg_id: int:
+        textboxes for the visualization then adds string text to it. The packages are looked up
+        by the package ID index, which reads them directly from the Hashtable storing the package data
+        :param pkgs: list[PkgObject]:
         :param time: str:
         :return No return value:
         """
         time = deadline_to_minutes(time)
-        pkg = self.pkgs.fetch_bucket(pkg_id)
-        txt_out = (f'Package ID: {pkg.pkg_id}; Address: {pkg.address} {pkg.city}, {pkg.state} {pkg.postal_code}; '
-                   f'Weight: {pkg.weight}; Deadline: {pkg.promise_format()}; Status: {pkg.get_pkg_status(time)}')
+        txt_out = '\n'.join(f'Package ID: {pkg.pkg_id}; Address: {pkg.address} {pkg.city}, {pkg.state} '
+                             f'{pkg.postal_code}; Weight: {pkg.weight}; Deadline: {pkg.promise_format()}; '
+                             f'Status: {pkg.get_pkg_status(time)}' for pkg in pkgs)
 
         self.textbox.delete("0.0", "200.0")
         textbox = ctk.CTkTextbox(self, width=250, font=ctk.CTkFont(family='Arial', size=15, weight="bold"))
@@ -291,6 +366,8 @@ class App(ctk.CTk):
         truck attributes stored in the truck objects.
         :return No return value:
         """
+        if self.plan_pending():
+            return
         textbox = ctk.CTkTextbox(self, width=250, font=ctk.CTkFont(family='Arial', size=22, weight="bold"))
         textbox.grid(row=0, rowspan=3, column=1, columnspan=3, padx=(20, 20), pady=(20, 20), sticky="nsew")
 
@@ -300,13 +377,16 @@ class App(ctk.CTk):
 
     def pkg_status_request_event(self):
         """
-        This method calls the 'pkg_data_refresh' method to ensure that it's using fresh data.
+        This method calls the 'pkg_data_refresh' method when the package table changed since the last refresh.
         It then provides a print out of all packages for a specified time. If no time is provided by the user
         then the current system time is used.
         :return No return value:
         """
+        if self.plan_pending():
+            return
         time = datetime.now()
-        self.pkg_data_refresh()
+        if self.refreshed_pkgs is not self.pkgs:
+            self.pkg_data_refresh()
         usr_time = self.time_entry_popup()
         if usr_time is not None:
             current_time = deadline_to_minutes(str(usr_time))
@@ -319,20 +399,22 @@ class App(ctk.CTk):
         textbox.grid(row=0, rowspan=3, column=1, columnspan=3, padx=(20, 20), pady=(20, 20), sticky="nsew")
         textbox.configure(scrollbar_button_color="", scrollbar_button_hover_color="")
 
-        for (_, pkg) in self.pkg_id_desc[::-1]:
-            txt = f'{pkg.get_pkg_information(current_time)}\n'
-            textbox.insert('0.0', txt)
+        textbox.insert('0.0', self.timeline.render(current_time))
 
     def pkg_status_info_request_event(self):
         """
-        This method calls the 'pkg_data_refresh' method to ensure that it's using fresh data.
-        It then provides a print out of all packages for a specified time which includes all package
-         attributets and delivery status/time
-         If no time is provided by the user then the current system time is used.
+        This method calls the 'pkg_data_refresh' method when the package table changed since the last refresh.
+        It then shows a paged table of all packages for a specified time which includes the package
+        attributes and delivery status/time. Only the visible rows are drawn, and the table can be sorted
+        by clicking a column and filtered by status, truck and deadline.
+        If no time is provided by the user then the current system time is used.
         :return No return value:
         """
+        if self.plan_pending():
+            return
         time = datetime.now()
-        self.pkg_data_refresh()
+        if self.refreshed_pkgs is not self.pkgs:
+            self.pkg_data_refresh()
         usr_time = self.time_entry_popup()
         if usr_time is not None:
             current_time = deadline_to_minutes(str(usr_time))
@@ -340,14 +422,10 @@ class App(ctk.CTk):
             current_time = deadline_to_minutes(str(time.strftime("%H:%M")))
 
         self.textbox.delete("0.0", "200.0")
-        textbox = ctk.CTkTextbox(self, width=250, font=ctk.CTkFont(family='Arial', size=16),
-                                 wrap=ctk.WORD)
-        textbox.grid(row=0, rowspan=3, column=1, columnspan=3, padx=(20, 20), pady=(20, 20), sticky="nsew")
-        textbox.configure(scrollbar_button_color="", scrollbar_button_hover_color="")
+        self.pkg_table_model.set_time(current_time)
+        pkg_table = PkgTableView(self, self.pkg_table_model)
+        pkg_table.grid(row=0, rowspan=3, column=1, columnspan=3, padx=(20, 20), pady=(20, 20), sticky="nsew")
 
-        for (_, pkg) in self.pkg_id_desc[::-1]:
-            status_info_txt = f'{pkg.all_pkg_info_status(current_time)}\n'
-            textbox.insert('0.0', status_info_txt)
 
 if __name__ == "__main__":
     app = App()
@@ -0,0 +1,41 @@
+from benchmarks.bench import compare_reports
+from benchmarks.synthetic import write_dataset
+from delivery_services.pkg_import import read_pkg_rows
+from delivery_services.routing import RoutingSession, distance_finder
+from pathlib import Path
+import tempfile
+import unittest
+
+
+class TestBenchmarks(unittest.TestCase):
+    def test_synthetic_dataset_routes(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            pkg_file, dist_file = write_dataset(Path(tmp_dir), 300, 60, seed=3)
+            self.assertEqual(write_dataset(Path(tmp_dir) / 'again', 300, 60, seed=3)[0].read_text(),
+                             pkg_file.read_text())
+            dh_graph = distance_finder(dist_file=dist_file, cache_dir=None)
+            self.assertEqual(len(dh_graph.hubs), 60)
+            truck_2_ids = {int(row[0]) for row in read_pkg_rows(pkg_file) if row[-1] == 'Can only be on truck 2'}
+            tst_pkgs, _ = RoutingSession(dh_graph=dh_graph, pkg_file=pkg_file).run()
+        pkgs = [pkg for (_, pkg) in tst_pkgs]
+        self.assertEqual(len(pkgs), 300)
+        for pkg in pkgs:
+            self.assertTrue(pkg.pkg_is_delivered())
+            if pkg.pkg_id in truck_2_ids:
+                self.assertEqual(pkg.get_delivered_by_truck(), 2)
+            for member in pkg.group_members():
+                self.assertEqual(member.get_delivered_by_truck(), pkg.get_delivered_by_truck())
+
+    def test_compare_reports(self):
+        old = {'results': [{'name': 'routing', 'params': {'pkgs': 100}, 'best': 1.0},
+                           {'name': 'graph_build', 'params': {'hubs': 27}, 'best': 1.0}]}
+        new = {'results': [{'name': 'routing', 'params': {'pkgs': 100}, 'best': 1.5},
+                           {'name': 'graph_build', 'params': {'hubs': 27}, 'best': 0.5},
+                           {'name': 'graph_build', 'params': {'hubs': 200}, 'best': 0.5}]}
+        lines, regressions = compare_reports(old, new)
+        self.assertEqual(regressions, ['routing pkgs=100'])
+        self.assertEqual(len(lines), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,8 @@
 from data_services.graph import DHGraph
+from data_services.graph_cache import load_graph_cache, save_graph_cache
+from pathlib import Path
+import os
+import tempfile
 import unittest
 
 
@@ -12,6 +16,59 @@ class TestDHGraph(unittest.TestCase):
         tst_graph.insert_graph_edge(dh_a, dh_b, 1.0)
         self.assertEqual(tst_graph.get_distance(dh_a, dh_b), 1.0)
 
+    def test_dense_distance(self):
+        tst_graph = DHGraph[str]()
+        hubs = ['Delivery Hub a', 'Delivery Hub b', 'Delivery Hub c']
+        for (h, hub) in enumerate(hubs):
+            tst_graph.insert_hub(hub)
+            for prev_h in range(h + 1):
+                tst_graph.insert_graph_edge(hub, hubs[prev_h], float(h + prev_h))
+        self.assertEqual(tst_graph.hub_id('Delivery Hub c'), 2)
+        self.assertFalse(tst_graph.dense)
+        self.assertEqual(tst_graph.get_distance_by_id(2, 1), 3.0)
+        tst_graph.compile_dense()
+        self.assertTrue(tst_graph.dense)
+        self.assertEqual(tst_graph.get_distance_by_id(2, 1), 3.0)
+        self.assertEqual(tst_graph.get_distance('Delivery Hub a', 'Delivery Hub c'), 2.0)
+        self.assertEqual(list(tst_graph.distance_row(1)), [1.0, 2.0, 3.0])
+
+    def test_nearest_hubs(self):
+        tst_graph = DHGraph[str]()
+        hubs = ['Delivery Hub a', 'Delivery Hub b', 'Delivery Hub c', 'Delivery Hub d']
+        dists = [[0.0], [4.0, 0.0], [1.0, 2.0, 0.0], [4.0, 3.0, 5.0, 0.0]]
+        for (h, hub) in enumerate(hubs):
+            tst_graph.insert_hub(hub)
+            for (prev_h, dist) in enumerate(dists[h]):
+                tst_graph.insert_graph_edge(hub, hubs[prev_h], dist)
+        tst_graph.build_neighbour_index()
+        self.assertEqual(tst_graph.nearest_hubs(0), [0, 2, 1, 3])
+        self.assertEqual(tst_graph.nearest_hubs(1), [1, 2, 3, 0])
+
+    def test_graph_cache(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            source = Path(tmp_dir) / 'distances.csv'
+            source.write_text('a;b;c')
+            tst_graph = DHGraph[str]()
+            hubs = ['Delivery Hub a', 'Delivery Hub b']
+            tst_graph.insert_hub(hubs[0])
+            tst_graph.insert_hub(hubs[1])
+            tst_graph.insert_graph_edge(hubs[0], hubs[0], 0.0)
+            tst_graph.insert_graph_edge(hubs[1], hubs[0], 2.5)
+            tst_graph.insert_graph_edge(hubs[1], hubs[1], 0.0)
+            self.assertIsNone(load_graph_cache(source, str, Path(tmp_dir)))
+            self.assertTrue(save_graph_cache(source, tst_graph, lambda hub: [hub], Path(tmp_dir)))
+
+            cached_graph = load_graph_cache(source, str, Path(tmp_dir))
+            self.assertTrue(cached_graph.dense)
+            self.assertEqual(cached_graph.hubs, hubs)
+            self.assertEqual(cached_graph.get_distance('Delivery Hub a', 'Delivery Hub b'), 2.5)
+
+            # Touching the source keeps the cache since its contents still match, changing it drops the cache
+            os.utime(source, ns=(0, 0))
+            self.assertIsNotNone(load_graph_cache(source, str, Path(tmp_dir)))
+            source.write_text('a;b;d')
+            self.assertIsNone(load_graph_cache(source, str, Path(tmp_dir)))
+
     # Test results
     # with arguments python -m unittest
     #
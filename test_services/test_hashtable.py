@@ -1,4 +1,4 @@
-from data_services.hash_table import HashTable
+from data_services.hash_table import HashTable, OpenAddressHashTable, new_table, set_probe_hook, set_table_engine
 import unittest
 
 
@@ -39,4 +39,59 @@ class TestHashTable(unittest.TestCase):
         self.assertEqual(tst_table.size, 1)
         tst_table.insert(3,  5)
         self.assertEqual(tst_table.__tbl_storage, [[], [(3, 5)]])
-        self.assertEqual(tst_table.size, 1)
\ No newline at end of file
+        self.assertEqual(tst_table.size, 1)
+
+
+class TestOpenAddressHashTable(unittest.TestCase):
+    def test_get_method(self):
+        tst_table = OpenAddressHashTable[object, object]()
+        tst_table.insert(3, 4)
+        self.assertEqual(tst_table.fetch_bucket(3), 4)
+        tst_table.insert(3, 5)
+        self.assertEqual(tst_table.fetch_bucket(3), 5)
+        self.assertEqual(tst_table.size, 1)
+        tst_table.insert('test1', 'test2')
+        self.assertEqual(tst_table.fetch_bucket('test1'), 'test2')
+        self.assertIsNone(tst_table.fetch_bucket('test12'))
+
+    def test_resize_method(self):
+        tst_table = OpenAddressHashTable[int, int]()
+        for i in range(1000):
+            tst_table.insert(i * 8, i)
+        self.assertEqual(tst_table.size, 1000)
+        self.assertGreater(tst_table.tbl_storage_size * tst_table.load_factor_max, tst_table.size)
+        self.assertTrue(all(tst_table.fetch_bucket(i * 8) == i for i in range(1000)))
+        self.assertEqual(sorted(v for (_, v) in tst_table), list(range(1000)))
+
+    def test_remove_method(self):
+        tst_table = OpenAddressHashTable[int, int]()
+        for i in range(10):
+            tst_table.insert(i * 8, i)
+        self.assertEqual(tst_table.remove(8), 1)
+        self.assertIsNone(tst_table.remove(8))
+        self.assertNotIn(8, tst_table)
+        # Keys probed past the tombstone must still be found
+        self.assertTrue(all(i * 8 in tst_table for i in range(10) if i != 1))
+        tst_table.insert(8, 11)
+        self.assertEqual(tst_table.fetch_bucket(8), 11)
+        self.assertEqual(tst_table.size, 10)
+
+    def test_probe_hook(self):
+        tst_table = OpenAddressHashTable[int, int]()
+        # 16 starts probing at 0's slot so it is stored in the next one
+        tst_table.insert(0, 0)
+        tst_table.insert(16, 1)
+        probes = []
+        set_probe_hook(probes.append)
+        try:
+            tst_table.fetch_bucket(0)
+            tst_table.fetch_bucket(16)
+        finally:
+            set_probe_hook(None)
+        tst_table.fetch_bucket(16)
+        self.assertEqual(probes, [1, 2])
+
+    def test_table_engine(self):
+        self.assertIsInstance(new_table('chaining'), HashTable)
+        self.assertIsInstance(new_table('open_addressing'), OpenAddressHashTable)
+        self.assertRaises(ValueError, set_table_engine, 'unknown')
@@ -0,0 +1,104 @@
+from benchmarks.differential import run_differential, scenarios
+from data_services.graph import DHGraph
+from delivery_services.insertion import InsertionPlanner, InsertionRoute
+from delivery_services.pkg_handler import PkgObject
+from delivery_services.plan_validator import validate_plan
+from delivery_services.routing import RoutingSession, auto_router, shared_graph
+from delivery_services.truck import Truck
+from pathlib import Path
+import tempfile
+import unittest
+
+
+def build_graph() -> DHGraph[str]:
+    tst_graph = DHGraph[str]()
+    hubs = ['HUB', 'Hub a (84101)', 'Hub b (84102)']
+    dists = [[0.0], [9.0, 0.0], [3.0, 10.0, 0.0]]
+    for (h, hub) in enumerate(hubs):
+        tst_graph.insert_hub(hub)
+        for (prev_h, dist) in enumerate(dists[h]):
+            tst_graph.insert_graph_edge(hub, hubs[prev_h], dist)
+    tst_graph.compile_dense()
+    return tst_graph
+
+
+def build_pkg(tst_graph: DHGraph[str], pkg_id: int, hub: str, postal_code: str, deadline: str,
+              note: str = '') -> PkgObject:
+    pkg = PkgObject(str(pkg_id), hub, 'Salt Lake City', 'UT', postal_code, deadline, '1', note)
+    pkg.hub_id = tst_graph.hub_id(pkg.address)
+    return pkg
+
+
+class TestInsertion(unittest.TestCase):
+    def test_slack(self):
+        tst_graph = build_graph()
+        route = InsertionRoute(tst_graph, 8 * 60)
+        # The truck reaches hub a at exactly 8:30, so no stop can go before it
+        pkg_a = build_pkg(tst_graph, 1, 'Hub a', '84101', '8:30 AM')
+        route.place_unit([pkg_a], True)
+        self.assertEqual(route.arrivals, [510.0])
+        self.assertEqual(route.slack, [0.0])
+
+        pkg_b = build_pkg(tst_graph, 2, 'Hub b', '84102', 'EOD')
+        insertion = route.stop_cost(pkg_b.hub_id, pkg_b.delivery_promise)
+        self.assertEqual((insertion.position, insertion.joins_stop), (1, False))
+        self.assertAlmostEqual(insertion.cost.miles, 4.0)
+        self.assertEqual(insertion.cost.violation, 0.0)
+        # A second package for hub a is delivered at the stop already on the route
+        joined = route.stop_cost(pkg_a.hub_id, pkg_a.delivery_promise)
+        self.assertEqual((joined.position, joined.joins_stop, joined.cost.miles), (0, True, 0.0))
+
+    def test_remove(self):
+        tst_graph = build_graph()
+        route = InsertionRoute(tst_graph, 8 * 60)
+        pkg_a = build_pkg(tst_graph, 1, 'Hub a', '84101', 'EOD')
+        pkg_b = build_pkg(tst_graph, 2, 'Hub b', '84102', '8:30 AM')
+        for pkg in (pkg_a, pkg_b):
+            route.place_unit([pkg], True)
+        self.assertEqual(route.stops, [pkg_b.hub_id, pkg_a.hub_id])
+        self.assertEqual(route.cost(), (0.0, 22.0))
+        # Without hub b the truck reaches hub a 3 miles sooner
+        route.remove([pkg_b])
+        self.assertEqual((route.stops, route.load, route.deadlines), ([pkg_a.hub_id], 1, [pkg_a.delivery_promise]))
+        self.assertEqual(route.arrivals, [510.0])
+        self.assertEqual(route.cost(), (0.0, 18.0))
+
+    def test_load_trucks(self):
+        tst_graph = build_graph()
+        trucks = [Truck(), Truck()]
+        for truck in trucks:
+            truck.start_time = 8 * 60
+        pkgs = [build_pkg(tst_graph, 1, 'Hub a', '84101', '8:30 AM'),
+                build_pkg(tst_graph, 2, 'Hub b', '84102', 'EOD'),
+                build_pkg(tst_graph, 3, 'Hub b', '84102', 'EOD', 'Delayed on flight---will not arrive to depot '
+                                                                   'until 9:05 am')]
+        planner = InsertionPlanner(tst_graph, trucks)
+        self.assertEqual(planner.load_trucks(pkgs), 2)
+        self.assertEqual(sorted(pkg.pkg_id for truck in trucks for pkg in truck.pkg_lst), [1, 2])
+        # Package 2 costs 4 miles on package 1's route, a second truck would drive 6 miles for it
+        loaded, empty = sorted(trucks, key=lambda truck: truck.truck_empty())
+        self.assertEqual([pkg.pkg_id for pkg in loaded.pkg_lst], [1, 2])
+        # The empty truck waits at the hub for the delayed package
+        self.assertTrue(planner.wait_for_pkgs(pkgs))
+        self.assertEqual(empty.get_time_elapsed(), 9 * 60 + 5)
+        self.assertEqual(loaded.get_time_elapsed(), 8 * 60)
+
+    def test_sample_plan(self):
+        tst_pkgs, tst_trucks = auto_router(strategy='insertion')
+        report = validate_plan(shared_graph(), tst_pkgs, tst_trucks)
+        self.assertEqual(report.violations, [])
+        self.assertEqual(report.delivered, 40)
+        self.assertEqual(report.missed_deadlines, [])
+        # Moving packages between the routes once they are all placed keeps the plan no longer than the nearest
+        # neighbour plan
+        _, nearest_trucks = auto_router()
+        self.assertLessEqual(sum(truck.total_miles for truck in tst_trucks),
+                             sum(truck.total_miles for truck in nearest_trucks))
+        with self.assertRaises(ValueError):
+            RoutingSession(strategy='farthest')
+
+    def test_differential(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            summaries = run_differential(scenarios(5, seed=11), ['insertion'], Path(tmp_dir))
+        self.assertEqual(summaries['insertion'].invalid, [])
+        self.assertEqual(summaries['insertion'].crashed, [])
@@ -0,0 +1,70 @@
+from concurrent.futures import ThreadPoolExecutor
+from data_services.graph import DHGraph
+from data_services.hash_table import HashTable, OpenAddressHashTable, new_table
+from delivery_services.routing import RoutingSession
+from log_services.instrumentation import (disable_instrumentation, enable_instrumentation, metrics, metrics_report,
+                                          reset_metrics, stage)
+import unittest
+
+
+class TestInstrumentation(unittest.TestCase):
+    def tearDown(self):
+        disable_instrumentation()
+        reset_metrics()
+
+    def test_disabled(self):
+        originals = (DHGraph.get_distance_by_id, OpenAddressHashTable.fetch_bucket, HashTable.resize_table,
+                     RoutingSession.route_trucks)
+        enable_instrumentation()
+        self.assertIsNot(DHGraph.get_distance_by_id, originals[0])
+        disable_instrumentation()
+        # The original methods are back, so nothing is counted or timed
+        self.assertEqual((DHGraph.get_distance_by_id, OpenAddressHashTable.fetch_bucket, HashTable.resize_table,
+                          RoutingSession.route_trucks), originals)
+        reset_metrics()
+        with stage('idle'):
+            new_table().insert(1, 1)
+        self.assertEqual(metrics()['stages'], {})
+        self.assertEqual(metrics()['counters'], {})
+
+    def test_run_metrics(self):
+        enable_instrumentation(trace_memory=True)
+        session = RoutingSession()
+        session.run()
+        run_metrics = session.metrics
+        stages = run_metrics['stages']
+        for name in ('pkg_import', 'priority_first', 'sort_packages', 'route_trucks'):
+            self.assertGreater(stages[name]['calls'], 0)
+            self.assertGreaterEqual(stages[name]['wall'], 0)
+        self.assertGreater(stages['priority_first']['counters']['distance_lookups'], 0)
+        self.assertGreater(run_metrics['counters']['hash_probes'], run_metrics['counters']['hash_lookups'] // 2)
+        self.assertGreater(run_metrics['peak_memory'], 0)
+        self.assertIn('priority_first', metrics_report(run_metrics))
+
+    def test_metrics_per_run(self):
+        def run_counters(session: RoutingSession) -> dict:
+            session.run()
+            return {name: times['counters'] | {'calls': times['calls']}
+                    for (name, times) in session.metrics['stages'].items()}
+
+        enable_instrumentation()
+        first = run_counters(RoutingSession())
+        # A later run and runs at the same time each count only their own lookups
+        self.assertEqual(run_counters(RoutingSession()), first)
+        with ThreadPoolExecutor(4) as pool:
+            runs = list(pool.map(run_counters, [RoutingSession() for _ in range(4)]))
+        self.assertTrue(all(run == first for run in runs))
+
+    def test_counters(self):
+        enable_instrumentation()
+        for tst_table in (HashTable(), OpenAddressHashTable()):
+            reset_metrics()
+            with stage('fill'):
+                for i in range(100):
+                    tst_table.insert(i, i)
+                for i in range(100):
+                    self.assertEqual(tst_table.fetch_bucket(i), i)
+            counters = metrics()['stages']['fill']['counters']
+            self.assertEqual(counters['hash_lookups'], 100)
+            self.assertGreater(counters['hash_resizes'], 0)
+            self.assertGreaterEqual(counters['hash_probes'], 200)
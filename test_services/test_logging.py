@@ -0,0 +1,61 @@
+from delivery_services.routing import auto_router
+from log_services import flush_logs, get_logger, log_levels, set_log_level
+import json
+import logging
+import tempfile
+import unittest
+from pathlib import Path
+
+
+class Tracked:
+    """Counts how often it is formatted"""
+
+    def __init__(self):
+        self.formatted = 0
+
+    def __str__(self):
+        self.formatted += 1
+        return 'tracked'
+
+
+class TestLogging(unittest.TestCase):
+    def setUp(self):
+        self.log_dir = tempfile.TemporaryDirectory()
+        self.log_file = Path(self.log_dir.name) / 'sample.log'
+        # Each test logs as its own subsystem, a subsystem keeps the file it was first created with
+        self.subsystem = f'sample_{self._testMethodName}'
+        self.logger = get_logger(f'test_services.{self.subsystem}', self.log_file)
+
+    def tearDown(self):
+        flush_logs()
+        self.log_dir.cleanup()
+
+    def test_json_lines(self):
+        set_log_level(self.subsystem, 'DEBUG')
+        self.logger.debug('Truck %s delivered package %s', 1, 14, extra={'fields': {'truck': 1, 'pkg_id': 14}})
+        flush_logs()
+        records = [json.loads(line) for line in self.log_file.read_text().splitlines()]
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]['message'], 'Truck 1 delivered package 14')
+        self.assertEqual((records[0]['truck'], records[0]['pkg_id'], records[0]['level']), (1, 14, 'DEBUG'))
+
+    def test_lazy_formatting(self):
+        tracked = Tracked()
+        self.logger.debug('Not written %s', tracked)
+        self.assertFalse(self.log_file.exists())  # Nothing was written so the file was never opened
+        self.assertEqual(tracked.formatted, 0)
+
+        set_log_level(self.subsystem, logging.DEBUG)
+        self.logger.debug('Written %s', tracked)
+        flush_logs()
+        self.assertEqual(tracked.formatted, 1)  # Formatted once, by the listener
+        self.assertIn('Written tracked', self.log_file.read_text())
+
+    def test_levels(self):
+        set_log_level('truck', 'DEBUG')
+        self.assertEqual(log_levels()['truck'], 'DEBUG')
+        set_log_level('delivery_services.truck', logging.INFO)
+        self.assertEqual(log_levels()['truck'], 'INFO')
+        self.assertRaises(ValueError, set_log_level, 'missing', 'DEBUG')
+        self.assertFalse(logging.getLogger('delivery_services.truck').isEnabledFor(logging.DEBUG))
+        auto_router()  # Deliveries are not recorded at INFO
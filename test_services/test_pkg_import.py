@@ -0,0 +1,84 @@
+from delivery_services.pkg_handler import parse_note, parse_time
+from delivery_services.pkg_import import PkgImporter, chunked, read_pkg_rows
+from delivery_services.routing import RoutingSession, pkg_importer, pkg_source, shared_graph
+from utilities import clear_parse_caches, parse_cache_stats
+import unittest
+
+
+class TestPkgImport(unittest.TestCase):
+    def test_chunked(self):
+        read = []
+
+        def rows():
+            for i in range(10):
+                read.append(i)
+                yield i
+
+        chunks = chunked(rows(), 4)
+        self.assertEqual(next(chunks), [0, 1, 2, 3])
+        self.assertEqual(read, [0, 1, 2, 3])  # Nothing past the first chunk has been read
+        self.assertEqual(list(chunks), [[4, 5, 6, 7], [8, 9]])
+
+    def test_stream(self):
+        importer = PkgImporter(shared_graph())
+        chunks = importer.stream(read_pkg_rows(pkg_source()), 7)
+        first = next(chunks)
+        self.assertEqual([pkg.pkg_id for pkg in first], list(range(1, 8)))
+        self.assertTrue(all(importer.pkgs.fetch_bucket(pkg.pkg_id) is pkg for pkg in first))
+        self.assertEqual(sum(len(chunk) for chunk in chunks), 33)
+
+        tst_pkgs, tst_dest_table = pkg_importer()
+        for (pkg_id, pkg) in tst_pkgs:
+            streamed = importer.pkgs.fetch_bucket(pkg_id)
+            self.assertEqual(streamed.address, pkg.address)
+            self.assertEqual(streamed.hub_id, shared_graph().hub_id(pkg.address))
+            self.assertEqual({p.pkg_id for p in streamed.pkg_dependencies}, {p.pkg_id for p in pkg.pkg_dependencies})
+            self.assertEqual([p.pkg_id for p in importer.pkg_dest_table.fetch_bucket(pkg.hub_id)],
+                             [p.pkg_id for p in tst_dest_table.fetch_bucket(pkg.hub_id)])
+
+    def test_chunked_session(self):
+        def plan(chunk_size: int) -> list[tuple]:
+            tst_pkgs, _ = RoutingSession(chunk_size=chunk_size).run()
+            return sorted((pkg_id, pkg._PkgObject__delivered_by_truck, pkg.delivered_at_time)
+                          for (pkg_id, pkg) in tst_pkgs)
+
+        self.assertEqual(plan(3), plan(1024))
+
+    def test_compact_pkgs(self):
+        tst_pkgs, _ = pkg_importer()
+        pkg_a, pkg_b = tst_pkgs.fetch_bucket(5), tst_pkgs.fetch_bucket(38)
+        self.assertFalse(hasattr(pkg_a, '__dict__'))
+        # Packages going to the same address share one copy of the address and postal code
+        self.assertIs(pkg_a.address, pkg_b.address)
+        self.assertIs(pkg_a.postal_code, pkg_b.postal_code)
+        self.assertIs(pkg_a.depend_pkgs, tst_pkgs.fetch_bucket(1).depend_pkgs)
+
+    def test_parse_caches(self):
+        clear_parse_caches()
+        pkg_importer()
+        pkg_importer()
+        tst_stats = parse_cache_stats()
+        # The second import is answered entirely from the caches
+        for name in ('address', 'deadline', 'note'):
+            self.assertGreaterEqual(tst_stats[name].hit_rate, 0.5)
+        self.assertEqual(parse_note('Can only be on truck 2').truck, 2)
+        self.assertEqual(parse_note('Must be delivered with 13, 15').depend_pkgs, {13, 15})
+        self.assertEqual(parse_time('12:15 pm'), 12 * 60 + 15)
+
+    def test_delivery_groups(self):
+        importer = PkgImporter(shared_graph())
+        for _ in importer.stream(read_pkg_rows(pkg_source())):
+            pass
+        tst_pkg = importer.pkgs.fetch_bucket(15)
+        # 13, 14, 16, 19 and 20 are linked through the notes of different packages
+        self.assertEqual([pkg.pkg_id for pkg in tst_pkg.group_members()], [13, 14, 15, 16, 19, 20])
+        self.assertEqual(tst_pkg.group_size(), 6)
+        self.assertTrue(all(pkg.group is tst_pkg.group for pkg in tst_pkg.group_members()))
+        self.assertIn(importer.pkgs.fetch_bucket(20), tst_pkg.pkg_dependencies)
+        self.assertEqual(importer.pkgs.fetch_bucket(1).group_members(), (importer.pkgs.fetch_bucket(1),))
+        self.assertEqual(importer.groups.find(20), importer.groups.find(16))
+
+    def test_unknown_address(self):
+        importer = PkgImporter(shared_graph())
+        rows = [['41', '1 Nowhere Ln', 'Salt Lake City', 'UT', '84000', 'EOD', '1', '']]
+        self.assertRaises(ValueError, list, importer.stream(rows))
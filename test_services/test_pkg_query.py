@@ -0,0 +1,48 @@
+from data_services.hash_table import new_table
+from delivery_services.pkg_query import PkgQuery
+from delivery_services.routing import pkg_importer
+import unittest
+
+
+class TestPkgQuery(unittest.TestCase):
+    def test_lookups(self):
+        tst_pkgs, _ = pkg_importer()
+        query = PkgQuery(tst_pkgs)
+        self.assertIs(query.get(12), tst_pkgs.fetch_bucket(12))
+        self.assertIn(40, query)
+        self.assertNotIn(41, query)
+        self.assertEqual([pkg.pkg_id for pkg in query.id_range(8, 12)], [8, 9, 10, 11, 12])
+        self.assertEqual([pkg.pkg_id for pkg in query.id_prefix('3')], [3, 30, 31, 32, 33, 34, 35, 36, 37, 38, 39])
+        found, missing = query.batch([7, 99, 2])
+        self.assertEqual(([pkg.pkg_id for pkg in found], missing), ([7, 2], [99]))
+
+    def test_search(self):
+        tst_pkgs, _ = pkg_importer()
+        query = PkgQuery(tst_pkgs)
+        self.assertEqual([pkg.pkg_id for pkg in query.search('15')], [15])
+        self.assertEqual([pkg.pkg_id for pkg in query.search(' 38 - 45 ')], [38, 39, 40])
+        self.assertEqual([pkg.pkg_id for pkg in query.search('4*')], [4, 40])
+        self.assertEqual([pkg.pkg_id for pkg in query.search('3, 1,2')], [3, 1, 2])
+        self.assertIsNone(query.search('41'))
+        self.assertIsNone(query.search('1, 41'))
+        self.assertIsNone(query.search('abc'))
+        self.assertEqual(query.search('50-60'), [])
+
+    def test_refresh(self):
+        tst_pkgs, _ = pkg_importer()
+        query = PkgQuery(tst_pkgs)
+        # Refreshing an unchanged table changes nothing and never duplicates an ID
+        self.assertEqual(query.refresh(tst_pkgs), (0, 0))
+        self.assertEqual(query.ids, list(range(1, 41)))
+
+        smaller = new_table()
+        for (pkg_id, pkg) in tst_pkgs:
+            if pkg_id != 20:
+                smaller.insert(pkg_id, pkg)
+        smaller.insert(100, tst_pkgs.fetch_bucket(20))
+        self.assertEqual(query.refresh(smaller), (1, 1))
+        self.assertEqual(len(query), 40)
+        self.assertNotIn(20, query)
+        self.assertEqual(query.ids[-1], 100)
+        self.assertEqual(query.id_strings.count('100'), 1)
+        self.assertNotIn('20', query.id_strings)
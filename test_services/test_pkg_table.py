@@ -0,0 +1,66 @@
+from delivery_services.pkg_handler import PkgObject
+from delivery_services.routing import auto_router
+from gui_services.pkg_table_model import COLUMNS, PkgTableModel
+from utilities import deadline_to_minutes
+import unittest
+
+
+class TestPkgTable(unittest.TestCase):
+    def test_page(self):
+        tst_pkgs, _ = auto_router()
+        model = PkgTableModel(tst_pkgs, deadline_to_minutes('9:00'))
+        self.assertEqual(len(model), 40)
+        self.assertEqual([row[0] for row in model.page(0, 5)], ['1', '2', '3', '4', '5'])
+        self.assertEqual(len(model.page(38, 10)), 2)
+        self.assertEqual(model.page(0, 1)[0][3], model.pkg_at(0).promise_format())
+
+    def test_sort(self):
+        tst_pkgs, _ = auto_router()
+        model = PkgTableModel(tst_pkgs)
+        model.sort_by(COLUMNS.index('Delivered'))
+        times = [model.pkg_at(row).delivered_at_time for row in range(len(model))]
+        self.assertEqual(times, sorted(times))
+        model.sort_by(COLUMNS.index('Delivered'))  # Sorting the same column again reverses it
+        self.assertEqual([model.pkg_at(row).delivered_at_time for row in range(len(model))], sorted(times)[::-1])
+        model.sort_by(COLUMNS.index('Deadline'), descending=False)
+        deadlines = [model.pkg_at(row).delivery_promise for row in range(len(model))]
+        self.assertEqual(deadlines, sorted(deadlines))
+
+    def test_filters(self):
+        tst_pkgs, _ = auto_router()
+        time = deadline_to_minutes('10:00')
+        model = PkgTableModel(tst_pkgs, time)
+        counts = model.status_counts()
+        for status in PkgObject.StatusCode:
+            model.set_filters(status=status)
+            self.assertEqual(len(model), counts[status])
+            self.assertTrue(all(model.status(model.pkg_at(row)) == status for row in range(len(model))))
+
+        model.set_filters(truck=2, deadline=deadline_to_minutes('10:30'))
+        self.assertTrue(len(model) > 0)
+        for row in range(len(model)):
+            self.assertEqual(model.pkg_at(row).get_delivered_by_truck(), 2)
+            self.assertLessEqual(model.pkg_at(row).delivery_promise, deadline_to_minutes('10:30'))
+
+        # Statuses follow the model's time
+        model.set_filters(status=PkgObject.StatusCode.DELIVERED)
+        model.set_time(deadline_to_minutes('23:00'))
+        self.assertEqual(len(model), 40)
+
+    def test_truck_at_time(self):
+        tst_pkgs, _ = auto_router()
+        model = PkgTableModel(tst_pkgs, deadline_to_minutes('9:00'))
+        at_hub = [pkg for (_, pkg) in tst_pkgs if model.status(pkg) == PkgObject.StatusCode.AT_HUB]
+        self.assertTrue(len(at_hub) > 0)
+        # A package still at the hub has no truck yet, in its cell, the truck filter and the truck sort
+        model.set_filters(truck=2)
+        self.assertTrue(all(model.status(model.pkg_at(row)) != PkgObject.StatusCode.AT_HUB
+                            for row in range(len(model))))
+        model.set_filters()
+        model.sort_by(COLUMNS.index('Truck'))
+        trucks = [model.page(row, 1)[0][4] for row in range(len(model))]
+        self.assertEqual(trucks[-len(at_hub):], [''] * len(at_hub))
+        self.assertEqual(trucks[:-len(at_hub)], sorted(trucks[:-len(at_hub)]))
+        # Moving the time rebuilds the rows
+        model.set_time(deadline_to_minutes('23:00'))
+        self.assertNotIn('', [model.page(row, 1)[0][4] for row in range(len(model))])
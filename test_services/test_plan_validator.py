@@ -0,0 +1,57 @@
+from benchmarks.differential import run_differential, scenarios
+from delivery_services.plan_validator import delivery_groups, validate_plan
+from delivery_services.routing import auto_router, shared_graph
+from pathlib import Path
+import tempfile
+import unittest
+
+
+class TestPlanValidator(unittest.TestCase):
+    def test_valid_plan(self):
+        tst_pkgs, tst_trucks = auto_router()
+        report = validate_plan(shared_graph(), tst_pkgs, tst_trucks)
+        self.assertEqual(report.violations, [])
+        self.assertEqual(report.delivered, 40)
+        self.assertEqual(report.missed_deadlines, [])
+        self.assertAlmostEqual(report.total_miles, sum(truck.total_miles for truck in tst_trucks))
+        self.assertEqual(delivery_groups(), [[13, 14, 15, 16, 19, 20]])
+
+    def test_broken_plans(self):
+        tst_pkgs, tst_trucks = auto_router()
+        tst_trucks.sort(key=lambda truck: truck.truck)
+        routes = {pkg.pkg_id: route for truck in tst_trucks for route in truck.routes for pkg in route}
+        # Package 3 can only be on truck 2 and package 15 must ride with 13, 14, 16, 19 and 20
+        for pkg_id in (3, 15):
+            routes[pkg_id].remove(tst_pkgs.fetch_bucket(pkg_id))
+            tst_trucks[0].routes[-1].append(tst_pkgs.fetch_bucket(pkg_id))
+        routes[40].remove(tst_pkgs.fetch_bucket(40))
+        violations = validate_plan(shared_graph(), tst_pkgs, tst_trucks).violations
+        self.assertIn('Package 3 can only be on truck 2, it is on truck 1', violations)
+        self.assertIn('Packages [13, 14, 15, 16, 19, 20] must be delivered together but ride different routes',
+                      violations)
+        self.assertIn('Package 40 is never delivered', violations)
+        self.assertTrue(any(violation.startswith('Truck 1 recorded') for violation in violations))
+
+    def test_differential(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            summaries = run_differential(scenarios(3, seed=7), ['scan', 'chaining'], Path(tmp_dir))
+        self.assertEqual(list(summaries), ['reference', 'scan', 'chaining'])
+        for summary in summaries.values():
+            self.assertEqual(summary.scenarios, 3)
+            self.assertFalse(summary.failed())
+        # The scan selection and the chaining table engine make the same plans as the batched reference
+        for engine in ('scan', 'chaining'):
+            self.assertEqual(summaries[engine].mile_deltas, [0.0] * 3)
+            self.assertEqual(summaries[engine].finish_deltas, [0.0] * 3)
+
+    def test_repairs(self):
+        # Each scenario is routed and then repaired once by the incremental planner
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            summaries = run_differential(scenarios(12, seed=3), ['repair'], Path(tmp_dir))
+        self.assertEqual(summaries['repair'].scenarios, 12)
+        self.assertEqual(summaries['repair'].invalid, [])
+        self.assertEqual(summaries['repair'].crashed, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
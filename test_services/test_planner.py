@@ -0,0 +1,84 @@
+from delivery_services.pkg_handler import PkgObject
+from delivery_services.plan_validator import validate_plan
+from delivery_services.routing import auto_router, incremental_planner, shared_graph
+from utilities import deadline_to_minutes
+import unittest
+
+
+class TestIncrementalPlanner(unittest.TestCase):
+    def test_package_available(self):
+        tst_pkgs, tst_trucks = auto_router()
+        planner = incremental_planner()
+        late_pkg = tst_pkgs.fetch_bucket(6)
+        self.assertLess(late_pkg._PkgObject__truck_loaded_at_time, deadline_to_minutes('10:00'))
+        planner.package_available(6, deadline_to_minutes('10:00'))
+        self.assertGreaterEqual(late_pkg._PkgObject__truck_loaded_at_time, deadline_to_minutes('10:00'))
+        self.assertTrue(all(pkg.pkg_is_delivered() for (_, pkg) in tst_pkgs))
+        # Every replayed truck still ends its day at the hub
+        for truck in tst_trucks:
+            self.assertTrue(truck.truck_empty())
+            self.assertEqual(sum(len(route) for route in truck.routes),
+                             len([pkg for (_, pkg) in tst_pkgs if pkg._PkgObject__delivered_by_truck == truck.truck]))
+
+    def test_grouped_packages_move_together(self):
+        tst_pkgs, _ = auto_router()
+        planner = incremental_planner()
+        planner.package_available(15, deadline_to_minutes('10:00'))
+        placed = {(truck.truck, route) for (truck, route)
+                  in (planner.placement.fetch_bucket(pkg.pkg_id) for pkg in tst_pkgs.fetch_bucket(15).delivery_group())}
+        self.assertEqual(len(placed), 1)
+
+    def test_update_address(self):
+        tst_pkgs, _ = auto_router()
+        planner = incremental_planner()
+        tst_pkg = tst_pkgs.fetch_bucket(2)
+        planner.update_address(2, '233 Canyon Rd', '84103', deadline_to_minutes('8:00'))
+        self.assertEqual(tst_pkg.address, '233 Canyon Rd (84103)')
+        self.assertEqual(tst_pkg.hub_id, planner.dh_graph.hub_id('233 Canyon Rd (84103)'))
+        self.assertTrue(tst_pkg.pkg_is_delivered())
+        self.assertRaises(ValueError, planner.update_address, 2, '1 Nowhere Ln', '84000', deadline_to_minutes('8:00'))
+        self.assertEqual(tst_pkg.address, '233 Canyon Rd (84103)')
+
+    def test_add_package(self):
+        tst_pkgs, tst_trucks = auto_router()
+        planner = incremental_planner()
+        miles = sum(truck.total_miles for truck in tst_trucks)
+        new_pkg = PkgObject('41', '195 W Oakland Ave', 'Salt Lake City', 'UT', '84115', 'EOD', '2', '')
+        planner.add_package(new_pkg, deadline_to_minutes('11:00'))
+        self.assertIs(tst_pkgs.fetch_bucket(41), new_pkg)
+        self.assertTrue(new_pkg.pkg_is_delivered())
+        self.assertGreaterEqual(new_pkg._PkgObject__truck_loaded_at_time, deadline_to_minutes('11:00'))
+        self.assertGreater(sum(truck.total_miles for truck in tst_trucks), miles)
+        self.assertRaises(ValueError, planner.add_package, new_pkg, deadline_to_minutes('11:00'))
+
+    def test_replay_keeps_available_times(self):
+        tst_pkgs, tst_trucks = auto_router()
+        planner = incremental_planner()
+        planner.package_available(3, deadline_to_minutes('10:30'))
+        self.assertGreaterEqual(tst_pkgs.fetch_bucket(3).get_loaded_time(), deadline_to_minutes('10:30'))
+
+        # Moving package 12 shortens the route before package 9's, which still waits for its corrected address
+        tst_pkgs, tst_trucks = auto_router()
+        planner = incremental_planner()
+        planner.package_available(12, deadline_to_minutes('8:10'))
+        self.assertGreaterEqual(tst_pkgs.fetch_bucket(9).get_loaded_time(), deadline_to_minutes('10:20'))
+        self.assertEqual(validate_plan(shared_graph(), tst_pkgs, tst_trucks).violations, [])
+
+    def test_available_after_last_route(self):
+        tst_pkgs, tst_trucks = auto_router()
+        planner = incremental_planner()
+        end = max(truck.get_time_elapsed() for truck in tst_trucks)
+        planner.package_available(1, end + 30)
+        # A new route waits at the hub for the package
+        self.assertGreaterEqual(tst_pkgs.fetch_bucket(1).get_loaded_time(), end + 30)
+        self.assertEqual(validate_plan(shared_graph(), tst_pkgs, tst_trucks).violations, [])
+
+    def test_failed_repair_keeps_plan(self):
+        tst_pkgs, tst_trucks = auto_router()
+        planner = incremental_planner()
+        routes = [[list(route) for route in truck.routes] for truck in tst_trucks]
+        new_pkg = PkgObject('41', '195 W Oakland Ave', 'Salt Lake City', 'UT', '84115', 'EOD', '2',
+                            'Can only be on truck 3')
+        self.assertRaises(ValueError, planner.add_package, new_pkg, deadline_to_minutes('11:00'))
+        self.assertIsNone(tst_pkgs.fetch_bucket(41))
+        self.assertEqual([[list(route) for route in truck.routes] for truck in tst_trucks], routes)
@@ -0,0 +1,72 @@
+from delivery_services.pkg_handler import EOD
+from delivery_services.route_optimizer import OptimizerSettings, Stop, improve_route, route_cost
+from delivery_services.routing import RoutingSession, auto_router, shared_graph
+from unittest.mock import patch
+import unittest
+
+# Hubs placed on a line on either side of the base, hub 0 is the base
+positions = [0.0, -1.0, -2.0, 3.0, 4.0]
+hub_count = len(positions)
+distance_matrix = [abs(a - b) for a in positions for b in positions]
+
+
+class CountingPool:
+    """
+    Runs the searches in the current process and counts the rounds sent to it
+    """
+
+    def __init__(self):
+        self.rounds = 0
+        self.shutdowns = 0
+
+    def map(self, fn, snapshots):
+        self.rounds += 1
+        return [fn(snapshot, shared_graph().distance_matrix, shared_graph().hub_count) for snapshot in snapshots]
+
+    def shutdown(self):
+        self.shutdowns += 1
+
+
+class TestRouteOptimizer(unittest.TestCase):
+    def test_improve_route(self):
+        stops = [Stop(hub, (EOD,), 0.0) for hub in (3, 1, 4, 2)]
+        start = route_cost(range(len(stops)), stops, distance_matrix, hub_count, 480.0)
+        order = improve_route(stops, distance_matrix, hub_count, 480.0)
+        best = route_cost(order, stops, distance_matrix, hub_count, 480.0)
+        self.assertEqual(start.miles, 20.0)
+        self.assertEqual(best.miles, 12.0)
+        self.assertEqual(sorted(order), [0, 1, 2, 3])
+
+    def test_deadlines_respected(self):
+        # Hub 4 must be reached within 14 minutes (4.2 miles) so it has to be the first stop
+        stops = [Stop(1, (EOD,), 0.0), Stop(4, (494.0,), 0.0), Stop(2, (EOD,), 0.0)]
+        self.assertGreater(route_cost(range(3), stops, distance_matrix, hub_count, 480.0).violation, 0.0)
+        order = improve_route(stops, distance_matrix, hub_count, 480.0)
+        cost = route_cost(order, stops, distance_matrix, hub_count, 480.0)
+        self.assertEqual(cost.violation, 0.0)
+        self.assertEqual(cost.miles, 12.0)
+        self.assertEqual(order[0], 1)
+
+    def test_optimized_routing(self):
+        tst_pkgs, tst_trucks = auto_router(optimizer=OptimizerSettings())
+        self.assertLess(sum(truck.total_miles for truck in tst_trucks), 116.5)
+        for (_, pkg) in tst_pkgs:
+            self.assertTrue(pkg.pkg_is_delivered())
+            self.assertLessEqual(pkg.delivered_at_time, pkg.delivery_promise)
+
+    def test_parallel_restarts(self):
+        _, serial_trucks = auto_router(optimizer=OptimizerSettings(restarts=4))
+        serial_miles = [truck.total_miles for truck in serial_trucks]
+        tst_pkgs, tst_trucks = auto_router(optimizer=OptimizerSettings(restarts=4, workers=2))
+        self.assertEqual([truck.total_miles for truck in tst_trucks], serial_miles)
+        self.assertTrue(all(pkg.pkg_is_delivered() for (_, pkg) in tst_pkgs))
+
+    def test_shared_pool(self):
+        # Every round of routes goes to the pool started for the run, rounds with few searches stay in process
+        for (restarts, rounds) in ((8, 2), (1, 0)):
+            pool = CountingPool()
+            session = RoutingSession(optimizer=OptimizerSettings(restarts=restarts, workers=2))
+            with patch('delivery_services.routing.worker_pool', return_value=pool):
+                session.run()
+            self.assertEqual((pool.rounds, pool.shutdowns), (rounds, 1))
+            self.assertIsNone(session.pool)
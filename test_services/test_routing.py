@@ -1,5 +1,11 @@
-from delivery_services.routing import auto_router
+from concurrent.futures import ThreadPoolExecutor
+from data_services import hash_table
+from data_services.hash_table import TABLE_ENGINES, set_table_engine
+from delivery_services.plan_validator import validate_plan
+from delivery_services.routing import ROUTING_STRATEGIES, RoutingSession, auto_router, pkg_source, shared_graph
+from pathlib import Path
 from utilities import deadline_to_minutes, SOURCE_DIR
+import tempfile
 import unittest
 
 now = deadline_to_minutes('11:00')
@@ -10,12 +16,79 @@ class TestRouting(unittest.TestCase):
         tst_pkgs, tst_trucks = auto_router()
         tst_trucks.sort(key=lambda truck: truck.truck)
         ichi_truck, ni_truck = tst_trucks
-        self.assertEqual(round(ichi_truck.total_miles, 1), 45.2)
-        self.assertEqual(round(ni_truck.total_miles, 1), 71.3)
+        self.assertEqual(round(ichi_truck.total_miles, 1), 47.9)
+        self.assertEqual(round(ni_truck.total_miles, 1), 71.0)
 
         for (_, pkg) in tst_pkgs:
-            print(pkg._PkgObject__get_pkg_information(now))
+            print(pkg.get_pkg_information(now))
             if pkg._PkgObject__truck_tracker is not None:
                 self.assertEqual(pkg._PkgObject__truck_tracker, pkg._PkgObject__delivered_by_truck)
                 self.assertLessEqual(pkg.delivered_at_time, pkg.delivery_promise)
                 self.assertLessEqual(pkg._PkgObject__available_when, pkg._PkgObject__truck_loaded_at_time)
+
+    def test_batched_sort(self):
+        def plan(batched: bool) -> list[tuple]:
+            tst_pkgs, _ = auto_router(batched)
+            return sorted((pkg_id, pkg._PkgObject__delivered_by_truck, pkg.delivered_at_time)
+                          for (pkg_id, pkg) in tst_pkgs)
+
+        self.assertEqual(plan(True), plan(False))
+
+    def test_table_engines(self):
+        # Ties are broken by package ID, so the table engine never changes the plan
+        def plan(strategy: str, engine: str) -> list[tuple]:
+            set_table_engine(engine)
+            tst_pkgs, _ = RoutingSession(strategy=strategy).run()
+            return sorted((pkg_id, pkg._PkgObject__delivered_by_truck, pkg.delivered_at_time)
+                          for (pkg_id, pkg) in tst_pkgs)
+
+        previous = hash_table.table_engine
+        try:
+            for strategy in ROUTING_STRATEGIES:
+                plans = [plan(strategy, engine) for engine in TABLE_ENGINES]
+                self.assertTrue(all(tst_plan == plans[0] for tst_plan in plans))
+        finally:
+            set_table_engine(previous)
+
+    def test_delivery_groups(self):
+        tst_pkgs, _ = auto_router()
+        for (_, pkg) in tst_pkgs:
+            # A group rides the same route of the same truck
+            self.assertEqual({(member._PkgObject__delivered_by_truck, member._PkgObject__route_number)
+                              for member in pkg.group_members()},
+                             {(pkg._PkgObject__delivered_by_truck, pkg._PkgObject__route_number)})
+
+    def test_concurrent_sessions(self):
+        def plan(session: RoutingSession) -> list[tuple]:
+            tst_pkgs, _ = session.run()
+            return sorted((pkg_id, pkg._PkgObject__delivered_by_truck, pkg.delivered_at_time)
+                          for (pkg_id, pkg) in tst_pkgs)
+
+        sessions = [RoutingSession() for _ in range(4)]
+        with ThreadPoolExecutor(4) as pool:
+            plans = list(pool.map(plan, sessions))
+        self.assertTrue(all(session.dh_graph is shared_graph() for session in sessions))
+        self.assertTrue(all(tst_plan == plans[0] for tst_plan in plans))
+        self.assertEqual([truck.truck for truck in sorted(sessions[0].trucks, key=lambda t: t.truck)], [1, 2])
+
+        # A larger fleet reuses the same graph and still delivers every package
+        tst_pkgs, tst_trucks = RoutingSession(truck_count=3).run()
+        self.assertEqual(len(tst_trucks), 3)
+        self.assertTrue(all(pkg.pkg_is_delivered() for (_, pkg) in tst_pkgs))
+
+    def test_only_delayed_packages(self):
+        header = pkg_source().read_text().splitlines()[0]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            pkg_file = Path(tmp_dir) / 'packages.csv'
+            pkg_file.write_text(f'{header}\n1;3060 Lester St;West Valley City;UT;84119;EOD;88;'
+                                f'Delayed on flight---will not arrive to depot until 9:05 am\n')
+            # Every truck waits at the hub for the package instead of dispatching empty rounds forever
+            for strategy in ROUTING_STRATEGIES:
+                tst_pkgs, tst_trucks = RoutingSession(pkg_file=pkg_file, strategy=strategy).run()
+                self.assertEqual(tst_pkgs.fetch_bucket(1).get_loaded_time(), deadline_to_minutes('9:05'))
+                self.assertEqual(validate_plan(shared_graph(), tst_pkgs, tst_trucks, pkg_file).violations, [])
+
+            pkg_file.write_text(f'{header}\n1;3060 Lester St;West Valley City;UT;84119;EOD;88;'
+                                f'Can only be on truck 3\n')
+            for strategy in ROUTING_STRATEGIES:
+                self.assertRaises(ValueError, RoutingSession(pkg_file=pkg_file, strategy=strategy).run)
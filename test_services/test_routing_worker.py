@@ -0,0 +1,72 @@
+from delivery_services.routing import RoutingSession
+from gui_services.routing_worker import RoutingWorker
+from pathlib import Path
+from unittest.mock import patch
+import threading
+import time
+import unittest
+
+
+class MainLoop:
+    """Stands in for a Tk widget, after() callbacks are run by drain in the order they were scheduled"""
+
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, _, callback, *args):
+        self.scheduled.append((callback, args))
+
+    def drain(self, timeout: float = 30) -> None:
+        end = time.monotonic() + timeout
+        while self.scheduled and time.monotonic() < end:
+            (callback, args) = self.scheduled.pop(0)
+            callback(*args)
+            time.sleep(0.001)
+
+
+class TestRoutingWorker(unittest.TestCase):
+    def setUp(self):
+        self.progress, self.done, self.errors = [], [], []
+        self.worker = RoutingWorker(lambda stage, count: self.progress.append((stage, count)), self.done.append,
+                                    self.errors.append)
+
+    def test_run(self):
+        main_loop = MainLoop()
+        self.worker.start(chunk_size=8)
+        self.worker.attach(main_loop)
+        main_loop.drain()
+        self.assertFalse(self.worker.busy())
+        self.assertEqual(len(self.done), 1)
+        self.assertTrue(all(pkg.pkg_is_delivered() for (_, pkg) in self.done[0].pkgs))
+        self.assertEqual([count for (stage, count) in self.progress if stage == 'import'], [8, 16, 24, 32, 40])
+        self.assertEqual(self.progress[-1], ('routing', 40))
+
+    def test_replan(self):
+        main_loop = MainLoop()
+        release = threading.Event()
+        run = RoutingSession.run
+
+        def held_run(session: RoutingSession):
+            # Both runs wait until the worker is attached, so neither can finish before the first poll
+            release.wait(30)
+            return run(session)
+
+        with patch.object(RoutingSession, 'run', held_run):
+            self.worker.start()
+            latest = self.worker.start(truck_count=3)
+            self.worker.attach(main_loop)
+            self.worker.attach(main_loop)  # Already polling, no second loop is scheduled
+            self.assertEqual(len(main_loop.scheduled), 1)
+            release.set()
+            main_loop.drain()
+        # Only the latest run is handed on
+        self.assertEqual(latest, 2)
+        self.assertEqual([len(session.trucks) for session in self.done], [3])
+
+    def test_error(self):
+        main_loop = MainLoop()
+        self.worker.start(pkg_file=Path('missing package file.csv'))
+        self.worker.attach(main_loop)
+        main_loop.drain()
+        self.assertEqual(self.done, [])
+        self.assertIsInstance(self.errors[0], OSError)
@@ -0,0 +1,54 @@
+from data_services.graph import DHGraph
+from delivery_services.pkg_handler import PkgObject
+from delivery_services.simulation import DeliverySimulator
+from delivery_services.truck import Truck
+import unittest
+
+
+def build_graph() -> DHGraph[str]:
+    tst_graph = DHGraph[str]()
+    hubs = ['HUB', 'Hub a (84101)', '410 S State St (84111)']
+    dists = [[0.0], [9.0, 0.0], [3.0, 6.0, 0.0]]
+    for (h, hub) in enumerate(hubs):
+        tst_graph.insert_hub(hub)
+        for (prev_h, dist) in enumerate(dists[h]):
+            tst_graph.insert_graph_edge(hub, hubs[prev_h], dist)
+    tst_graph.compile_dense()
+    return tst_graph
+
+
+class TestDeliverySimulator(unittest.TestCase):
+    def test_shared_clock(self):
+        tst_graph = build_graph()
+        pkg_a = PkgObject('1', 'Hub a', 'Salt Lake City', 'UT', '84101', 'EOD', '1', '')
+        wrong_pkg = PkgObject('2', '300 State St', 'Salt Lake City', 'UT', '84103', 'EOD', '1',
+                              'Wrong address listed')
+        for pkg in (pkg_a, wrong_pkg):
+            pkg.hub_id = tst_graph.hub_id(pkg.address)
+
+        truck = Truck()
+        truck.start_time = 10 * 60
+        truck.load_truck(pkg_a)
+        simulator = DeliverySimulator(tst_graph)
+        simulator.schedule_address_corrections([wrong_pkg])
+        self.assertEqual(simulator.run([truck]), 1)
+
+        # The address is corrected at 10:20 while the truck is still on its way to hub a
+        self.assertFalse(wrong_pkg.wrong_address)
+        self.assertEqual(wrong_pkg.hub_id, 2)
+        self.assertEqual(pkg_a.delivered_at_time, 10 * 60 + 30)
+        self.assertEqual(truck.total_miles, 18.0)
+        self.assertEqual(simulator.clock, 11 * 60)
+
+    def test_correction_waits_for_clock(self):
+        tst_graph = build_graph()
+        wrong_pkg = PkgObject('2', '300 State St', 'Salt Lake City', 'UT', '84103', 'EOD', '1',
+                              'Wrong address listed')
+        simulator = DeliverySimulator(tst_graph)
+        simulator.schedule_address_corrections([wrong_pkg])
+        truck = Truck()
+        simulator.run([truck])
+        self.assertTrue(wrong_pkg.wrong_address)
+        truck.start_time = 11 * 60
+        simulator.run([truck])
+        self.assertFalse(wrong_pkg.wrong_address)
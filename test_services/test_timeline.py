@@ -0,0 +1,34 @@
+from delivery_services.pkg_handler import PkgObject
+from delivery_services.routing import auto_router
+from delivery_services.timeline import StatusTimeline
+from utilities import deadline_to_minutes
+import unittest
+
+
+class TestTimeline(unittest.TestCase):
+    def test_status_at_time(self):
+        tst_pkgs, _ = auto_router()
+        timeline = StatusTimeline(tst_pkgs)
+        pkgs = sorted(tst_pkgs, key=lambda item: item[0])
+        for time in range(deadline_to_minutes('8:00'), deadline_to_minutes('13:00'), 7):
+            delivered = {pkg_id for (pkg_id, pkg) in pkgs if pkg.delivered_at_time <= time}
+            loaded = {pkg_id for (pkg_id, pkg) in pkgs if pkg.get_loaded_time() <= time}
+            self.assertEqual(set(timeline.delivered_ids(time)), delivered)
+            self.assertEqual(set(timeline.enroute_ids(time)), loaded - delivered)
+            self.assertEqual(timeline.status_counts(time),
+                             {PkgObject.StatusCode.AT_HUB: len(pkgs) - len(loaded),
+                              PkgObject.StatusCode.ENROUTE: len(loaded - delivered),
+                              PkgObject.StatusCode.DELIVERED: len(delivered)})
+            self.assertEqual(timeline.render(time), ''.join(f'{pkg.get_pkg_information(time)}\n'
+                                                            for (_, pkg) in pkgs))
+            self.assertEqual(timeline.render(time, detailed=True),
+                             ''.join(f'{pkg.all_pkg_info_status(time)}\n' for (_, pkg) in pkgs))
+
+    def test_render_cache(self):
+        tst_pkgs, _ = auto_router()
+        timeline = StatusTimeline(tst_pkgs)
+        first, last = timeline.event_times[0], timeline.event_times[-1]
+        # Times between the same two events share the rendered text
+        self.assertIs(timeline.render(int(last) + 1), timeline.render(int(last) + 60))
+        self.assertIsNot(timeline.render(int(first) - 1), timeline.render(int(last) + 1))
+        self.assertIn('AT_HUB', timeline.render(int(first) - 1))
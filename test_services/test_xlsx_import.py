@@ -0,0 +1,47 @@
+from delivery_services.routing import RoutingSession, distance_finder, pkg_importer
+from delivery_services.xlsx_import import distance_rows_from_xlsx, pkg_rows_from_xlsx
+from utilities import SOURCE_DIR, normalize_address
+from unittest.mock import patch
+import unittest
+
+xlsx_pkgs = SOURCE_DIR / 'input_files' / 'WGUPS Package File.xlsx'
+xlsx_dists = SOURCE_DIR / 'input_files' / 'WGUPS Distance Table.xlsx'
+
+
+class TestXlsxImport(unittest.TestCase):
+    def test_rows(self):
+        pkg_rows = list(pkg_rows_from_xlsx(xlsx_pkgs))
+        self.assertEqual(len(pkg_rows), 40)
+        self.assertEqual(pkg_rows[0], ['1', '195 W Oakland Ave', 'Salt Lake City', 'UT', '84115', '10:30 am', '21', ''])
+        self.assertEqual(pkg_rows[14][5], '9:00 am')
+
+        dist_rows = list(distance_rows_from_xlsx(xlsx_dists))
+        self.assertEqual(len(dist_rows), 27)
+        self.assertEqual([len(row) - 2 for row in dist_rows], list(range(1, 28)))
+        self.assertEqual(normalize_address(dist_rows[-1][1]), '6351 S 900 E (84121)')
+
+    def test_blank_distance_rows(self):
+        # Cells past a hub's own column, above the diagonal, are not part of its row
+        sheet = [['', ''], ['HUB', '4001 South 700 East', '0', '3.4', '7.2'], [], [None, None],
+                 ['Hub a', '195 W Oakland Ave', '3.4', '0', '3.8'], ['Hub b', '2530 S 500 E', '7.2', '3.8', '0']]
+        with patch('delivery_services.xlsx_import.iter_rows', return_value=iter(sheet)):
+            dist_rows = list(distance_rows_from_xlsx(xlsx_dists))
+        # The hubs after the blank rows are still read up to their own column
+        self.assertEqual(dist_rows, [['HUB', '4001 South 700 East', '0.0'],
+                                     ['Hub a', '195 W Oakland Ave', '3.4', '0.0'],
+                                     ['Hub b', '2530 S 500 E', '7.2', '3.8', '0.0']])
+
+    def test_same_plan_as_csv(self):
+        def plan(session: RoutingSession) -> list[tuple]:
+            tst_pkgs, _ = session.run()
+            return sorted((pkg_id, pkg.address, pkg._PkgObject__delivered_by_truck, pkg.delivered_at_time)
+                          for (pkg_id, pkg) in tst_pkgs)
+
+        tst_graph = distance_finder(dist_file=xlsx_dists, cache_dir=None)
+        self.assertEqual(tst_graph.distance_matrix, distance_finder(cache_dir=None).distance_matrix)
+        self.assertEqual(plan(RoutingSession(tst_graph, pkg_file=xlsx_pkgs)), plan(RoutingSession()))
+        tst_pkgs, _ = pkg_importer(xlsx_pkgs)
+        csv_pkgs, _ = pkg_importer()
+        for (pkg_id, pkg) in csv_pkgs:
+            self.assertEqual({p.pkg_id for p in tst_pkgs.fetch_bucket(pkg_id).pkg_dependencies},
+                             {p.pkg_id for p in pkg.pkg_dependencies})
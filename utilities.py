@@ -1,6 +1,7 @@
 import re
 import os
-from typing import Any, Match
+from functools import lru_cache
+from typing import Any, Callable, Match, NamedTuple
 from pathlib import Path
 
 SOURCE_FILE = Path(__file__).resolve()
@@ -8,6 +9,48 @@ SOURCE_DIR = SOURCE_FILE.parent
 ROOT_DIR = SOURCE_DIR.parent
 EMBEDDED_DIR = SOURCE_DIR / '__WGUPS Package File.csv'
 
+ADDRESS_CACHE_SIZE = 1 << 14  # Distinct addresses remembered by normalize_address
+DIRECTION_PATTERN = re.compile(r'(?i)\b(north|east|south|west)\b|\n')
+
+# Memoized parsers registered by name so their hit rates can be reported together
+__parse_caches: dict[str, Callable] = {}
+
+
+class CacheStats(NamedTuple):
+    hits: int
+    misses: int
+    max_size: int
+    size: int
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return 0.0 if lookups == 0 else self.hits / lookups
+
+
+def register_parse_cache(name: str, cached_fn: Callable) -> Callable:
+    """
+    Records a function wrapped with functools.lru_cache so parse_cache_stats can report on it
+    :param name:
+    :param cached_fn:
+    :return The cached function:
+    """
+    __parse_caches[name] = cached_fn
+    return cached_fn
+
+
+def parse_cache_stats() -> dict[str, CacheStats]:
+    """
+    Returns the hits, misses and size of every registered parse cache
+    :return Dictionary of cache names to CacheStats:
+    """
+    return {name: CacheStats(*cached_fn.cache_info()) for (name, cached_fn) in __parse_caches.items()}
+
+
+def clear_parse_caches() -> None:
+    for cached_fn in __parse_caches.values():
+        cached_fn.cache_clear()
+
 
 def debug(*args) -> None:
     if 'DEBUG' in os.environ:
@@ -37,28 +80,31 @@ def convert_minutes(minutes: float) -> str:
 
 def new_line_removal(a_match: Match[str]) -> str:
     """
-    Removes all the newline breaks present in the data for normalization purposes
+    Replaces newline breaks with spaces and cardinal direction words with their initials
+    for normalization purposes
     :param a_match:
     :return Concatenated string with newlines removed:
     """
     tmp_match = a_match.group(0)[0]
-    if tmp_match == '\n':
-        return ' ' if tmp_match == '\n' else tmp_match.upper()
+    return ' ' if tmp_match == '\n' else tmp_match.upper()
 
 
+@lru_cache(maxsize=ADDRESS_CACHE_SIZE)
 def normalize_address(address: str) -> str:
     """
     Between the two files, the initialism for the cardinal directions is used
     interchangably with the full words. This method normalizes the addresses to contain
-    just the initials
+    just the initials. Manifests repeat the same addresses so results are memoized
     :param address:
     :return Normalized address:
     """
-    corrected = re.sub(r'(?i)(north|east|south|west|\n)', new_line_removal,
-                       address.strip())
+    corrected = DIRECTION_PATTERN.sub(new_line_removal, address.strip())
     return corrected
 
 
+register_parse_cache('address', normalize_address)
+
+
 def MaxPrimeFactor(integer) -> int:
     """
     Used to generate prime numbers for use in HashTable resizing